@@ -0,0 +1,89 @@
+"""Mabinogi frame boundaries.
+
+Header: bytes 0-2 = magic, bytes 3-4 = packet length (LE), byte 5 = flags.
+The length is taken as the total frame length, header included - the same
+field guildparser.Packet reads to pick the 6 or 7 byte header. That reading
+only rests on synthetic frames so far, which is why split_frames never cuts
+a payload its length fields do not account for exactly.
+"""
+
+# Smallest thing we accept as a frame length (a bare 6-byte header)
+MIN_FRAME_LEN = 6
+# Bytes needed to read the length field
+LENGTH_FIELD_END = 5
+
+
+def frame_length(buf, offset: int = 0) -> int | None:
+    """Return the length of the frame starting at `offset`.
+
+    Returns None when fewer than 5 bytes are available, and 0 when the length
+    field is not a plausible frame length (nothing to frame on).
+    """
+    if len(buf) - offset < LENGTH_FIELD_END:
+        return None
+    length = buf[offset + 3] | (buf[offset + 4] << 8)
+    if length < MIN_FRAME_LEN:
+        return 0
+    return length
+
+
+def plausible_frame(buf, offset: int = 0) -> bool:
+    """Whether a frame header plausibly starts at `offset`.
+
+    Magic bytes 1-2 are zero and the length field is usable. Nothing in the
+    stream marks frame starts, so this is a heuristic, not a guarantee.
+    """
+    if len(buf) - offset < LENGTH_FIELD_END:
+        return False
+    return buf[offset + 1] == 0 and buf[offset + 2] == 0 and bool(frame_length(buf, offset))
+
+
+def find_frame_start(buf, offset: int = 0) -> int | None:
+    """First offset at or after `offset` where a frame plausibly starts, or None.
+
+    A candidate whose frame ends inside `buf` must be followed by another
+    plausible header, which rules out most chance matches inside a frame
+    body. Candidates confirmed that way, or ending exactly at the end of
+    `buf`, win over one whose next header is not in `buf` yet.
+    `buf` is bytes or a bytearray.
+    """
+    end = len(buf)
+    unconfirmed = None
+    pos = offset + 1
+    while True:
+        # Cheap scan for the zero magic bytes, then the full check
+        pos = buf.find(b"\x00\x00", pos)
+        start = pos - 1
+        if pos < 0 or start + LENGTH_FIELD_END > end:
+            return unconfirmed
+        length = frame_length(buf, start)
+        if length:
+            following = start + length
+            if following == end or plausible_frame(buf, following):
+                return start
+            if following + LENGTH_FIELD_END > end and unconfirmed is None:
+                unconfirmed = start
+        pos += 1
+
+
+def split_frames(buf) -> list[memoryview]:
+    """Split a TCP payload into the Mabinogi frames it carries.
+
+    The server coalesces several frames into one segment when busy. Frames
+    are returned as zero-copy memoryview slices of `buf`. The payload is only
+    split when the length fields chain exactly to its end; the length field
+    has not been checked against a real multi-frame capture yet, so anything
+    else (a length running past the end, trailing bytes, no usable length)
+    is returned whole as one slice, as before splitting existed.
+    """
+    view = memoryview(buf)
+    end = len(view)
+    frames = []
+    offset = 0
+    while offset < end:
+        length = frame_length(view, offset)
+        if not length or offset + length > end:
+            return [view] if end else []
+        frames.append(view[offset:offset + length])
+        offset += length
+    return frames
@@ -4,7 +4,11 @@
 from dataclasses import dataclass, field
 import struct
 import Mabipacket.varint as varint
-import binascii
+from Mabipacket.opcodes import GUILD_CHAT_OPCODE, REGISTRY, opcode_at
+from Mabipacket.packetview import PacketView
+
+# Guild chat opcode as it appears on the wire
+GUILD_OPCODE = GUILD_CHAT_OPCODE.to_bytes(4, "big")
 
 @dataclass
 class Parameter:
@@ -94,10 +98,12 @@ class Packet:
         if self.debug:
             print(f"Packet length: {pkt_len}, header_len: {header_len}, gap: {gap}, param_start: {param_start}")
 
-        if binascii.hexlify(self.opCode).decode("ascii") == "c36f0000":
-            # Guild packet - always 2 parameters (name, message)
-            self.paramCount = 2
-        else: 
+        # Registered opcodes (guild chat: name, message) carry their schema's
+        # parameters in this layout; anything else is not parsed
+        schema = REGISTRY.get(opcode_at(self.data, header_len))
+        if schema is not None and not schema.drop:
+            self.paramCount = schema.param_count
+        else:
             self.paramCount = 0
 
 
@@ -142,6 +148,10 @@ class Packet:
 
 def parse(data, debug) -> Packet | bool:
 
+    # Frames split out of a coalesced segment arrive as memoryview slices
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+
     if hex(data[0]) == hex(0x88): 
         if debug:
             print(f"Encrypted Packet:{data.hex()}")
@@ -155,12 +165,12 @@ def parse(data, debug) -> Packet | bool:
             print(f"Packet construction failed: {e}")
         return False
     
-    if packet.opCode.hex()=='0001d4c3': #NGS recv 7045000000000001d4c3
-        return False
-    
     # Too short/invalid packet - return False
     if packet._too_short:
         return False
+
+    if REGISTRY.is_dropped(opcode_at(packet.opCode, 0)): #NGS recv 7045000000000001d4c3
+        return False
     
     #check all parameters make sure they bytes, if not return false cause for some reason we failed to parse it
     for i in range(len(packet.parameters)):
@@ -176,3 +186,29 @@ def parse(data, debug) -> Packet | bool:
             print(f"Parameter{i} : [Type: '{packet.parameters[i].type}' Data(hex): '{''.join(f'/x{x:02x}' for x in packet.parameters[i].content)}' Name: '{packet.parameters[i].name}']")
 
     return packet
+
+
+def parse_view(data) -> PacketView | None:
+    """Zero-copy variant of parse(): returns a lazily decoded PacketView.
+
+    Same rules as parse() - None for encrypted, NGS and too short packets,
+    paramCount 0 for anything that is not guild chat.
+    """
+    buf = memoryview(data)
+    if len(buf) < 5 or buf[0] == 0x88:
+        return None
+
+    pkt_len = buf[3] | (buf[4] << 8)
+    header_len = 7 if pkt_len > 255 else 6
+    if len(buf) < header_len + 12:
+        return None
+
+    schema = REGISTRY.get(opcode_at(buf, header_len))
+    if schema is None:
+        return PacketView(buf, header_len, 0, 0)
+    if schema.drop:
+        return None
+
+    # header + opcode(4) + ID(8) + gap, gap = header_len - 5
+    param_start = header_len + 12 + header_len - 5
+    return PacketView(buf, header_len, param_start, schema.param_count, schema)
@@ -0,0 +1,175 @@
+"""Opcode registry shared by guildparser and standardparser.
+
+Each known opcode maps to an OpcodeSchema: a name, the parameter types it
+carries and whether packets with it are dropped outright (NGS). Schemas are
+compiled once, at registration, into SchemaDecoder - runs of fixed width
+parameters become a single precomputed struct.Struct - so decoding a known
+packet is one dict lookup on the integer opcode plus a few unpack_from calls.
+
+Every parameter on the wire is a type tag byte followed by its data: fixed
+width for types 0-5, a 2-byte big endian length plus data for string/bin.
+"""
+from dataclasses import dataclass, field
+import struct
+
+# Parameter type tags
+NONE = 0
+BYTE = 1
+SHORT = 2
+INT = 3
+LONG = 4
+FLOAT = 5
+STRING = 6
+BIN = 7
+
+# Type tag -> struct code of the value following the tag (None: tag only)
+_FIXED_CODES = {NONE: "", BYTE: "B", SHORT: "h", INT: "i", LONG: "q", FLOAT: "f"}
+# Integers are big endian, floats little endian (see guildparser.Parameter)
+_BYTE_ORDER = {NONE: ">", BYTE: ">", SHORT: ">", INT: ">", LONG: ">", FLOAT: "<"}
+
+_OPCODE = struct.Struct(">I")
+_TAG_AND_LENGTH = struct.Struct(">BH")
+
+GUILD_CHAT_OPCODE = 0xC36F0000
+NGS_OPCODE = 0x0001D4C3
+
+
+def opcode_at(buf, offset: int) -> int:
+    """Read the 4-byte big endian opcode at `offset` as an int."""
+    return _OPCODE.unpack_from(buf, offset)[0]
+
+
+class _FixedRun:
+    """Consecutive fixed width parameters decoded with one struct.Struct."""
+    __slots__ = ("struct", "tags", "layout")
+
+    def __init__(self, types: list[int]):
+        fmt = _BYTE_ORDER[types[0]]
+        # layout: (tag field index, value field index or None) per parameter
+        layout = []
+        index = 0
+        for t in types:
+            code = _FIXED_CODES[t]
+            fmt += "B" + code
+            layout.append((index, index + 1 if code else None))
+            index += 2 if code else 1
+        self.struct = struct.Struct(fmt)
+        self.tags = tuple(types)
+        self.layout = tuple(layout)
+
+
+class SchemaDecoder:
+    """Decoder for a fixed sequence of parameter types, compiled once."""
+    __slots__ = ("types", "_steps")
+
+    def __init__(self, types: tuple[int, ...]):
+        self.types = types
+        steps: list[_FixedRun | int] = []
+        run: list[int] = []
+        for t in types:
+            if t in (STRING, BIN):
+                if run:
+                    steps.append(_FixedRun(run))
+                    run = []
+                steps.append(t)
+            elif t in _FIXED_CODES:
+                if run and _BYTE_ORDER[run[0]] != _BYTE_ORDER[t]:
+                    steps.append(_FixedRun(run))
+                    run = []
+                run.append(t)
+            else:
+                raise ValueError(f"Unknown parameter type {t}")
+        if run:
+            steps.append(_FixedRun(run))
+        self._steps = tuple(steps)
+
+    def decode(self, buf, offset: int = 0) -> tuple[tuple, int] | None:
+        """Decode the parameters at `offset`.
+
+        Returns (values, end offset), or None when a type tag does not match
+        the schema or the buffer is too short.
+        """
+        end = len(buf)
+        values = []
+        for step in self._steps:
+            if isinstance(step, _FixedRun):
+                if offset + step.struct.size > end:
+                    return None
+                fields = step.struct.unpack_from(buf, offset)
+                for t, (tag_index, value_index) in zip(step.tags, step.layout, strict=True):
+                    if fields[tag_index] != t:
+                        return None
+                    values.append(None if value_index is None else fields[value_index])
+                offset += step.struct.size
+            else:
+                if offset + 3 > end:
+                    return None
+                tag, length = _TAG_AND_LENGTH.unpack_from(buf, offset)
+                start = offset + 3
+                offset = start + length
+                if tag != step or offset > end:
+                    return None
+                raw = buf[start:offset]
+                values.append(str(raw, "utf-8", "replace") if step == STRING else bytes(raw))
+        return tuple(values), offset
+
+
+@dataclass(frozen=True)
+class OpcodeSchema:
+    opcode: int
+    name: str
+    params: tuple[int, ...] = ()
+    fields: tuple[str, ...] = ()
+    drop: bool = False
+    decoder: SchemaDecoder = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.fields and len(self.fields) != len(self.params):
+            raise ValueError(f"{self.name}: {len(self.fields)} field names for {len(self.params)} parameters")
+        object.__setattr__(self, "decoder", SchemaDecoder(self.params))
+
+    @property
+    def param_count(self) -> int:
+        return len(self.params)
+
+    def decode(self, buf, offset: int = 0) -> dict | None:
+        """Decode into {field: value}, or None if the data does not fit the schema."""
+        result = self.decoder.decode(buf, offset)
+        if result is None:
+            return None
+        names = self.fields or tuple(f"param{i}" for i in range(len(self.params)))
+        return dict(zip(names, result[0], strict=True))
+
+
+class OpcodeRegistry:
+    """Integer opcode -> OpcodeSchema."""
+
+    def __init__(self, schemas: tuple[OpcodeSchema, ...] = ()):
+        self._schemas: dict[int, OpcodeSchema] = {}
+        for schema in schemas:
+            self.register(schema)
+
+    def register(self, schema: OpcodeSchema, replace: bool = False) -> OpcodeSchema:
+        if not replace and schema.opcode in self._schemas:
+            raise ValueError(f"Opcode {schema.opcode:08x} already registered as {self._schemas[schema.opcode].name}")
+        self._schemas[schema.opcode] = schema
+        return schema
+
+    def get(self, opcode: int) -> OpcodeSchema | None:
+        return self._schemas.get(opcode)
+
+    def is_dropped(self, opcode: int) -> bool:
+        schema = self._schemas.get(opcode)
+        return schema is not None and schema.drop
+
+    def __contains__(self, opcode: int) -> bool:
+        return opcode in self._schemas
+
+    def __len__(self) -> int:
+        return len(self._schemas)
+
+
+GUILD_CHAT = OpcodeSchema(GUILD_CHAT_OPCODE, "guild_chat", (STRING, STRING), ("name", "content"))
+NGS = OpcodeSchema(NGS_OPCODE, "ngs", drop=True)
+
+REGISTRY = OpcodeRegistry((GUILD_CHAT, NGS))
@@ -0,0 +1,151 @@
+"""Zero-copy, lazily decoded packet views.
+
+PacketView and ParameterView hold a memoryview over the frame plus offsets.
+Nothing is sliced or decoded up front: parameters are located on first
+access to ``parameters`` and each value is decoded on first access to
+``value``. For a registered opcode, values() decodes them all at once with
+the schema's compiled decoder instead; that is what PacketWorker reads.
+guildparser.parse_view and standardparser.parse_view both return
+this type; they only differ in where the parameters start and how many
+there are.
+"""
+import struct
+
+TYPE_NAMES = ("none", "byte", "short", "int", "long", "float", "string", "bin")
+
+# Parameter type -> payload size for fixed width types
+FIXED_SIZES = {0: 0, 1: 1, 2: 2, 3: 4, 4: 8, 5: 4}
+# String and bin carry a 2-byte big endian length before the data
+SIZED_TYPES = (6, 7)
+
+_FLOAT = struct.Struct("<f")
+_UNSET = object()
+
+
+class ParameterView:
+    __slots__ = ("_buf", "type", "_start", "_end", "_value")
+
+    def __init__(self, buf: memoryview, type_: int, start: int, end: int):
+        self._buf = buf
+        self.type = type_
+        self._start = start
+        self._end = end
+        self._value = _UNSET
+
+    @property
+    def name(self) -> str:
+        return TYPE_NAMES[self.type] if self.type < len(TYPE_NAMES) else "unknown"
+
+    @property
+    def content(self) -> memoryview:
+        return self._buf[self._start:self._end]
+
+    @property
+    def value(self):
+        if self._value is _UNSET:
+            self._value = self._decode()
+        return self._value
+
+    def _decode(self):
+        t = self.type
+        if t == 0:
+            return None
+        if t == 1:
+            return self._buf[self._start]
+        if t in (2, 3, 4):
+            return int.from_bytes(self._buf[self._start:self._end], "big", signed=True)
+        if t == 5:
+            # float assumed 4 bytes little-endian, as in guildparser
+            return _FLOAT.unpack_from(self._buf, self._start)[0]
+        if t == 6:
+            return str(self._buf[self._start:self._end], "utf-8", "replace")
+        return self._buf[self._start:self._end].tobytes()
+
+    def __repr__(self) -> str:
+        return f"ParameterView(type={self.type}, name={self.name!r}, content={self.content.hex()})"
+
+
+def walk_parameters(buf: memoryview, offset: int, count: int) -> list[ParameterView]:
+    """Locate `count` parameters starting at `offset` without decoding them.
+
+    Stops at an unknown type or when the buffer runs out. Sized (string/bin)
+    data running past the end is cut at the end of the buffer.
+    """
+    params = []
+    end = len(buf)
+    for _ in range(count):
+        if offset >= end:
+            break
+        t = buf[offset]
+        size = FIXED_SIZES.get(t)
+        if size is not None:
+            start = offset + 1
+            stop = start + size
+            if stop > end:
+                break
+        elif t in SIZED_TYPES:
+            if offset + 3 > end:
+                break
+            start = offset + 3
+            stop = min(start + ((buf[offset + 1] << 8) | buf[offset + 2]), end)
+        else:
+            break
+        params.append(ParameterView(buf, t, start, stop))
+        offset = stop
+    return params
+
+
+class PacketView:
+    __slots__ = ("_buf", "header_len", "param_start", "paramCount", "schema", "_parameters")
+
+    def __init__(self, buf: memoryview, header_len: int, param_start: int, param_count: int, schema=None):
+        self._buf = buf
+        self.header_len = header_len
+        self.param_start = param_start
+        self.paramCount = param_count
+        # Mabipacket.opcodes.OpcodeSchema when the opcode is registered
+        self.schema = schema
+        self._parameters: list[ParameterView] | None = None
+
+    @property
+    def data(self) -> memoryview:
+        return self._buf
+
+    @property
+    def header(self) -> memoryview:
+        return self._buf[:self.header_len]
+
+    @property
+    def opCode(self) -> memoryview:
+        return self._buf[self.header_len:self.header_len + 4]
+
+    @property
+    def opcode(self) -> int:
+        """Opcode as a big endian integer."""
+        return int.from_bytes(self.opCode, "big")
+
+    @property
+    def ID(self) -> memoryview:
+        return self._buf[self.header_len + 4:self.header_len + 12]
+
+    @property
+    def parameters(self) -> list[ParameterView]:
+        if self._parameters is None:
+            if self.paramCount:
+                self._parameters = walk_parameters(self._buf, self.param_start, self.paramCount)
+            else:
+                self._parameters = []
+        return self._parameters
+
+    def values(self) -> tuple | None:
+        """All parameter values at once via the schema's compiled decoder.
+
+        None when the opcode has no schema or the data does not match it.
+        """
+        if self.schema is None:
+            return None
+        result = self.schema.decoder.decode(self._buf, self.param_start)
+        return None if result is None else result[0]
+
+    def __repr__(self) -> str:
+        return f"PacketView(opCode={self.opCode.hex()}, paramCount={self.paramCount})"
@@ -1,6 +1,10 @@
 from dataclasses import dataclass, field
 import struct
 
+import Mabipacket.varint as varint
+from Mabipacket.opcodes import REGISTRY, opcode_at
+from Mabipacket.packetview import PacketView
+
 @dataclass
 class Parameter:
     type: int
@@ -29,24 +33,7 @@ class Parameter:
 
 def decode_varint(data, offset):
     """Decode varint and return (value, bytes_read)"""
-    result = 0
-    shift = 0
-    bytes_read = 0
-    
-    while bytes_read < 5:  # Max 5 bytes for uint32
-        if offset + bytes_read >= len(data):
-            raise ValueError("Unexpected end of data while reading varint")
-        
-        byte = data[offset + bytes_read]
-        bytes_read += 1
-        
-        result |= (byte & 0x7F) << shift
-        shift += 7
-        
-        if not (byte & 0x80):  # High bit not set = end of varint
-            break
-    
-    return result, bytes_read
+    return varint.decode_at(data, offset)
 
 
 @dataclass
@@ -75,14 +62,9 @@ class Packet:
         
         offset = 18
         
-        # Body length (varint)
+        # Body length and parameter count (varints)
         try:
-            body_length, varint_len = decode_varint(self.data, offset)
-            offset += varint_len
-            
-            # Parameter count (varint)
-            self.paramCount, varint_len = decode_varint(self.data, offset)
-            offset += varint_len
+            (body_length, self.paramCount), offset = varint.decode_many(self.data, 2, offset)
             
             # Skip the 0x00 separator
             offset += 1
@@ -172,7 +154,7 @@ def parse(data, debug, direction="unknown", port=0):
         return None
     
     # Filter out NGS packets
-    if packet.opCode.hex() == '0001d4c3':
+    if REGISTRY.is_dropped(opcode_at(packet.opCode, 0)):
         return None
     
     if debug:
@@ -182,4 +164,29 @@ def parse(data, debug, direction="unknown", port=0):
         for i, param in enumerate(packet.parameters):
             print(f"Parameter{i}: [Type: '{param.type}' Data(hex): '{param.content.hex()}' Name: '{param.name}']")
     
-    return packet
\ No newline at end of file
+    return packet
+
+def parse_view(data, debug=False) -> PacketView | None:
+    """Zero-copy variant of parse(): returns a lazily decoded PacketView."""
+    buf = memoryview(data)
+    if len(buf) < 18 or buf[0] == 0x88:
+        return None
+    schema = REGISTRY.get(opcode_at(buf, 6))
+    if schema is not None and schema.drop:
+        return None
+
+    offset = 18
+    try:
+        (_, param_count), offset = varint.decode_many(buf, 2, offset)
+        offset += 1  # skip the 0x00 separator
+    except ValueError as e:
+        if debug:
+            print(f"Failed to decode varints: {e}")
+        param_count = 0
+
+    if param_count > 1000:
+        if debug:
+            print(f"Suspicious param count: {param_count}, skipping parse")
+        param_count = 0
+
+    return PacketView(buf, 6, offset, param_count, schema)
@@ -12,7 +12,6 @@ Here's a quick and dirty module to help avoid reimplementing the same thing
 over and over again.
 """
 
-from io import BytesIO
 from math import ceil, log
 
 import sys
@@ -53,7 +52,76 @@ def decode_stream(stream):
 
 def decode_bytes(buf):
     """Read a varint from from `buf` bytes"""
-    return decode_stream(BytesIO(buf))
+    try:
+        # No uint32 limit here: encode() accepts any size
+        return decode_at(buf, 0, max_bytes=len(buf) + 1)[0]
+    except ValueError as e:
+        raise EOFError("Unexpected EOF while reading bytes") from e
+
+
+# Mabinogi varints are uint32: at most 5 bytes
+MAX_VARINT_LEN = 5
+
+
+def decode_at(buf, offset=0, max_bytes=MAX_VARINT_LEN):
+    """Read a varint at `offset` in a bytes/bytearray/memoryview `buf`.
+
+    Returns (value, bytes_read). Reads at most `max_bytes` bytes, like the
+    uint32 decoder standardparser used. Raises ValueError if `buf` ends
+    mid-varint.
+    """
+    try:
+        byte = buf[offset]
+    except IndexError:
+        raise ValueError("Unexpected end of data while reading varint") from None
+    if byte < 0x80:
+        return byte, 1
+
+    result = byte & 0x7f
+    shift = 7
+    pos = offset + 1
+    limit = offset + max_bytes
+    end = len(buf)
+    while pos < limit:
+        if pos >= end:
+            raise ValueError("Unexpected end of data while reading varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return result, pos - offset
+
+
+def decode_many(buf, count, offset=0):
+    """Read `count` consecutive varints starting at `offset`.
+
+    Returns (values, offset after the last one). Raises ValueError if `buf`
+    ends first.
+    """
+    values = []
+    try:
+        for _ in range(count):
+            byte = buf[offset]
+            offset += 1
+            if byte < 0x80:
+                values.append(byte)
+                continue
+            result = byte & 0x7f
+            shift = 7
+            limit = offset + MAX_VARINT_LEN - 1
+            while offset < limit:
+                byte = buf[offset]
+                offset += 1
+                result |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            values.append(result)
+    except IndexError:
+        raise ValueError("Unexpected end of data while reading varint") from None
+    return values, offset
 
 
 def _read_one(stream):
@@ -69,4 +137,3 @@ def _read_one(stream):
 def varint_len(varint):
     len = ceil(log(varint,128))
     return len
-
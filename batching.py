@@ -0,0 +1,90 @@
+"""Time-window batching of outgoing guild messages.
+
+MessageBatcher holds messages for up to `window` seconds after the first
+one arrives, or until `max_batch` have been collected, then hands them to
+`on_batch` as one list. Batches are handed over one at a time and in
+arrival order.
+"""
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+DEFAULT_BATCH_WINDOW = 0.25
+DEFAULT_MAX_BATCH = 10
+
+
+class MessageBatcher(Generic[T]):
+    def __init__(self, on_batch: Callable[[list[T]], None], window: float = DEFAULT_BATCH_WINDOW,
+                 max_batch: int = DEFAULT_MAX_BATCH, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._on_batch = on_batch
+        self._clock = clock
+        self._cond = threading.Condition()
+        # Held while a batch is taken and handed over, so batches never overtake each other
+        self._emit_lock = threading.Lock()
+        self._pending: list[T] = []
+        self._deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.batches = 0
+
+    def add(self, item: T) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MessageBatcher is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="message-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append(item)
+            if len(self._pending) == 1:
+                self._deadline = self._clock() + self.window
+                self._cond.notify()
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._emit()
+
+    def _emit(self) -> None:
+        with self._emit_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if batch:
+                self.batches += 1
+                self._on_batch(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending:
+                        remaining = self._deadline - self._clock()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                closed = self._closed
+            self._emit()
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """Hand over whatever is pending now."""
+        self._emit()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self._emit()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
@@ -0,0 +1,76 @@
+"""Micro-benchmark: guildparser.parse vs the lazy parse_view.
+
+Reads the two guild chat parameters the way PacketWorker does and reports
+time per packet and the memory a parsed packet keeps alive.
+
+    python benchmarks/bench_packet_view.py [-n ITERATIONS]
+"""
+import argparse
+import os
+import struct
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Mabipacket import guildparser  # noqa: E402
+
+
+def guild_frame(name: bytes, msg: bytes) -> bytes:
+    params = b""
+    for value in (name, msg):
+        params += b"\x06" + struct.pack(">H", len(value)) + value
+    header_len = 7 if 6 + 12 + 1 + len(params) > 255 else 6
+    gap = header_len - 5
+    length = header_len + 12 + gap + len(params)
+    header = b"\x00\x00\x00" + length.to_bytes(2, "little") + b"\x00" * (header_len - 5)
+    return header + guildparser.GUILD_OPCODE + b"\x00" * 8 + b"\x00" * gap + params
+
+
+def read_eager(frame):
+    packet = guildparser.parse(data=frame, debug=False)
+    packet.parameters[0].value, packet.parameters[1].value
+    return packet
+
+
+def read_view(frame):
+    packet = guildparser.parse_view(frame)
+    params = packet.parameters
+    params[0].value, params[1].value
+    return packet
+
+
+def retained_per_packet(fn, frame, count: int = 1000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [fn(frame) for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "lineno"))
+    del kept
+    return total / count
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--iterations", type=int, default=50_000)
+    args = ap.parse_args(argv)
+
+    frames = {
+        "short": guild_frame(b"Tester", b"hello guild"),
+        "long": guild_frame(b"Tester", ("long message " * 30).encode()),
+    }
+    for label, frame in frames.items():
+        assert [p.value for p in read_eager(frame).parameters] == [p.value for p in read_view(frame).parameters]
+        print(f"{label} frame ({len(frame)} bytes)")
+        for name, fn in (("parse", read_eager), ("parse_view", read_view)):
+            elapsed = timeit.timeit(lambda: fn(frame), number=args.iterations)
+            ns = elapsed / args.iterations * 1e9
+            kept = retained_per_packet(fn, frame)
+            print(f"  {name:<11} {ns:8.0f} ns/packet  {kept:8.0f} B retained/packet")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
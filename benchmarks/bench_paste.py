@@ -0,0 +1,49 @@
+"""Micro-benchmark: typing vs pasting chat lines into the game.
+
+Sends chat lines through ToClientWorker's write path with the fake input
+backend in realtime mode, which takes as long as the real keyboard would:
+xdotool's 12 ms per keystroke, one keystroke for the Ctrl+V chord, plus
+--clipboard-ms to put the text on the clipboard (an xclip process).
+Reports characters per second for both modes and each line length.
+
+    python benchmarks/bench_paste.py [-n ITERATIONS] [--clipboard-ms MS]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_backends import DEFAULT_TYPE_DELAY, FakeInputBackend  # noqa: E402
+from to_client_worker import ToClientWorker  # noqa: E402
+
+
+def chars_per_s(line: str, paste: bool, iterations: int, clipboard_time: float) -> float:
+    backend = FakeInputBackend(realtime=True, clipboard_time=clipboard_time)
+    worker = ToClientWorker(input_backend=backend, paste=paste)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        worker._write_line(line)
+    elapsed = time.perf_counter() - start
+    return len(line) * iterations / elapsed
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--iterations", type=int, default=5)
+    ap.add_argument("--clipboard-ms", type=float, default=5.0, help="time to set the clipboard")
+    args = ap.parse_args(argv)
+
+    print(f"{DEFAULT_TYPE_DELAY * 1e3:.0f} ms per keystroke, {args.clipboard_ms:.0f} ms to set the clipboard")
+    for length in (20, 40, 80):
+        line = ("guild chat text " * 8)[:length]
+        typed = chars_per_s(line, False, args.iterations, args.clipboard_ms / 1e3)
+        pasted = chars_per_s(line, True, args.iterations, args.clipboard_ms / 1e3)
+        print(f"  {length:>3} chars  type {typed:8.0f} chars/s  paste {pasted:8.0f} chars/s  "
+              f"({pasted / typed:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
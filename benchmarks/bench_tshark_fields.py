@@ -0,0 +1,123 @@
+"""Micro-benchmark: tshark fields lines vs pyshark PDML packets.
+
+The pyshark backend makes tshark print a full PDML (XML) dissection per
+packet, which pyshark parses into layer objects before payload_from_pyshark
+picks out tcp.payload. The tshark backend asks for just the fields it uses
+(-T fields) and splits one tab separated line. This times the Python side
+of both for the same guild chat packet and reports lines (packets) per
+second. The PDML here carries only the eth/ip/tcp layers; a real capture
+dissects more, so the pyshark figure is on the generous side.
+
+With --pcap (and tshark on PATH) both full pipelines are also run over a
+capture file, tshark process included.
+
+    python benchmarks/bench_tshark_fields.py [-n ITERATIONS] [--pcap FILE]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyshark.tshark.output_parser.tshark_xml import packet_from_xml_packet  # noqa: E402
+
+from capture_backends import payload_from_pyshark, record_from_fields, tshark_fields_command  # noqa: E402
+
+PAYLOAD = bytes(range(48, 48 + 75)) * 2
+
+
+def _field(name, show, value=""):
+    return f'<field name="{name}" showname="{name}: {show}" size="4" pos="0" show="{show}" value="{value}"/>'
+
+
+def pdml_packet(payload: bytes) -> bytes:
+    """A <packet> element shaped like tshark -T pdml output."""
+    hex_payload = payload.hex()
+    layers = [
+        ("geninfo", [_field("timestamp", "Nov 14, 2023 22:13:20.500000000 UTC"), _field("len", "204")]),
+        ("frame", [_field("frame.time_epoch", "1700000000.500000000"), _field("frame.len", "204"),
+                   _field("frame.protocols", "eth:ethertype:ip:tcp:data")]),
+        ("eth", [_field("eth.dst", "00:00:00:00:00:00", "000000000000"),
+                 _field("eth.src", "00:00:00:00:00:00", "000000000000"), _field("eth.type", "0x0800", "0800")]),
+        ("ip", [_field("ip.version", "4"), _field("ip.len", "190"), _field("ip.ttl", "64"),
+                _field("ip.proto", "6"), _field("ip.src", "54.214.176.167", "36d6b0a7"),
+                _field("ip.dst", "192.168.1.10", "c0a8010a")]),
+        ("tcp", [_field("tcp.srcport", "11020"), _field("tcp.dstport", "50000"), _field("tcp.stream", "3"),
+                 _field("tcp.len", str(len(payload))), _field("tcp.seq_raw", "1"), _field("tcp.ack_raw", "1"),
+                 _field("tcp.flags", "0x0018", "5018"), _field("tcp.window_size", "1024"),
+                 _field("tcp.payload", hex_payload, hex_payload)]),
+    ]
+    body = "".join(f'<proto name="{name}" showname="{name}" size="20" pos="0">{"".join(fields)}</proto>'
+                   for name, fields in layers)
+    return f"<packet>{body}</packet>".encode()
+
+
+def fields_line(payload: bytes) -> bytes:
+    return b"\t".join([b"1700000000.500000000", b"3", b"54.214.176.167", b"11020", b"192.168.1.10",
+                       b"50000", b"1", payload.hex().encode(), b""]) + b"\n"
+
+
+def pyshark_path(xml: bytes) -> bytes:
+    return payload_from_pyshark(packet_from_xml_packet(xml))
+
+
+def fields_path(line: bytes) -> bytes:
+    return record_from_fields(line).payload
+
+
+def run_pcap(path: str) -> None:
+    import pyshark
+
+    start = time.perf_counter()
+    count = 0
+    capture = pyshark.FileCapture(path, display_filter="tcp.len > 0")
+    try:
+        for packet in capture:
+            count += payload_from_pyshark(packet) is not None
+    finally:
+        capture.close()
+    elapsed = time.perf_counter() - start
+    print(f"  {'pyshark FileCapture':<22} {count / elapsed:10.0f} lines/s ({count} payloads, {elapsed:.2f}s)")
+
+    start = time.perf_counter()
+    count = 0
+    cmd = tshark_fields_command(path, read_file=True) + ["-Y", "tcp.len > 0"]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+        for line in proc.stdout:
+            count += record_from_fields(line) is not None
+    elapsed = time.perf_counter() - start
+    print(f"  {'tshark -T fields':<22} {count / elapsed:10.0f} lines/s ({count} payloads, {elapsed:.2f}s)")
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--iterations", type=int, default=20_000)
+    ap.add_argument("--pcap", help="also run both pipelines over this capture (needs tshark)")
+    args = ap.parse_args(argv)
+
+    xml = pdml_packet(PAYLOAD)
+    line = fields_line(PAYLOAD)
+    assert pyshark_path(xml) == fields_path(line) == PAYLOAD
+    print(f"per packet ({len(PAYLOAD)} byte payload, {len(xml)} bytes PDML vs {len(line)} bytes fields line)")
+    results = {}
+    for name, run, data in (("pyshark PDML", pyshark_path, xml), ("tshark fields", fields_path, line)):
+        elapsed = timeit.timeit(lambda: run(data), number=args.iterations)
+        results[name] = args.iterations / elapsed
+        print(f"  {name:<22} {elapsed / args.iterations * 1e6:8.1f} us/packet {results[name]:10.0f} lines/s")
+    print(f"  speedup {results['tshark fields'] / results['pyshark PDML']:.1f}x")
+
+    if args.pcap:
+        if shutil.which("tshark") is None:
+            print("tshark not found on PATH, skipping --pcap run")
+        else:
+            print(f"full pipeline over {args.pcap}")
+            run_pcap(args.pcap)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
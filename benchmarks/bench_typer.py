@@ -0,0 +1,66 @@
+"""Micro-benchmark: cost of typing one chat line into the game.
+
+Times to_client_worker.type_message (no sleeps) through an input backend:
+activate the window, Return, type the line, Return, Return. The default
+"fake" backend only records the calls and shows the typer's own overhead.
+Real backends send keystrokes to the focused window and need an X
+display - run them under Xvfb, e.g. with a dummy window named Mabinogi:
+
+    xvfb-run -a python benchmarks/bench_typer.py -b xdotool -b libxdo [-n ITERATIONS]
+
+It then types a long message split into --chunks lines, chunk by chunk
+and as one type_messages session, with the worker's delay_seconds pauses.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_backends import create_input_backend  # noqa: E402
+from to_client_worker import type_message, type_messages  # noqa: E402
+
+LINE = "[Alice] : hello from discord, this is a typical eighty character chat line!!"
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--iterations", type=int, default=100)
+    ap.add_argument("-b", "--backend", action="append", help="input backend(s) to time (default: fake)")
+    ap.add_argument("-c", "--chunks", type=int, default=5, help="chunks of the long message")
+    ap.add_argument("-d", "--delay", type=float, default=0.02, help="delay_seconds between steps")
+    args = ap.parse_args(argv)
+
+    print(f"{len(LINE)} character line, {args.iterations} messages, no keystroke delay")
+    for name in args.backend or ["fake"]:
+        try:
+            backend = create_input_backend(name)
+        except (OSError, ValueError) as e:
+            print(f"  {name:<10} unavailable: {e}")
+            continue
+        backend.type_delay = 0.0
+        try:
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                type_message(LINE, 0.0, backend)
+            elapsed = time.perf_counter() - start
+            print(f"  {backend.name:<10} {elapsed / args.iterations * 1e3:10.3f} ms/message")
+
+            chunks = [LINE] * args.chunks
+            start = time.perf_counter()
+            for chunk in chunks:
+                type_message(chunk, args.delay, backend)
+            one_by_one = time.perf_counter() - start
+            start = time.perf_counter()
+            type_messages(chunks, args.delay, backend)
+            session = time.perf_counter() - start
+            print(f"  {'':<10} {args.chunks} chunks at {args.delay * 1e3:.0f} ms delay: "
+                  f"{one_by_one * 1e3:.0f} ms one by one, {session * 1e3:.0f} ms in one session")
+        finally:
+            backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
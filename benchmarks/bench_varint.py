@@ -0,0 +1,92 @@
+"""Micro-benchmark: varint decoding.
+
+Compares the BytesIO based decoder and standardparser's old per-call loop
+with varint.decode_at / decode_many, decoding the two header varints
+(body length, parameter count) standardparser reads on every frame and a
+batch of 64.
+
+    python benchmarks/bench_varint.py [-n ITERATIONS]
+"""
+import argparse
+import os
+import sys
+import timeit
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Mabipacket import varint  # noqa: E402
+
+
+def bytesio_decode(buf, offset):
+    """Previous varint.decode_bytes: wraps the rest of the buffer in BytesIO."""
+    stream = BytesIO(buf[offset:])
+    value = varint.decode_stream(stream)
+    return value, stream.tell()
+
+
+def loop_decode(data, offset):
+    """Previous standardparser.decode_varint."""
+    result = 0
+    shift = 0
+    bytes_read = 0
+    while bytes_read < 5:
+        if offset + bytes_read >= len(data):
+            raise ValueError("Unexpected end of data while reading varint")
+        byte = data[offset + bytes_read]
+        bytes_read += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if not (byte & 0x80):
+            break
+    return result, bytes_read
+
+
+def two_at_a_time(decode):
+    def run(buf, offset):
+        body_length, read = decode(buf, offset)
+        count, read2 = decode(buf, offset + read)
+        return [body_length, count], offset + read + read2
+    return run
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", "--iterations", type=int, default=200_000)
+    args = ap.parse_args(argv)
+
+    headers = {
+        "small (1+1 bytes)": b"\x00" * 18 + varint.encode(40) + varint.encode(2) + b"\x00",
+        "large (2+1 bytes)": b"\x00" * 18 + varint.encode(900) + varint.encode(12) + b"\x00",
+    }
+    decoders = {
+        "BytesIO decode_bytes": two_at_a_time(bytesio_decode),
+        "old decode_varint": two_at_a_time(loop_decode),
+        "decode_at x2": two_at_a_time(varint.decode_at),
+        "decode_many": lambda buf, offset: varint.decode_many(buf, 2, offset),
+    }
+    for label, frame in headers.items():
+        expected = decoders["decode_many"](frame, 18)
+        print(f"{label}")
+        for name, decode in decoders.items():
+            assert decode(frame, 18) == expected, name
+            elapsed = timeit.timeit(lambda: decode(frame, 18), number=args.iterations)
+            print(f"  {name:<22} {elapsed / args.iterations * 1e9:8.0f} ns/frame")
+
+    batch = b"".join(varint.encode(v) for v in range(0, 64 * 300, 300))
+    print("batch of 64 varints")
+    for name, decode in (("decode_at loop", varint.decode_at), ("old decode_varint loop", loop_decode)):
+        def run(decode=decode):
+            offset = 0
+            for _ in range(64):
+                _, read = decode(batch, offset)
+                offset += read
+        elapsed = timeit.timeit(run, number=args.iterations // 64)
+        print(f"  {name:<22} {elapsed / (args.iterations // 64) * 1e9:8.0f} ns/batch")
+    elapsed = timeit.timeit(lambda: varint.decode_many(batch, 64), number=args.iterations // 64)
+    print(f"  {'decode_many':<22} {elapsed / (args.iterations // 64) * 1e9:8.0f} ns/batch")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+"""Build tests/corpus/parser_frames.json, the parser regression corpus.
+
+Writes the synthetic frames below and, with --pcap, appends the frames of a
+real capture (split per Mabinogi frame, first --limit of them).
+
+The expected results in tests/corpus/parser_golden.json come from the
+parsers as they were before any rewrite, not from the code under test: the
+guildparser, standardparser and varint modules of --golden-rev (default:
+the repository's first commit) are checked out into a temporary directory
+and run over the corpus in a separate interpreter. After changing the
+corpus regenerate goldens and the perf baseline:
+
+    python benchmarks/build_parser_corpus.py [--pcap capture.pcapng]
+    PARSER_PERF_UPDATE=1 uv run pytest tests/test_parser_perf.py
+"""
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Mabipacket import varint  # noqa: E402
+from Mabipacket.framing import split_frames  # noqa: E402
+from Mabipacket.opcodes import GUILD_CHAT_OPCODE, NGS_OPCODE  # noqa: E402
+
+CORPUS_PATH = os.path.join(ROOT, "tests", "corpus", "parser_frames.json")
+GOLDEN_PATH = os.path.join(ROOT, "tests", "corpus", "parser_golden.json")
+BASELINE_MODULES = ("guildparser.py", "standardparser.py", "varint.py")
+
+# Runs inside the baseline checkout; snapshot() must match tests/test_parser_perf.py
+_GOLDEN_SCRIPT = """
+import json, sys
+from Mabipacket import guildparser, standardparser
+
+def snapshot(result):
+    if not result:
+        return None
+    return {
+        "opCode": bytes(result.opCode).hex(),
+        "paramCount": result.paramCount,
+        "parameters": [[p.type, bytes(p.content).hex()] for p in result.parameters],
+    }
+
+golden = {"guildparser": {}, "standardparser": {}}
+for entry in json.load(sys.stdin):
+    data = bytes.fromhex(entry["hex"])
+    golden["guildparser"][entry["name"]] = snapshot(guildparser.parse(data, debug=False))
+    golden["standardparser"][entry["name"]] = snapshot(standardparser.parse(data, debug=False))
+json.dump(golden, sys.stdout)
+"""
+
+MOVE_OPCODE = 0x0000521D
+
+
+def header(length: int, header_len: int) -> bytes:
+    return b"\x70\x00\x00" + length.to_bytes(2, "little") + b"\x00" * (header_len - 5)
+
+
+def sized(tag: int, value: bytes) -> bytes:
+    return bytes([tag]) + struct.pack(">H", len(value)) + value
+
+
+def guild_frame(name: str, msg: str) -> bytes:
+    params = sized(6, name.encode()) + sized(6, msg.encode())
+    header_len = 7 if 6 + 13 + len(params) > 255 else 6
+    gap = header_len - 5
+    length = header_len + 12 + gap + len(params)
+    return header(length, header_len) + GUILD_CHAT_OPCODE.to_bytes(4, "big") + b"\x00\x10\x00\x00\x00\x01\x23\x45" + b"\x00" * gap + params
+
+
+def standard_frame(opcode: int, params: list[bytes]) -> bytes:
+    body = varint.encode(len(params)) + b"\x00" + b"".join(params)
+    rest = opcode.to_bytes(4, "big") + b"\x00\x10\x00\x00\x00\x00\x00\x07" + varint.encode(len(body)) + body
+    return header(6 + len(rest), 6) + rest
+
+
+def synthetic_frames() -> list[dict]:
+    long_guild = guild_frame("Longwinded", "a long guild message that needs the long header " * 6)
+    frames = [
+        ("guild_short", "short", guild_frame("Tester", "hello guild")),
+        ("guild_unicode", "short", guild_frame("테스터", "héllo 🦊 :foxspinn:")),
+        ("guild_empty_message", "short", guild_frame("Tester", "")),
+        ("guild_long_header", "long_header", long_guild),
+        ("guild_fragment_head", "fragment", long_guild[:64]),
+        ("guild_fragment_tail", "fragment", long_guild[64:]),
+        ("encrypted", "encrypted", b"\x88" + bytes(range(40))),
+        ("encrypted_long", "encrypted", b"\x88" + bytes(range(256)) * 2),
+        ("ngs", "filtered", standard_frame(NGS_OPCODE, [b"\x03\x00\x00\x00\x01"])),
+        ("movement", "standard", standard_frame(MOVE_OPCODE, [
+            b"\x03\x00\x00\x30\x39", b"\x03\x00\x00\x5b\xa0",
+            b"\x05" + struct.pack("<f", 1.5), b"\x04" + (123456789).to_bytes(8, "big"),
+            b"\x01\x02", b"\x02\xff\xfe", b"\x00",
+        ])),
+        ("standard_strings", "standard", standard_frame(0x00006D6F, [
+            sized(6, b"Tester"), sized(7, bytes(range(16))), sized(6, "짧은 메시지".encode()),
+        ])),
+        ("too_short", "truncated", b"\x70\x00\x00\x30"),
+    ]
+    return [{"name": name, "kind": kind, "hex": data.hex()} for name, kind, data in frames]
+
+
+def capture_frames(path: str, bpf_filter: str, limit: int) -> list[dict]:
+    from capture_backends import PcapFileBackend
+
+    frames = []
+    for payload in PcapFileBackend(path, bpf_filter).payloads():
+        for frame in split_frames(payload):
+            frames.append({"name": f"capture_{len(frames)}", "kind": "capture", "hex": bytes(frame).hex()})
+            if len(frames) >= limit:
+                return frames
+    return frames
+
+
+def first_commit() -> str:
+    out = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return out[-1]
+
+
+def baseline_golden(frames: list[dict], rev: str) -> dict:
+    """Parse `frames` with the parsers of git revision `rev`."""
+    with tempfile.TemporaryDirectory() as tmp:
+        package = os.path.join(tmp, "Mabipacket")
+        os.mkdir(package)
+        open(os.path.join(package, "__init__.py"), "w").close()
+        for name in BASELINE_MODULES:
+            source = subprocess.run(["git", "show", f"{rev}:Mabipacket/{name}"], cwd=ROOT,
+                                    capture_output=True, check=True).stdout
+            with open(os.path.join(package, name), "wb") as f:
+                f.write(source)
+        result = subprocess.run([sys.executable, "-c", _GOLDEN_SCRIPT], cwd=tmp, input=json.dumps(frames),
+                                capture_output=True, text=True, check=True,
+                                env={**os.environ, "PYTHONPATH": tmp})
+    return json.loads(result.stdout)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pcap", help="append frames from a real capture")
+    ap.add_argument("--filter", default="", help="host filter for --pcap, e.g. 'src host 54.214.176.167'")
+    ap.add_argument("--limit", type=int, default=200, help="max frames taken from --pcap")
+    ap.add_argument("--golden-rev", help="git revision whose parsers produce the goldens (default: first commit)")
+    ap.add_argument("-o", "--output", default=CORPUS_PATH)
+    ap.add_argument("--golden-output", default=GOLDEN_PATH)
+    args = ap.parse_args(argv)
+
+    frames = synthetic_frames()
+    if args.pcap:
+        frames += capture_frames(args.pcap, args.filter, args.limit)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(frames, f, indent=1)
+        f.write("\n")
+    print(f"Wrote {len(frames)} frames to {args.output}")
+
+    rev = args.golden_rev or first_commit()
+    with open(args.golden_output, "w", encoding="utf-8") as f:
+        json.dump(baseline_golden(frames, rev), f, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote goldens from the parsers at {rev} to {args.golden_output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,641 @@
+import binascii
+import ipaddress
+import logging
+import socket
+import struct
+import subprocess
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from typing import Optional
+
+import pyshark
+
+from capture_filters import attach_bpf, build_capture_program, guild_bpf_expression, matches_guild_opcode
+from tcp_reassembly import FlowKey, TcpReassembler
+
+
+logger = logging.getLogger(__name__)
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+IPPROTO_TCP = 6
+
+GUILD_ONLY_REASSEMBLY_ERROR = (
+    "The guild capture filter cannot be combined with native reassembly: "
+    "filtered segments leave holes that stall the whole flow"
+)
+
+_ETH_HEADER = struct.Struct("!6s6sH")
+_IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+_TCP_PORTS_SEQ = struct.Struct("!HHI")
+
+
+@dataclass(slots=True)
+class TcpSegment:
+    src: bytes
+    dst: bytes
+    sport: int
+    dport: int
+    seq: int
+    payload: bytes
+    # Capture time, seconds since the epoch; not part of segment identity
+    ts: float = field(default=0.0, compare=False)
+
+    @property
+    def flow(self) -> FlowKey:
+        return (self.src, self.sport, self.dst, self.dport)
+
+    @property
+    def flow_id(self) -> int:
+        return flow_id(self.src, self.sport, self.dst, self.dport)
+
+
+def flow_id(src: bytes, sport: int, dst: bytes, dport: int) -> int:
+    """The 4-tuple packed into one int: src ip | dst ip | sport | dport."""
+    return (int.from_bytes(src + dst, "big") << 32) | (sport << 16) | dport
+
+
+@dataclass(slots=True)
+class CaptureRecord:
+    """What the capture thread queues for the worker: ~100 bytes plus the payload.
+
+    `flow` is flow_id() of the TCP connection, 0 when the backend does not know it.
+    """
+    ts: float
+    flow: int
+    payload: bytes
+
+
+class CaptureBackend:
+    """Source of raw TCP payloads for the PacketSniffer.
+
+    Backends produce TcpSegments from ``segments()``; ``records()`` yields a
+    CaptureRecord per segment payload, or per complete frame cut by the
+    native TcpReassembler when native_reassembly is on, and ``payloads()``
+    just their bytes. With guild_only, segments
+    that do not start with a guild chat frame are dropped (see
+    capture_filters). The two do not combine: filtered segments leave
+    sequence holes the reassembler would wait on, so every later frame on
+    the flow would stall. ``close()`` may be called from another thread to
+    end iteration.
+    """
+    name = "base"
+
+    def __init__(self, interface: str, bpf_filter: str, native_reassembly: bool = False,
+                 guild_only: bool = False):
+        if guild_only and native_reassembly:
+            raise ValueError(GUILD_ONLY_REASSEMBLY_ERROR)
+        self.interface = interface
+        self.bpf_filter = bpf_filter
+        self.guild_only = guild_only
+        self.reassembler: Optional[TcpReassembler] = TcpReassembler() if native_reassembly else None
+
+    def segments(self) -> Iterator[TcpSegment]:
+        raise NotImplementedError
+
+    def records(self) -> Iterator[CaptureRecord]:
+        reassembler = self.reassembler
+        guild_only = self.guild_only
+        for segment in self.segments():
+            if guild_only and not matches_guild_opcode(segment.payload):
+                continue
+            flow = segment.flow_id
+            if reassembler is None:
+                yield CaptureRecord(segment.ts, flow, segment.payload)
+            else:
+                for frame in reassembler.feed(segment.flow, segment.seq, segment.payload):
+                    yield CaptureRecord(segment.ts, flow, frame)
+
+    def payloads(self) -> Iterator[bytes]:
+        for record in self.records():
+            yield record.payload
+
+    def close(self) -> None:
+        pass
+
+
+class PysharkBackend(CaptureBackend):
+    """Capture through pyshark/tshark.
+
+    By default tshark reassembles TCP streams. With native_reassembly tshark
+    desegmentation is turned off and segments go through TcpReassembler.
+    With guild_only the opcode match is compiled into the BPF filter.
+    """
+    name = "pyshark"
+
+    def __init__(self, interface: str, bpf_filter: str, native_reassembly: bool = False,
+                 guild_only: bool = False):
+        super().__init__(interface, bpf_filter, native_reassembly, guild_only)
+        self.capture: Optional[pyshark.LiveCapture] = None
+
+    def _packets(self, desegment: bool):
+        self.capture = pyshark.LiveCapture(
+            interface=self.interface,
+            bpf_filter=guild_bpf_expression(self.bpf_filter) if self.guild_only else self.bpf_filter,
+            override_prefs={"tcp.desegment_tcp_streams": "TRUE" if desegment else "FALSE"}
+        )
+        for packet in self.capture.sniff_continuously():
+            if 'TCP' not in packet:
+                continue
+            yield packet
+
+    def records(self) -> Iterator[CaptureRecord]:
+        if self.reassembler is not None:
+            yield from super().records()
+            return
+        for packet in self._packets(desegment=True):
+            # Only bytes leave this thread; the layer tree is dropped right here
+            payload = payload_from_pyshark(packet)
+            if payload:
+                yield CaptureRecord(_pyshark_ts(packet), _pyshark_flow_id(packet), payload)
+
+    def segments(self) -> Iterator[TcpSegment]:
+        for packet in self._packets(desegment=False):
+            segment = segment_from_pyshark(packet)
+            if segment is not None:
+                yield segment
+
+    def close(self) -> None:
+        if self.capture:
+            self.capture.close()
+
+
+def payload_from_pyshark(packet) -> Optional[bytes]:
+    """Extract TCP payload bytes from a pyshark packet.
+
+    Reassembled stream data (for fragmented long messages) wins over the
+    segment payload. Returns None if the packet carries neither.
+    """
+    tcp = getattr(packet, "tcp", None)
+    if tcp is None:
+        return None
+    reassembled = getattr(tcp, "reassembled_data", None)
+    if reassembled and isinstance(reassembled, str):
+        payload_hex = reassembled.replace(":", "")
+    else:
+        payload = getattr(tcp, "payload", None)
+        if not (payload and isinstance(payload, str)):
+            return None
+        payload_hex = payload.replace(":", "")
+    if not payload_hex:
+        return None
+    return binascii.unhexlify(payload_hex)
+
+
+def _pyshark_ts(packet) -> float:
+    try:
+        return float(packet.sniff_timestamp)
+    except (AttributeError, TypeError, ValueError):
+        return time.time()
+
+
+def _pyshark_flow_id(packet) -> int:
+    try:
+        return flow_id(ipaddress.IPv4Address(packet.ip.src).packed, int(packet.tcp.srcport),
+                       ipaddress.IPv4Address(packet.ip.dst).packed, int(packet.tcp.dstport))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+def segment_from_pyshark(packet) -> Optional[TcpSegment]:
+    """Build a TcpSegment from an undissected pyshark packet (segment payload only)."""
+    tcp = getattr(packet, "tcp", None)
+    ip = getattr(packet, "ip", None)
+    payload = getattr(tcp, "payload", None)
+    if ip is None or not (payload and isinstance(payload, str)):
+        return None
+    return TcpSegment(
+        src=ipaddress.IPv4Address(ip.src).packed,
+        dst=ipaddress.IPv4Address(ip.dst).packed,
+        sport=int(tcp.srcport),
+        dport=int(tcp.dstport),
+        seq=int(tcp.seq_raw),
+        payload=binascii.unhexlify(payload.replace(":", "")),
+        ts=_pyshark_ts(packet),
+    )
+
+
+# Fields the tshark backend asks for, in output column order
+TSHARK_FIELDS = (
+    "frame.time_epoch", "tcp.stream", "ip.src", "tcp.srcport", "ip.dst", "tcp.dstport",
+    "tcp.seq_raw", "tcp.payload", "tcp.reassembled.data",
+)
+# stderr lines of a tshark run kept for the error logged when it fails
+TSHARK_STDERR_LINES = 50
+
+
+def tshark_fields_command(source: str, bpf_filter: str = "", desegment: bool = True,
+                          tshark: str = "tshark", read_file: bool = False) -> list[str]:
+    """tshark command line printing TSHARK_FIELDS as one tab separated line per packet."""
+    cmd = [tshark, "-r" if read_file else "-i", source, "-l", "-n", "-Q",
+           "-o", f"tcp.desegment_tcp_streams:{'TRUE' if desegment else 'FALSE'}",
+           "-T", "fields", "-E", "separator=/t", "-E", "occurrence=f"]
+    if bpf_filter and not read_file:
+        cmd += ["-f", bpf_filter]
+    for name in TSHARK_FIELDS:
+        cmd += ["-e", name]
+    return cmd
+
+
+def _hex_bytes(value: bytes) -> bytes:
+    # Older tshark prints byte fields colon separated
+    if b":" in value:
+        value = value.replace(b":", b"")
+    return bytes.fromhex(value.decode("ascii"))
+
+
+def record_from_fields(line: bytes) -> Optional[CaptureRecord]:
+    """CaptureRecord from one tshark fields line; reassembled data wins over the segment payload."""
+    fields = line.rstrip(b"\r\n").split(b"\t")
+    if len(fields) != len(TSHARK_FIELDS):
+        return None
+    ts, _, src, sport, dst, dport, _, payload, reassembled = fields
+    data = reassembled or payload
+    if not data:
+        return None
+    try:
+        flow = flow_id(socket.inet_aton(src.decode("ascii")), int(sport),
+                       socket.inet_aton(dst.decode("ascii")), int(dport))
+        return CaptureRecord(float(ts), flow, _hex_bytes(data))
+    except (OSError, ValueError):
+        return None
+
+
+def segment_from_fields(line: bytes) -> Optional[TcpSegment]:
+    """TcpSegment (segment payload only) from one tshark fields line."""
+    fields = line.rstrip(b"\r\n").split(b"\t")
+    if len(fields) != len(TSHARK_FIELDS):
+        return None
+    ts, _, src, sport, dst, dport, seq, payload, _ = fields
+    if not payload:
+        return None
+    try:
+        return TcpSegment(socket.inet_aton(src.decode("ascii")), socket.inet_aton(dst.decode("ascii")),
+                          int(sport), int(dport), int(seq), _hex_bytes(payload), float(ts))
+    except (OSError, ValueError):
+        return None
+
+
+class TsharkFieldsBackend(CaptureBackend):
+    """Capture through a tshark subprocess printing only the fields we use.
+
+    Skips pyshark entirely: tshark writes one tab separated line per packet
+    (``-T fields``), which is split and hex decoded here. No PDML, no layer
+    objects. Reassembly and guild_only work like the pyshark backend.
+    ``lines_read`` / ``lines_per_s`` report the ingest rate.
+    """
+    name = "tshark"
+
+    def __init__(self, interface: str, bpf_filter: str, native_reassembly: bool = False,
+                 guild_only: bool = False, tshark: str = "tshark"):
+        super().__init__(interface, bpf_filter, native_reassembly, guild_only)
+        self.tshark = tshark
+        self._proc: Optional[subprocess.Popen] = None
+        # Last lines tshark wrote to stderr, kept for the exit error
+        self._stderr_tail: deque[bytes] = deque(maxlen=TSHARK_STDERR_LINES)
+        self.lines_read = 0
+        self._started = 0.0
+        self._stopped = 0.0
+
+    def _lines(self, desegment: bool) -> Iterator[bytes]:
+        bpf_filter = guild_bpf_expression(self.bpf_filter) if self.guild_only else self.bpf_filter
+        cmd = tshark_fields_command(self.interface, bpf_filter, desegment, self.tshark)
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._started = time.perf_counter()
+        assert self._proc.stdout is not None
+        # Read stderr as it comes: a full pipe would block tshark and stall the capture
+        drain = threading.Thread(target=self._drain_stderr, args=(self._proc.stderr,),
+                                 name="tshark-stderr", daemon=True)
+        drain.start()
+        try:
+            for line in self._proc.stdout:
+                self.lines_read += 1
+                yield line
+        finally:
+            self._stopped = time.perf_counter()
+            self.close()
+            self._proc.wait()
+            drain.join(timeout=1.0)
+            if self._proc.returncode:
+                error = b"".join(self._stderr_tail).decode(errors="replace").strip()
+                if error:
+                    logger.error(f"tshark exited with {self._proc.returncode}: {error}")
+            logger.info(f"tshark backend read {self.lines_read} lines ({self.lines_per_s:.0f} lines/s)")
+
+    def _drain_stderr(self, stderr) -> None:
+        if stderr is None:
+            return
+        for line in stderr:
+            self._stderr_tail.append(line)
+
+    @property
+    def lines_per_s(self) -> float:
+        elapsed = (self._stopped or time.perf_counter()) - self._started if self._started else 0.0
+        return self.lines_read / elapsed if elapsed > 0 else 0.0
+
+    def records(self) -> Iterator[CaptureRecord]:
+        if self.reassembler is not None:
+            yield from super().records()
+            return
+        for line in self._lines(desegment=True):
+            record = record_from_fields(line)
+            if record is not None:
+                yield record
+
+    def segments(self) -> Iterator[TcpSegment]:
+        for line in self._lines(desegment=False):
+            segment = segment_from_fields(line)
+            if segment is not None:
+                yield segment
+
+    def close(self) -> None:
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+
+
+def parse_host_filter(bpf_filter: str) -> Optional[tuple[str, bytes]]:
+    """Parse a simple ``[src|dst] host A.B.C.D`` BPF expression.
+
+    Returns (direction, packed IPv4 address), direction being "src", "dst"
+    or "any". Returns None for anything more complex.
+    """
+    parts = bpf_filter.split()
+    if len(parts) == 2 and parts[0] == "host":
+        direction, host = "any", parts[1]
+    elif len(parts) == 3 and parts[0] in ("src", "dst") and parts[1] == "host":
+        direction, host = parts[0], parts[2]
+    else:
+        return None
+    try:
+        return direction, ipaddress.IPv4Address(host).packed
+    except ValueError:
+        return None
+
+
+def tcp_segment_from_frame(frame: bytes) -> Optional[TcpSegment]:
+    """Extract the TCP segment from an Ethernet frame.
+
+    Handles a single 802.1Q VLAN tag and trims Ethernet padding using the IPv4
+    total length. Returns None for non-IPv4/TCP frames and truncated frames.
+    """
+    if len(frame) < _ETH_HEADER.size:
+        return None
+    _, _, ethertype = _ETH_HEADER.unpack_from(frame, 0)
+    offset = _ETH_HEADER.size
+    if ethertype == ETH_P_8021Q:
+        if len(frame) < offset + 4:
+            return None
+        ethertype = int.from_bytes(frame[offset + 2:offset + 4], "big")
+        offset += 4
+    if ethertype != ETH_P_IP:
+        return None
+    return tcp_segment_from_ip(frame, offset)
+
+
+def tcp_segment_from_ip(frame: bytes, offset: int = 0) -> Optional[TcpSegment]:
+    """Extract the TCP segment from an IPv4 packet at `offset`."""
+    if len(frame) < offset + _IPV4_HEADER.size:
+        return None
+    version_ihl, _, total_length, _, _, _, protocol, _, src, dst = _IPV4_HEADER.unpack_from(frame, offset)
+    if version_ihl >> 4 != 4 or protocol != IPPROTO_TCP:
+        return None
+    ip_end = min(len(frame), offset + total_length)
+    tcp_start = offset + (version_ihl & 0x0F) * 4
+    if tcp_start + 20 > ip_end:
+        return None
+    sport, dport, seq = _TCP_PORTS_SEQ.unpack_from(frame, tcp_start)
+    payload_start = tcp_start + (frame[tcp_start + 12] >> 4) * 4
+    if payload_start > ip_end:
+        return None
+    return TcpSegment(src, dst, sport, dport, seq, frame[payload_start:ip_end])
+
+
+class HostFilter:
+    """Applies a parsed ``[src|dst] host`` filter to IPv4 addresses."""
+
+    def __init__(self, bpf_filter: str, backend_name: str):
+        self._host_filter = parse_host_filter(bpf_filter) if bpf_filter else None
+        if bpf_filter and self._host_filter is None:
+            logger.warning(f"{backend_name} backend cannot apply filter '{bpf_filter}', capturing all TCP")
+
+    @property
+    def spec(self) -> Optional[tuple[str, bytes]]:
+        """The parsed (direction, address) filter, None when not filtering."""
+        return self._host_filter
+
+    def matches(self, src: bytes, dst: bytes) -> bool:
+        if self._host_filter is None:
+            return True
+        direction, host = self._host_filter
+        if direction == "src":
+            return src == host
+        if direction == "dst":
+            return dst == host
+        return host in (src, dst)
+
+
+class AFPacketBackend(CaptureBackend):
+    """Capture straight from a Linux AF_PACKET socket, no tshark involved.
+
+    Only simple ``[src|dst] host`` filters are supported; any other
+    bpf_filter is ignored with a warning. The host (and with guild_only, the
+    guild opcode) match is attached to the socket as classic BPF so the kernel
+    drops everything else. Requires CAP_NET_RAW. Long messages split over
+    segments are only joined with native_reassembly.
+    """
+    name = "afpacket"
+    recv_size = 65535
+    poll_interval = 0.5
+
+    def __init__(self, interface: str, bpf_filter: str, native_reassembly: bool = False,
+                 guild_only: bool = False):
+        super().__init__(interface, bpf_filter, native_reassembly, guild_only)
+        self._host_filter = HostFilter(bpf_filter, self.name)
+        self._sock: Optional[socket.socket] = None
+        self._closed = False
+
+    def segments(self) -> Iterator[TcpSegment]:
+        self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))  # type: ignore[attr-defined]
+        self._sock.bind((self.interface, 0))
+        self._sock.settimeout(self.poll_interval)
+        try:
+            attach_bpf(self._sock, build_capture_program(self._host_filter.spec, self.guild_only))
+        except OSError as e:
+            logger.warning(f"Could not attach BPF program, filtering in Python: {e}")
+        try:
+            while not self._closed:
+                try:
+                    frame = self._sock.recv(self.recv_size)
+                except TimeoutError:
+                    continue
+                except OSError:
+                    if self._closed:
+                        break
+                    raise
+                segment = tcp_segment_from_frame(frame)
+                if segment is None:
+                    continue
+                if segment.payload and self._host_filter.matches(segment.src, segment.dst):
+                    segment.ts = time.time()
+                    yield segment
+        finally:
+            self._sock.close()
+
+    def close(self) -> None:
+        self._closed = True
+
+
+class IterableBackend(CaptureBackend):
+    """Replays a fixed sequence of payloads; used for tests and offline runs."""
+    name = "iterable"
+
+    def __init__(self, payloads: Iterable[bytes], interface: str = "", bpf_filter: str = ""):
+        super().__init__(interface, bpf_filter)
+        self._payloads = payloads
+        self._closed = False
+
+    def records(self) -> Iterator[CaptureRecord]:
+        for payload in self._payloads:
+            if self._closed:
+                break
+            yield CaptureRecord(time.time(), 0, payload)
+
+    def close(self) -> None:
+        self._closed = True
+
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_IPV4 = 228
+
+
+def read_pcap_frames(path: str) -> Iterator[tuple[int, float, bytes]]:
+    """Yield (linktype, timestamp, frame) from a pcap or pcapng file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] in PCAP_MAGIC:
+        yield from _read_pcap(data)
+    elif len(data) >= 4 and int.from_bytes(data[:4], "little") == PCAPNG_SHB:
+        yield from _read_pcapng(data)
+    else:
+        raise ValueError(f"{path} is not a pcap or pcapng file")
+
+
+def _read_pcap(data: bytes) -> Iterator[tuple[int, float, bytes]]:
+    endian, ts_unit = PCAP_MAGIC[data[:4]]
+    linktype = struct.unpack_from(f"{endian}I", data, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(f"{endian}IIII")
+    offset = 24
+    while offset + record.size <= len(data):
+        ts_sec, ts_frac, incl_len, _ = record.unpack_from(data, offset)
+        offset += record.size
+        yield linktype, ts_sec + ts_frac * ts_unit, data[offset:offset + incl_len]
+        offset += incl_len
+
+
+def _read_pcapng(data: bytes) -> Iterator[tuple[int, float, bytes]]:
+    endian = "<"
+    interfaces: list[tuple[int, float]] = []
+    offset = 0
+    while offset + 12 <= len(data):
+        block_type = struct.unpack_from(f"{endian}I", data, offset)[0]
+        if block_type == PCAPNG_SHB:
+            # Byte order magic decides the endianness of this section
+            endian = "<" if struct.unpack_from("<I", data, offset + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+            interfaces = []
+        block_len = struct.unpack_from(f"{endian}I", data, offset + 4)[0]
+        if block_len < 12:
+            raise ValueError(f"Corrupt pcapng block at offset {offset}")
+        body = offset + 8
+        if block_type == PCAPNG_IDB:
+            linktype = struct.unpack_from(f"{endian}H", data, body)[0]
+            interfaces.append((linktype, _pcapng_ts_unit(data, body + 8, offset + block_len - 4, endian)))
+        elif block_type == PCAPNG_EPB:
+            if_id, ts_high, ts_low, cap_len, _ = struct.unpack_from(f"{endian}IIIII", data, body)
+            linktype, ts_unit = interfaces[if_id]
+            frame_start = body + 20
+            yield linktype, ((ts_high << 32) | ts_low) * ts_unit, data[frame_start:frame_start + cap_len]
+        offset += block_len
+
+
+def _pcapng_ts_unit(data: bytes, offset: int, end: int, endian: str) -> float:
+    """Read the if_tsresol option of an interface block (default microseconds)."""
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(f"{endian}HH", data, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            resol = data[offset + 4]
+            return 2.0 ** -(resol & 0x7F) if resol & 0x80 else 10.0 ** -resol
+        offset += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+class PcapFileBackend(CaptureBackend):
+    """Reads TCP payloads from a saved pcap/pcapng file as fast as possible.
+
+    `interface` is the file path. Applies simple host filters, guild_only and
+    native reassembly like the afpacket backend, in Python.
+    """
+    name = "pcap"
+
+    def __init__(self, interface: str, bpf_filter: str, native_reassembly: bool = False,
+                 guild_only: bool = False):
+        super().__init__(interface, bpf_filter, native_reassembly, guild_only)
+        self._host_filter = HostFilter(bpf_filter, self.name)
+        self._closed = False
+        self.frames_read = 0
+
+    def segments(self) -> Iterator[TcpSegment]:
+        for linktype, ts, frame in read_pcap_frames(self.interface):
+            if self._closed:
+                break
+            self.frames_read += 1
+            if linktype == LINKTYPE_ETHERNET:
+                segment = tcp_segment_from_frame(frame)
+            elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4):
+                segment = tcp_segment_from_ip(frame)
+            else:
+                continue
+            if segment is None:
+                continue
+            if segment.payload and self._host_filter.matches(segment.src, segment.dst):
+                segment.ts = ts
+                yield segment
+
+    def close(self) -> None:
+        self._closed = True
+
+
+CAPTURE_BACKENDS: dict[str, type[CaptureBackend]] = {
+    PysharkBackend.name: PysharkBackend,
+    TsharkFieldsBackend.name: TsharkFieldsBackend,
+    AFPacketBackend.name: AFPacketBackend,
+    PcapFileBackend.name: PcapFileBackend,
+}
+
+
+def create_capture_backend(name: str, interface: str, bpf_filter: str,
+                           native_reassembly: bool = False, guild_only: bool = False) -> CaptureBackend:
+    """Build a capture backend by name ("pyshark", "tshark", "afpacket" or "pcap")."""
+    try:
+        backend_cls = CAPTURE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown capture backend '{name}', expected one of: {', '.join(CAPTURE_BACKENDS)}"
+        ) from None
+    return backend_cls(interface, bpf_filter, native_reassembly, guild_only)
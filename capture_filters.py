@@ -0,0 +1,166 @@
+"""Capture filters that only let candidate guild chat frames through.
+
+The guild opcode sits right after the Mabinogi header: at payload offset 6,
+or 7 when the length field (bytes 3-4) is over 255 and the header grows a
+byte - the offsets guildparser.Packet uses. Matching it in the capture layer
+keeps movement/combat traffic from ever reaching Python.
+
+Trade-off: only the first frame of a segment is looked at. Continuation
+segments of a long message and guild frames coalesced behind another frame
+are dropped by the filter, so it is opt-in (GUILD_CAPTURE_FILTER). It
+also cannot be used with NATIVE_REASSEMBLY: the dropped segments are holes
+in the TCP stream, and the reassembler would hold every later frame of the
+flow waiting for them.
+"""
+import ctypes
+import socket
+import struct
+from typing import Optional
+
+from Mabipacket.guildparser import GUILD_OPCODE
+
+
+SO_ATTACH_FILTER = 26
+
+# Classic BPF opcodes (linux/filter.h)
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_LD_B_ABS = 0x30
+BPF_LD_W_IND = 0x40
+BPF_LD_B_IND = 0x50
+BPF_LDX_B_MSH = 0xB1
+BPF_ALU_AND_K = 0x54
+BPF_ALU_RSH_K = 0x74
+BPF_ALU_ADD_X = 0x0C
+BPF_MISC_TAX = 0x07
+BPF_JMP_JEQ_K = 0x15
+BPF_JMP_JSET_K = 0x45
+BPF_RET_K = 0x06
+
+# Ethernet frame offsets
+ETH_LEN = 14
+IP_PROTO_OFF = ETH_LEN + 9
+IP_FRAG_OFF = ETH_LEN + 6
+IP_SRC_OFF = ETH_LEN + 12
+IP_DST_OFF = ETH_LEN + 16
+
+SNAPLEN = 0xFFFF
+
+# (code, jt, jf, k)
+BpfInsn = tuple[int, int, int, int]
+
+
+def _opcode_word() -> int:
+    return int.from_bytes(GUILD_OPCODE, "big")
+
+
+def matches_guild_opcode(payload) -> bool:
+    """Python version of the capture filter: does `payload` start a guild frame?"""
+    if len(payload) < 5:
+        return False
+    offset = 7 if payload[4] else 6
+    return payload[offset:offset + 4] == GUILD_OPCODE
+
+
+def guild_bpf_expression(base_filter: str = "") -> str:
+    """libpcap filter expression matching the guild opcode, ANDed with `base_filter`."""
+    payload = "((tcp[12:1] & 0xf0) >> 2)"
+    opcode = f"0x{_opcode_word():08x}"
+    expr = (
+        f"tcp and ((tcp[{payload} + 4:1] = 0 and tcp[{payload} + 6:4] = {opcode})"
+        f" or (tcp[{payload} + 4:1] != 0 and tcp[{payload} + 7:4] = {opcode}))"
+    )
+    return f"({base_filter}) and {expr}" if base_filter else expr
+
+
+def guild_display_filter() -> str:
+    """tshark display filter matching the guild opcode in the TCP payload."""
+    opcode = GUILD_OPCODE.hex(":")
+    return (
+        f"(tcp.payload[4] == 00 && tcp.payload[6:4] == {opcode})"
+        f" || (tcp.payload[4] != 00 && tcp.payload[7:4] == {opcode})"
+    )
+
+
+class _Assembler:
+    """Tiny classic BPF assembler with forward-only labels."""
+
+    def __init__(self):
+        self._insns: list[tuple[int, object, object, int]] = []
+        self._labels: dict[str, int] = {}
+
+    def op(self, code: int, k: int = 0, jt: object = 0, jf: object = 0) -> None:
+        self._insns.append((code, jt, jf, k))
+
+    def label(self, name: str) -> None:
+        self._labels[name] = len(self._insns)
+
+    def assemble(self) -> list[BpfInsn]:
+        program = []
+        for pc, (code, jt, jf, k) in enumerate(self._insns):
+            program.append((code, self._target(jt, pc), self._target(jf, pc), k))
+        return program
+
+    def _target(self, target: object, pc: int) -> int:
+        if isinstance(target, str):
+            return self._labels[target] - pc - 1
+        return int(target)  # type: ignore[call-overload]
+
+
+def build_capture_program(host_filter: Optional[tuple[str, bytes]], guild_only: bool) -> list[BpfInsn]:
+    """Classic BPF program for an AF_PACKET socket.
+
+    Accepts IPv4/TCP (non-fragment) Ethernet frames, optionally from/to the
+    parsed host filter (see capture_backends.parse_host_filter) and optionally
+    only those whose payload starts with a guild chat frame.
+    """
+    a = _Assembler()
+    a.op(BPF_LD_H_ABS, 12)
+    a.op(BPF_JMP_JEQ_K, 0x0800, jf="drop")
+    a.op(BPF_LD_B_ABS, IP_PROTO_OFF)
+    a.op(BPF_JMP_JEQ_K, 6, jf="drop")
+    a.op(BPF_LD_H_ABS, IP_FRAG_OFF)
+    a.op(BPF_JMP_JSET_K, 0x1FFF, jt="drop")
+
+    if host_filter is not None:
+        direction, host = host_filter
+        host_word = int.from_bytes(host, "big")
+        if direction == "any":
+            a.op(BPF_LD_W_ABS, IP_SRC_OFF)
+            a.op(BPF_JMP_JEQ_K, host_word, jt="host_ok")
+            a.op(BPF_LD_W_ABS, IP_DST_OFF)
+            a.op(BPF_JMP_JEQ_K, host_word, jf="drop")
+            a.label("host_ok")
+        else:
+            a.op(BPF_LD_W_ABS, IP_SRC_OFF if direction == "src" else IP_DST_OFF)
+            a.op(BPF_JMP_JEQ_K, host_word, jf="drop")
+
+    if guild_only:
+        # X = IP header length, A = TCP header length, X = offset of payload from ETH_LEN
+        a.op(BPF_LDX_B_MSH, ETH_LEN)
+        a.op(BPF_LD_B_IND, ETH_LEN + 12)
+        a.op(BPF_ALU_AND_K, 0xF0)
+        a.op(BPF_ALU_RSH_K, 2)
+        a.op(BPF_ALU_ADD_X)
+        a.op(BPF_MISC_TAX)
+        a.op(BPF_LD_B_IND, ETH_LEN + 4)
+        a.op(BPF_JMP_JEQ_K, 0, jf="long_header")
+        a.op(BPF_LD_W_IND, ETH_LEN + 6)
+        a.op(BPF_JMP_JEQ_K, _opcode_word(), jt="accept", jf="drop")
+        a.label("long_header")
+        a.op(BPF_LD_W_IND, ETH_LEN + 7)
+        a.op(BPF_JMP_JEQ_K, _opcode_word(), jf="drop")
+
+    a.label("accept")
+    a.op(BPF_RET_K, SNAPLEN)
+    a.label("drop")
+    a.op(BPF_RET_K, 0)
+    return a.assemble()
+
+
+def attach_bpf(sock: socket.socket, program: list[BpfInsn]) -> None:
+    """Attach a classic BPF program to a socket (SO_ATTACH_FILTER)."""
+    insns = b"".join(struct.pack("HBBI", *insn) for insn in program)
+    buf = ctypes.create_string_buffer(insns)
+    fprog = struct.pack("HP", len(program), ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
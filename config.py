@@ -15,6 +15,24 @@ class AppConfig:
     bpf_filter: str
     queue_maxsize: int = 1000
     delay_seconds: float = 0.02
+    input_backend: str = "auto"
+    echo_timeout: float = 0.0
+    echo_retypes: int = 1
+    paste_mode: bool = False
+    capture_backend: str = "pyshark"
+    native_reassembly: bool = False
+    guild_capture_filter: bool = False
+    dedupe_window: float = 0.0
+    webhook_concurrency: int = 4
+    batch_window: float = 0.0
+    batch_max_messages: int = 10
+    extra_webhook_urls: tuple[str, ...] = ()
+    spool_path: str = ""
+    retry_max_attempts: int = 5
+    dead_letter_path: str = ""
+    capture_process: bool = False
+    ring_size: int = 4 * 1024 * 1024
+    parse_processes: int = 0
 
 
 def load_config() -> AppConfig:
@@ -28,7 +46,7 @@ def load_config() -> AppConfig:
     if missing:
         raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
 
-    return AppConfig(
+    config = AppConfig(
         discord_webhook_url=os.environ["DISCORD_WEB_HOOK"],
         discord_token=os.environ["DISCORD_TOKEN"],
         target_channel_id=int(os.environ["TARGET_CHANNEL_ID"]),
@@ -39,7 +57,28 @@ def load_config() -> AppConfig:
         bpf_filter=os.getenv("BPF_FILTER", "src host 54.214.176.167"),
         queue_maxsize=1000,
         delay_seconds=0.02,
+        input_backend=os.getenv("INPUT_BACKEND", "auto"),
+        echo_timeout=float(os.getenv("ECHO_TIMEOUT", "0")),
+        echo_retypes=int(os.getenv("ECHO_RETYPES", "1")),
+        paste_mode=os.getenv("PASTE_MODE", "false").lower() in ("1", "true", "yes"),
+        capture_backend=os.getenv("CAPTURE_BACKEND", "pyshark"),
+        native_reassembly=os.getenv("NATIVE_REASSEMBLY", "false").lower() in ("1", "true", "yes"),
+        guild_capture_filter=os.getenv("GUILD_CAPTURE_FILTER", "false").lower() in ("1", "true", "yes"),
+        dedupe_window=float(os.getenv("DEDUPE_WINDOW", "0")),
+        webhook_concurrency=int(os.getenv("WEBHOOK_CONCURRENCY", "4")),
+        batch_window=float(os.getenv("BATCH_WINDOW", "0")),
+        batch_max_messages=int(os.getenv("BATCH_MAX_MESSAGES", "10")),
+        extra_webhook_urls=tuple(u.strip() for u in os.getenv("DISCORD_WEB_HOOKS", "").split(",") if u.strip()),
+        spool_path=os.getenv("SPOOL_PATH", ""),
+        retry_max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "5")),
+        dead_letter_path=os.getenv("DEAD_LETTER_PATH", ""),
+        capture_process=os.getenv("CAPTURE_PROCESS", "false").lower() in ("1", "true", "yes"),
+        ring_size=int(os.getenv("RING_SIZE", str(4 * 1024 * 1024))),
+        parse_processes=int(os.getenv("PARSE_PROCESSES", "0")),
     )
+    if config.guild_capture_filter and config.native_reassembly:
+        raise ValueError("GUILD_CAPTURE_FILTER cannot be combined with NATIVE_REASSEMBLY")
+    return config
 
 
 def create_sniffer_config(config: AppConfig):
@@ -51,6 +90,20 @@ def create_sniffer_config(config: AppConfig):
         bot_name=config.bot_name,
         queue_maxsize=config.queue_maxsize,
         bpf_filter=config.bpf_filter,
+        capture_backend=config.capture_backend,
+        native_reassembly=config.native_reassembly,
+        guild_capture_filter=config.guild_capture_filter,
+        dedupe_window=config.dedupe_window,
+        webhook_concurrency=config.webhook_concurrency,
+        batch_window=config.batch_window,
+        batch_max_messages=config.batch_max_messages,
+        extra_webhook_urls=config.extra_webhook_urls,
+        spool_path=config.spool_path,
+        retry_max_attempts=config.retry_max_attempts,
+        dead_letter_path=config.dead_letter_path,
+        capture_process=config.capture_process,
+        ring_size=config.ring_size,
+        parse_processes=config.parse_processes,
     )
 
 
@@ -61,4 +114,8 @@ def create_typer_config(config: AppConfig):
         target_channel_id=config.target_channel_id,
         guild_id=config.guild_id,
         delay_seconds=config.delay_seconds,
+        input_backend=config.input_backend,
+        echo_timeout=config.echo_timeout,
+        echo_retypes=config.echo_retypes,
+        paste_mode=config.paste_mode,
     )
\ No newline at end of file
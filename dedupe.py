@@ -0,0 +1,71 @@
+"""Suppression of repeated guild chat frames.
+
+With tshark desegmentation on, a message can arrive once as a segment
+payload and again inside reassembled_data, and TCP retransmits add more
+copies. DedupeCache remembers a hash of every frame seen in the last
+`window` seconds so repeats are dropped before parsing and before they
+cost a webhook call.
+
+The key is the frame content, so the same person sending the exact same
+line twice within the window is also dropped. That is why it is off unless
+a window is configured (DEDUPE_WINDOW); DEFAULT_WINDOW is a sensible one
+when tshark hands over both copies.
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+DEFAULT_WINDOW = 2.0
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def frame_key(frame) -> int:
+    """Fast 64-bit key for a frame (bytes hash, computed in C)."""
+    return hash(frame if isinstance(frame, bytes) else bytes(frame))
+
+
+class DedupeCache:
+    """Bounded, time-windowed set of recently seen frames."""
+
+    def __init__(self, window: float = DEFAULT_WINDOW, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.max_entries = max_entries
+        self._clock = clock
+        # key -> time first seen; insertion order is time order
+        self._seen: OrderedDict[int, float] = OrderedDict()
+        self.checked = 0
+        self.dropped = 0
+
+    def seen(self, frame, now: Optional[float] = None) -> bool:
+        """Return True if `frame` was already seen within the window, else remember it."""
+        if now is None:
+            now = self._clock()
+        self.checked += 1
+        self._expire(now)
+
+        key = frame_key(frame)
+        if key in self._seen:
+            self.dropped += 1
+            return True
+
+        self._seen[key] = now
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return False
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window
+        seen = self._seen
+        while seen:
+            key, first_seen = next(iter(seen.items()))
+            if first_seen > cutoff:
+                break
+            del seen[key]
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def clear(self) -> None:
+        self._seen.clear()
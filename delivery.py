@@ -0,0 +1,168 @@
+"""Pooled, keep-alive webhook delivery.
+
+DeliveryEngine keeps one requests.Session - so TLS connections are reused
+instead of set up per chunk - and `max_in_flight` sender threads sharing
+its connection pool. Each post is routed to a sender thread by its lane
+(the sender name): one person's messages go out in order, different people
+are posted in parallel. submit() never waits for the network; it returns a
+concurrent.futures.Future that resolves to the response.
+
+Every post first takes a slot from the RateLimiter, which paces posts to stay
+under Discord's limits. A 429 is waited out and the same post retried, not
+dropped. When more than `max_pending` posts are waiting, submit() blocks,
+which holds up the packet worker rather than losing messages.
+
+Given several webhook URLs for the same channel, each post goes out on the
+one with budget soonest, so throughput is no longer capped by a single
+webhook's rate limit. A lane's posts are still sent one after another by
+the same thread, so they stay in order whichever webhook carries them.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ratelimit import RateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_PENDING = 1000
+# 429 answers waited out for one post before it fails
+MAX_RATE_LIMIT_RETRIES = 5
+
+
+class WebhookError(Exception):
+    """Discord answered a webhook post with a non-2xx status."""
+
+    def __init__(self, status_code: int, body: str = ""):
+        super().__init__(f"Webhook returned HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.body = body
+
+
+@dataclass
+class _Post:
+    payload: dict
+    lane: str
+    future: Future = field(default_factory=Future)
+
+
+def create_session(pool_size: int) -> requests.Session:
+    """Session whose connection pool holds `pool_size` keep-alive connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class DeliveryEngine:
+    """Posts webhook payloads in the background over a pooled session."""
+
+    def __init__(self, url: Union[str, Sequence[str]], max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 timeout: float = DEFAULT_TIMEOUT, session: Optional[requests.Session] = None,
+                 limiter: Optional[RateLimiter] = None, max_pending: int = DEFAULT_MAX_PENDING):
+        self.urls: tuple[str, ...] = (url,) if isinstance(url, str) else tuple(url)
+        if not self.urls:
+            raise ValueError("DeliveryEngine needs at least one webhook URL")
+        self.url = self.urls[0]
+        # Posts sent per webhook URL
+        self.sent: dict[str, int] = dict.fromkeys(self.urls, 0)
+        self.max_in_flight = max(1, max_in_flight)
+        self._timeout = timeout
+        self._session = session or create_session(self.max_in_flight)
+        self.limiter = limiter or RateLimiter()
+        per_slot = max(1, max_pending // self.max_in_flight)
+        self._queues: list[queue.Queue] = [queue.Queue(maxsize=per_slot) for _ in range(self.max_in_flight)]
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, payload: dict, lane: str = "") -> Future:
+        """Queue `payload` for posting; posts sharing a lane are sent in order.
+
+        Blocks while the lane's sender already has its share of `max_pending`.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DeliveryEngine is closed")
+            if not self._threads:
+                self._start()
+        post = _Post(payload, lane)
+        self._queues[self._slot(lane)].put(post)
+        return post.future
+
+    def _slot(self, lane: str) -> int:
+        return hash(lane) % self.max_in_flight
+
+    def _start(self) -> None:
+        for i, q in enumerate(self._queues):
+            thread = threading.Thread(target=self._run, args=(q,), name=f"webhook-sender-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, q: queue.Queue) -> None:
+        while True:
+            post = q.get()
+            try:
+                if post is None:
+                    break
+                if not post.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    post.future.set_result(self._send(post))
+                except Exception as e:
+                    post.future.set_exception(e)
+            finally:
+                q.task_done()
+
+    def _send(self, post: _Post) -> requests.Response:
+        retries = 0
+        while True:
+            url, _ = self.limiter.acquire_any(self.urls)
+            response = self._session.post(url, json=post.payload, params={"wait": "true"},
+                                          timeout=self._timeout)
+            self.limiter.update(url, response.status_code, response.headers)
+            with self._lock:
+                self.sent[url] += 1
+            if response.status_code == 429 and retries < MAX_RATE_LIMIT_RETRIES:
+                # acquire() waits out Retry-After before the same post goes again
+                retries += 1
+                continue
+            if not 200 <= response.status_code < 300:
+                raise WebhookError(response.status_code, response.text)
+            return response
+
+    @property
+    def pending(self) -> int:
+        """Posts queued or in flight."""
+        return sum(q.unfinished_tasks for q in self._queues)
+
+    def join(self) -> None:
+        """Block until every submitted post has completed."""
+        for q in self._queues:
+            q.join()
+
+    def close(self, wait: bool = True) -> None:
+        """Stop the sender threads, after finishing queued posts when `wait` is set."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if not self._threads:
+            self._session.close()
+            return
+        for q in self._queues:
+            q.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._session.close()
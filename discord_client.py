@@ -8,7 +8,8 @@ import discord
 
 from message_normalizer import normalize_discord_message, normalize_message_chunks
 from stats import stats
-from to_client_worker import ToClientWorker
+from echo import EchoTracker
+from to_client_worker import DEFAULT_ECHO_RETYPES, ToClientWorker
 
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,13 @@ class ToClientConfig:
     target_channel_id: int
     guild_id: Optional[int] = None
     delay_seconds: float = 0.02
+    # See input_backends.create_input_backend
+    input_backend: str = "auto"
+    # Seconds to wait for a typed line to come back through the sniffer; 0 types blind
+    echo_timeout: float = 0.0
+    echo_retypes: int = DEFAULT_ECHO_RETYPES
+    # Paste long lines from the X clipboard instead of typing them
+    paste_mode: bool = False
 
 
 class DiscordClient(discord.Client):
@@ -66,9 +74,11 @@ class DiscordClient(discord.Client):
 
 
 class ToClientBotThread(threading.Thread):
-    def __init__(self, config: ToClientConfig):
+    def __init__(self, config: ToClientConfig, echo: Optional[EchoTracker] = None):
         super().__init__(daemon=True)
         self._config = config
+        # Shared with the PacketWorker, which reports our own guild messages to it
+        self._echo = echo if config.echo_timeout > 0 else None
         self._client: Optional[DiscordClient] = None
 
     def stop(self) -> None:
@@ -90,7 +100,9 @@ class ToClientBotThread(threading.Thread):
         intents = discord.Intents.default()
         intents.message_content = True
 
-        worker = ToClientWorker(delay_seconds=self._config.delay_seconds)
+        worker = ToClientWorker(delay_seconds=self._config.delay_seconds, input_backend=self._config.input_backend,
+                                echo=self._echo, echo_timeout=self._config.echo_timeout,
+                                echo_retypes=self._config.echo_retypes, paste=self._config.paste_mode)
         client = DiscordClient(config=self._config, worker=worker, intents=intents)
         self._client = client
 
@@ -0,0 +1,113 @@
+"""Delivery acks for lines typed into the game.
+
+Whatever the typer sends to guild chat comes back through the sniffer as
+a guild message from our own character. PacketWorker hands those echoes
+to an EchoTracker instead of dropping them; ToClientWorker registers
+each line it types with expect() and waits on the returned Expected
+instead of sleeping a fixed time, and types the line again if it never
+echoes.
+
+Lines are matched on their text with whitespace collapsed, oldest
+first, so the same line typed twice needs two echoes. Each ack records
+the latency from the moment the Discord message was queued to the echo.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+def echo_key(text: str) -> str:
+    return " ".join(text.split())
+
+
+@dataclass(eq=False)
+class Expected:
+    """A typed line waiting for its echo."""
+    text: str
+    # When the line was queued for typing (Discord receive time)
+    queued_at: float
+    acked_at: Optional[float] = None
+    _event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def wait(self, timeout: float) -> bool:
+        """True once the echo arrived, False after `timeout` seconds without it."""
+        return self._event.wait(timeout)
+
+    @property
+    def latency(self) -> Optional[float]:
+        return None if self.acked_at is None else self.acked_at - self.queued_at
+
+
+class EchoTracker:
+    """Matches own-character guild messages to the lines waiting for them."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._waiting: dict[str, deque[Expected]] = {}
+        self.acked = 0
+        # Own messages nobody waited for: typed by hand, or echoes after giving up
+        self.unmatched = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def expect(self, text: str, queued_at: Optional[float] = None) -> Expected:
+        expected = Expected(text, self._clock() if queued_at is None else queued_at)
+        with self._lock:
+            self._waiting.setdefault(echo_key(text), deque()).append(expected)
+        return expected
+
+    def cancel(self, expected: Expected) -> None:
+        """Stop waiting for `expected` (given up on, or about to be retyped)."""
+        key = echo_key(expected.text)
+        with self._lock:
+            waiting = self._waiting.get(key)
+            if waiting is not None and expected in waiting:
+                waiting.remove(expected)
+                if not waiting:
+                    del self._waiting[key]
+
+    def ack(self, content: str) -> bool:
+        """Record an echo of `content`; True if a typed line was waiting for it."""
+        key = echo_key(content)
+        now = self._clock()
+        with self._lock:
+            waiting = self._waiting.get(key)
+            if not waiting:
+                self.unmatched += 1
+                return False
+            expected = waiting.popleft()
+            if not waiting:
+                del self._waiting[key]
+            expected.acked_at = now
+            latency = now - expected.queued_at
+            self.acked += 1
+            self.latency_total += latency
+            self.latency_last = latency
+            self.latency_max = max(self.latency_max, latency)
+        expected._event.set()
+        logger.debug(f"Echo after {latency * 1000:.0f} ms: {content}")
+        return True
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(waiting) for waiting in self._waiting.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            acked = self.acked
+            return {
+                "acked": acked,
+                "unmatched": self.unmatched,
+                "latency_mean_ms": self.latency_total / acked * 1000 if acked else 0.0,
+                "latency_max_ms": self.latency_max * 1000,
+                "latency_last_ms": self.latency_last * 1000,
+            }
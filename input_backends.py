@@ -0,0 +1,325 @@
+"""Keystroke injection backends for the Discord -> game typer.
+
+An InputBackend focuses the game window, presses keys and types text.
+ToClientWorker holds one for its whole life, so a backend can keep its X
+connection open between messages:
+
+- "libxdo": libxdo (the library behind xdotool) through ctypes. One
+  xdo_t, i.e. one X connection, for the life of the worker; no process
+  is started per message. Needs libxdo.so.3 (shipped with xdotool).
+- "xdotool": runs the xdotool command for every step, like the typer
+  always did. Works anywhere xdotool is on PATH.
+- "fake": records what would have been sent; for tests and benchmarks.
+- "auto": libxdo when it loads, xdotool otherwise.
+
+paste_text() is the fast path for long lines: the text goes into the X
+clipboard (xclip or xsel) and is pasted with one Ctrl+V instead of one
+keystroke per character. It returns False when it could not, and the
+caller types instead.
+"""
+import ctypes
+import ctypes.util
+import logging
+import subprocess
+import time
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+GAME_WINDOW_NAME = "Mabinogi"
+# xdotool type's default delay between keystrokes
+DEFAULT_TYPE_DELAY = 0.012
+PASTE_CHORD = "ctrl+v"
+# Tried in order; the first one installed is used
+CLIPBOARD_COMMANDS = (
+    ("xclip", "-selection", "clipboard"),
+    ("xsel", "--clipboard", "--input"),
+)
+
+
+def set_clipboard(text: str) -> bool:
+    """Put `text` on the X clipboard; False when no clipboard tool worked."""
+    for cmd in CLIPBOARD_COMMANDS:
+        try:
+            result = subprocess.run(cmd, input=text.encode("utf-8"), check=False, timeout=1)
+        except FileNotFoundError:
+            continue
+        except subprocess.TimeoutExpired:
+            return False
+        return result.returncode == 0
+    logger.warning("Neither xclip nor xsel found, cannot paste")
+    return False
+
+
+def pasteable(text: str) -> bool:
+    """Whether `text` can go through the clipboard; control characters are typed instead."""
+    return text.isprintable()
+
+
+class InputBackend:
+    """Sends keyboard input to the game window."""
+    name = "base"
+
+    def __init__(self, window_name: str = GAME_WINDOW_NAME, type_delay: float = DEFAULT_TYPE_DELAY):
+        self.window_name = window_name
+        self.type_delay = type_delay
+
+    def find_window(self) -> Optional[int]:
+        """Search for the game window by name; the last match, or None."""
+        raise NotImplementedError
+
+    def is_window(self, window: int) -> bool:
+        """Cheap check that `window` still exists and is still the game window."""
+        raise NotImplementedError
+
+    def activate(self, window: int) -> bool:
+        """Bring `window` to the front and give it keyboard focus; False if that failed."""
+        raise NotImplementedError
+
+    def activate_window(self) -> None:
+        """Search for the game window and activate it."""
+        window = self.find_window()
+        if window is None:
+            logger.warning(f"No window named '{self.window_name}' found")
+            return
+        self.activate(window)
+
+    def key(self, keysym: str) -> None:
+        """Press and release one key, by X keysym name ("Return")."""
+        raise NotImplementedError
+
+    def type_text(self, text: str) -> None:
+        """Type `text` into the focused window."""
+        raise NotImplementedError
+
+    def paste_text(self, text: str) -> bool:
+        """Paste `text` into the focused window; False if it could not be put on the clipboard."""
+        if not pasteable(text) or not set_clipboard(text):
+            return False
+        self.key(PASTE_CHORD)
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class XdotoolBackend(InputBackend):
+    """One xdotool process per step."""
+    name = "xdotool"
+
+    def find_window(self) -> Optional[int]:
+        result = subprocess.run(["xdotool", "search", "--name", self.window_name],
+                                capture_output=True, text=True, check=False)
+        windows = result.stdout.split()
+        return int(windows[-1]) if windows else None
+
+    def is_window(self, window: int) -> bool:
+        result = subprocess.run(["xdotool", "getwindowname", str(window)],
+                                capture_output=True, text=True, check=False)
+        return result.returncode == 0 and self.window_name in result.stdout
+
+    def activate(self, window: int) -> bool:
+        return subprocess.run(["xdotool", "windowactivate", str(window)], check=False).returncode == 0
+
+    def key(self, keysym: str) -> None:
+        subprocess.run(["xdotool", "key", keysym], check=False)
+
+    def type_text(self, text: str) -> None:
+        subprocess.run(["xdotool", "type", "--delay", str(round(self.type_delay * 1000)), text], check=False)
+
+
+# libxdo's CURRENTWINDOW: send to whatever has focus
+_CURRENTWINDOW = 0
+# xdo_search_t.searchmask bit
+_SEARCH_NAME = 1 << 2
+
+
+class _XdoSearch(ctypes.Structure):
+    """xdo_search_t from xdo.h (libxdo 3)."""
+    _fields_ = [
+        ("title", ctypes.c_char_p),
+        ("winclass", ctypes.c_char_p),
+        ("winclassname", ctypes.c_char_p),
+        ("winname", ctypes.c_char_p),
+        ("winrole", ctypes.c_char_p),
+        ("pid", ctypes.c_int),
+        ("max_depth", ctypes.c_long),
+        ("only_visible", ctypes.c_int),
+        ("screen", ctypes.c_int),
+        ("require", ctypes.c_int),
+        ("searchmask", ctypes.c_uint),
+        ("desktop", ctypes.c_long),
+        ("limit", ctypes.c_uint),
+    ]
+
+
+def load_libxdo() -> ctypes.CDLL:
+    """Load libxdo and declare the calls used here; OSError when it is not installed."""
+    path = ctypes.util.find_library("xdo")
+    if path is None:
+        raise OSError("libxdo not found (install xdotool / libxdo3)")
+    lib = ctypes.CDLL(path)
+    lib.xdo_new.argtypes = [ctypes.c_char_p]
+    lib.xdo_new.restype = ctypes.c_void_p
+    lib.xdo_free.argtypes = [ctypes.c_void_p]
+    lib.xdo_free.restype = None
+    lib.xdo_search_windows.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XdoSearch),
+                                       ctypes.POINTER(ctypes.POINTER(ctypes.c_ulong)), ctypes.POINTER(ctypes.c_uint)]
+    lib.xdo_search_windows.restype = ctypes.c_int
+    lib.xdo_get_window_name.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_void_p),
+                                        ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+    lib.xdo_get_window_name.restype = ctypes.c_int
+    lib.xdo_activate_window.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+    lib.xdo_activate_window.restype = ctypes.c_int
+    lib.xdo_wait_for_window_active.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int]
+    lib.xdo_wait_for_window_active.restype = ctypes.c_int
+    lib.xdo_send_keysequence_window.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_char_p, ctypes.c_uint]
+    lib.xdo_send_keysequence_window.restype = ctypes.c_int
+    lib.xdo_enter_text_window.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_char_p, ctypes.c_uint]
+    lib.xdo_enter_text_window.restype = ctypes.c_int
+    return lib
+
+
+class LibxdoBackend(InputBackend):
+    """libxdo over one X connection held open for the life of the backend."""
+    name = "libxdo"
+
+    def __init__(self, window_name: str = GAME_WINDOW_NAME, type_delay: float = DEFAULT_TYPE_DELAY,
+                 lib: Optional[ctypes.CDLL] = None):
+        super().__init__(window_name, type_delay)
+        self._lib = lib or load_libxdo()
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        self._libc.free.argtypes = [ctypes.c_void_p]
+        # NULL: the DISPLAY environment variable
+        self._xdo = self._lib.xdo_new(None)
+        if not self._xdo:
+            raise OSError("xdo_new failed: cannot open X display")
+
+    def find_windows(self) -> list[int]:
+        """Ids of the windows whose name matches window_name."""
+        search = _XdoSearch(winname=self.window_name.encode(), searchmask=_SEARCH_NAME, max_depth=-1)
+        windows = ctypes.POINTER(ctypes.c_ulong)()
+        count = ctypes.c_uint(0)
+        self._lib.xdo_search_windows(self._xdo, ctypes.byref(search), ctypes.byref(windows), ctypes.byref(count))
+        try:
+            return [windows[i] for i in range(count.value)]
+        finally:
+            if windows:
+                self._libc.free(windows)
+
+    def find_window(self) -> Optional[int]:
+        # xdotool's windowactivate ends on the last match too
+        windows = self.find_windows()
+        return windows[-1] if windows else None
+
+    def is_window(self, window: int) -> bool:
+        # One property read: fails once the window is gone, and catches a reused id
+        name = ctypes.c_void_p()
+        length = ctypes.c_int(0)
+        name_type = ctypes.c_int(0)
+        if self._lib.xdo_get_window_name(self._xdo, window, ctypes.byref(name), ctypes.byref(length),
+                                         ctypes.byref(name_type)) != 0 or not name.value:
+            return False
+        try:
+            return self.window_name.encode() in ctypes.string_at(name, length.value)
+        finally:
+            self._libc.free(name)
+
+    def activate(self, window: int) -> bool:
+        if self._lib.xdo_activate_window(self._xdo, window) != 0:
+            return False
+        return self._lib.xdo_wait_for_window_active(self._xdo, window, 1) == 0
+
+    def key(self, keysym: str) -> None:
+        self._lib.xdo_send_keysequence_window(self._xdo, _CURRENTWINDOW, keysym.encode(), 0)
+
+    def type_text(self, text: str) -> None:
+        self._lib.xdo_enter_text_window(self._xdo, _CURRENTWINDOW, text.encode("utf-8"),
+                                        round(self.type_delay * 1_000_000))
+
+    def close(self) -> None:
+        if self._xdo:
+            self._lib.xdo_free(self._xdo)
+            self._xdo = None
+
+
+class FakeInputBackend(InputBackend):
+    """Records ("search",), ("activate", window), ("key", keysym), ("type", text) and ("paste", text) events.
+
+    `window` is the id find_window() returns; set it to None (gone) or to
+    a new id (game restarted) to test how callers cope. Set `paste_ok` to
+    False to make pasting fail. With `realtime` it also takes as long as a
+    real keyboard would: `type_delay` per keystroke, plus `clipboard_time`
+    to set the clipboard.
+    """
+    name = "fake"
+
+    def __init__(self, window_name: str = GAME_WINDOW_NAME, type_delay: float = DEFAULT_TYPE_DELAY,
+                 realtime: bool = False, clipboard_time: float = 0.005):
+        super().__init__(window_name, type_delay)
+        self.events: list[tuple] = []
+        self.window: Optional[int] = 1
+        self.paste_ok = True
+        self.realtime = realtime
+        self.clipboard_time = clipboard_time
+        self.closed = False
+
+    def _keystrokes(self, count: int) -> None:
+        if self.realtime:
+            time.sleep(count * self.type_delay)
+
+    def find_window(self) -> Optional[int]:
+        self.events.append(("search",))
+        return self.window
+
+    def is_window(self, window: int) -> bool:
+        return window == self.window
+
+    def activate(self, window: int) -> bool:
+        self.events.append(("activate", window))
+        return window == self.window
+
+    def key(self, keysym: str) -> None:
+        self.events.append(("key", keysym))
+        self._keystrokes(1)
+
+    def type_text(self, text: str) -> None:
+        self.events.append(("type", text))
+        self._keystrokes(len(text))
+
+    def paste_text(self, text: str) -> bool:
+        if not (self.paste_ok and pasteable(text)):
+            return False
+        self.events.append(("paste", text))
+        if self.realtime:
+            time.sleep(self.clipboard_time)
+        self._keystrokes(1)
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+INPUT_BACKENDS: dict[str, type[InputBackend]] = {
+    LibxdoBackend.name: LibxdoBackend,
+    XdotoolBackend.name: XdotoolBackend,
+    FakeInputBackend.name: FakeInputBackend,
+}
+
+
+def create_input_backend(name: str = "auto", window_name: str = GAME_WINDOW_NAME) -> InputBackend:
+    """Build an input backend by name ("auto", "libxdo", "xdotool" or "fake")."""
+    if name == "auto":
+        try:
+            return LibxdoBackend(window_name)
+        except OSError as e:
+            logger.info(f"libxdo unavailable ({e}), typing through the xdotool command")
+            return XdotoolBackend(window_name)
+    try:
+        backend_cls = INPUT_BACKENDS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown input backend '{name}', expected one of: auto, {', '.join(INPUT_BACKENDS)}"
+        ) from None
+    return backend_cls(window_name)
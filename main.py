@@ -6,8 +6,9 @@ import queue
 
 from dotenv import load_dotenv
 
-from packet_sniffer import PacketWorker, PacketSniffer
+from packet_sniffer import PacketWorker, create_packet_sniffer
 from discord_client import ToClientBotThread
+from echo import EchoTracker
 from tui import TUI, create_queue_handler
 from stats import stats
 from config import load_config, create_sniffer_config, create_typer_config
@@ -60,15 +61,17 @@ def run_tui(stdscr):
     config = load_config()
 
     sniffer_config = create_sniffer_config(config)
-    packet_worker = PacketWorker(sniffer_config)
-    packet_sniffer = PacketSniffer(sniffer_config, packet_worker)
+    # Our own guild messages seen by the sniffer ack the lines the typer sent
+    echo = EchoTracker() if config.echo_timeout > 0 else None
+    packet_worker = PacketWorker(sniffer_config, echo=echo)
+    packet_sniffer = create_packet_sniffer(sniffer_config, packet_worker)
 
     packet_worker.start()
     packet_sniffer.start()
 
     typer_config = create_typer_config(config)
 
-    typer = ToClientBotThread(typer_config)
+    typer = ToClientBotThread(typer_config, echo=echo)
     typer.start()
 
     # Logging already set up by setup_logging_for_tui() at start of run_tui
@@ -76,6 +79,8 @@ def run_tui(stdscr):
     def do_shutdown():
         logger.info("Shutting down...")
         packet_sniffer.stop()
+        # Let the sniffer hand on what it still holds before the worker stops
+        packet_sniffer.join(timeout=5)
         packet_worker.stop()
         typer.stop()
 
@@ -98,23 +103,25 @@ def run_console():
     config = load_config()
 
     sniffer_config = create_sniffer_config(config)
-    packet_worker = PacketWorker(sniffer_config)
-    packet_sniffer = PacketSniffer(sniffer_config, packet_worker)
+    # Our own guild messages seen by the sniffer ack the lines the typer sent
+    echo = EchoTracker() if config.echo_timeout > 0 else None
+    packet_worker = PacketWorker(sniffer_config, echo=echo)
+    packet_sniffer = create_packet_sniffer(sniffer_config, packet_worker)
 
     packet_worker.start()
     packet_sniffer.start()
 
     typer_config = create_typer_config(config)
 
-    typer = ToClientBotThread(typer_config)
+    typer = ToClientBotThread(typer_config, echo=echo)
     typer.start()
 
     def shutdown(signum, frame):
         logger.info("Shutting down...")
         packet_sniffer.stop()
+        packet_sniffer.join(timeout=5)
         packet_worker.stop()
         typer.stop()
-        packet_sniffer.join(timeout=3)
         typer.join(timeout=5)
         sys.exit(0)
 
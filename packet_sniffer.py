@@ -1,15 +1,30 @@
 import asyncio
-import binascii
 import logging
-import pyshark
+import logging.handlers
+import multiprocessing
 import queue
+import signal
+import sys
 import threading
+import time
+from collections import Counter
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
 
 import Mabipacket.guildparser as parser
-from discord_webhook import DiscordWebhook
+from Mabipacket.framing import split_frames
+from capture_backends import CaptureBackend, CaptureRecord, create_capture_backend, payload_from_pyshark
+from capture_filters import matches_guild_opcode
+from batching import DEFAULT_MAX_BATCH
+from dedupe import DedupeCache
+from echo import EchoTracker
+from delivery import DEFAULT_MAX_IN_FLIGHT
 from Guildmessage import Guild_message
+from pipeline import DEFAULT_STAGE_QUEUE_SIZE, Stage
+from retry import DEFAULT_MAX_ATTEMPTS, RetryingSink, RetryPolicy
+from shm_ring import DEFAULT_RING_SIZE, ShmRing
+from sinks import MessageSink, WebhookSink
+from spool import Spool, SpoolingSink
 
 
 from stats import stats, stats_lock
@@ -27,13 +42,83 @@ class PacketSnifferConfig:
     bot_name: str = "DefaultBot"
     queue_maxsize: int = 1000
     bpf_filter: str = "src host 54.214.176.167"
+    capture_backend: str = "pyshark"
+    native_reassembly: bool = False
+    guild_capture_filter: bool = False
+    # Seconds a guild frame is remembered to drop repeats; 0 disables. Off by
+    # default: the key is the frame content, so it also drops a line sent twice
+    dedupe_window: float = 0.0
+    # Webhook posts in flight at once
+    webhook_concurrency: int = DEFAULT_MAX_IN_FLIGHT
+    # Seconds to coalesce messages into shared webhook posts; 0 posts each on its own
+    batch_window: float = 0.0
+    batch_max_messages: int = DEFAULT_MAX_BATCH
+    # More webhooks for the same channel; posts are spread over all of them
+    extra_webhook_urls: tuple[str, ...] = ()
+    # Delivery attempts per message before it is dead-lettered; 0 turns retrying off
+    retry_max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    # JSON-lines file for messages that could not be delivered; "" only logs them
+    dead_letter_path: str = ""
+    # Write-ahead spool file for messages not yet delivered; "" keeps them in memory only
+    spool_path: str = ""
+    # Threads and queue size of the transform and deliver stages; more than one
+    # worker per stage gives up message order
+    transform_workers: int = 1
+    deliver_workers: int = 1
+    stage_queue_size: int = DEFAULT_STAGE_QUEUE_SIZE
+    # Capture in a separate process feeding a shared-memory ring of `ring_size`
+    # bytes; `parse_processes` more processes parse from the same ring next to
+    # this one and send their messages back here (no order between them)
+    capture_process: bool = False
+    ring_size: int = DEFAULT_RING_SIZE
+    parse_processes: int = 0
+
+    @property
+    def webhook_urls(self) -> tuple[str, ...]:
+        return (self.discord_webhook_url, *self.extra_webhook_urls)
+
+
+STAGES = ("decode", "parse", "transform", "deliver")
 
 
 class PacketWorker:
-    def __init__(self, config: PacketSnifferConfig):
+    def __init__(self, config: PacketSnifferConfig, sink: Optional[MessageSink] = None,
+                 echo: Optional[EchoTracker] = None, output: Optional[Callable[[Guild_message], None]] = None):
         self._config = config
+        # Gets our own character's messages (the typer's lines coming back) as acks
+        self.echo = echo
         self._queue = queue.Queue(maxsize=config.queue_maxsize)
         self._worker_thread = None
+        # Accumulated wall time of decode and parse (capture queue thread), in seconds
+        self._times: dict[str, float] = {"decode": 0.0, "parse": 0.0}
+        self._sink: Optional[MessageSink] = None
+        self.stages: dict[str, Stage] = {}
+        if output is not None:
+            # Parse only (parse processes): messages go to `output`, and the
+            # process owning the sink, spool and echo tracker handles the rest
+            self._emit = output
+        else:
+            if sink is None:
+                sink = WebhookSink(config.webhook_urls, config.webhook_concurrency,
+                                   batch_window=config.batch_window, max_batch=config.batch_max_messages,
+                                   bot_name=config.bot_name)
+                if config.retry_max_attempts > 0:
+                    sink = RetryingSink(sink, RetryPolicy(max_attempts=config.retry_max_attempts),
+                                        dead_letter_path=config.dead_letter_path)
+            self._sink = sink
+            if config.spool_path:
+                self._sink = SpoolingSink(self._sink, Spool(config.spool_path))
+            # Cleaning/filtering and delivery run on their own threads behind bounded
+            # queues, so a slow sink backs up there instead of stalling parsing
+            self.stages = {
+                "transform": Stage("transform", self._transform, config.transform_workers,
+                                   config.stage_queue_size),
+                "deliver": Stage("deliver", self._deliver, config.deliver_workers, config.stage_queue_size),
+            }
+            self._emit = self.add_message
+        # Histogram: number of frames found per TCP segment -> segment count
+        self.frames_per_segment: Counter[int] = Counter()
+        self.dedupe: Optional[DedupeCache] = DedupeCache(config.dedupe_window) if config.dedupe_window > 0 else None
         logger.info(f"PacketWorker initialized with queue max size: {config.queue_maxsize}")
 
     def _loop(self):
@@ -46,66 +131,7 @@ class PacketWorker:
                 break
 
             try:
-                if not hasattr(packet, "tcp"):
-                    continue
-
-                # Try reassembled TCP stream data first (for fragmented long messages)
-                tcp = packet.tcp
-                reassembled = getattr(tcp, "reassembled_data", None)
-                if reassembled and isinstance(reassembled, str):
-                    payload_hex = reassembled.replace(":", "")
-                else:
-                    payload = getattr(tcp, "payload", None)
-                    if payload and isinstance(payload, str):
-                        payload_hex = payload.replace(":", "")
-                    else:
-                        continue
-                    
-                if not payload_hex:
-                    continue
-
-                payload_bytes = binascii.unhexlify(payload_hex)
-                parsed_packet = parser.parse(data=payload_bytes, debug=False)
-
-                if isinstance(parsed_packet, bool):
-                    logger.debug(f"Parser returned False for payload (len={len(payload_bytes)}): {payload_hex[:100]}...")
-                    continue
-
-                if parsed_packet.paramCount == 0:
-                    logger.debug(f"Parser returned 0 params for payload (len={len(payload_bytes)}): {payload_hex[:100]}...")
-                    continue
-
-                # Build the message to send to Discord webhook
-                message: Guild_message = Guild_message(
-                    name=parsed_packet.parameters[0].value,
-                    content=parsed_packet.parameters[1].value
-                )
-
-                # Clean up the message
-                message.cleanmessage()
-                message.replace_mentions()
-
-                if self._config.in_game_char_name not in message.name:
-                    # Discord has 2000 char limit per message - chunk if needed
-                    max_chunk = 1900
-                    content = message.content
-                    for i in range(0, len(content), max_chunk):
-                        chunk = content[i:i + max_chunk]
-                        webhook = DiscordWebhook(
-                            url=self._config.discord_webhook_url,
-                            username=message.name[:80] if i == 0 else "",  # Discord username limit 80
-                            content=chunk
-                        )
-                        message.add_emotes(webhook)
-                        logger.info(f"{message.name}: {chunk}")
-                        try:
-                            response = webhook.execute()
-                            logger.debug(f"Webhook response: {response.status_code}")
-                        except Exception as webhook_err:
-                            logger.exception(f"Webhook execute failed for '{chunk[:50]}...': {webhook_err}")
-                            raise
-                        stats.increment('messages_to_discord')
-                    
+                self._process(packet)
             except Exception as e:
                 logger.exception(f"Error in worker packet processing: {e}")
                 # Increment error stats
@@ -115,8 +141,106 @@ class PacketWorker:
                 # Increment packets processed stat
                 stats.increment('packets_processed')
 
+    def _process(self, packet) -> None:
+        t0 = time.perf_counter()
+
+        # Only CaptureRecords and bytes are queued (see add_packet)
+        payload_bytes = packet.payload if isinstance(packet, CaptureRecord) else packet
+        if not payload_bytes:
+            self._times["decode"] += time.perf_counter() - t0
+            return
+
+        # One segment may carry several coalesced frames
+        frames = split_frames(payload_bytes)
+        self.frames_per_segment[len(frames)] += 1
+        if len(frames) > 1:
+            logger.debug(f"Segment (len={len(payload_bytes)}) carried {len(frames)} frames")
+        else:
+            frames = [payload_bytes]
+        self._times["decode"] += time.perf_counter() - t0
+
+        for frame in frames:
+            self._process_frame(frame)
+
+    def _process_frame(self, frame) -> None:
+        times = self._times
+        t1 = time.perf_counter()
+        # Same guild frame seen again (segment + reassembled copy, retransmit)
+        if self.dedupe is not None and matches_guild_opcode(frame) and self.dedupe.seen(frame):
+            times["parse"] += time.perf_counter() - t1
+            stats.increment('duplicates_dropped')
+            logger.debug(f"Dropped duplicate frame (len={len(frame)})")
+            return
+
+        # Zero-copy view: nothing is decoded until values() below
+        parsed_packet = parser.parse_view(frame)
+        t2 = time.perf_counter()
+        times["parse"] += t2 - t1
+
+        if not parsed_packet:
+            logger.debug(f"Parser rejected payload (len={len(frame)}): {frame[:50].hex()}...")
+            return
+
+        if parsed_packet.paramCount == 0:
+            logger.debug(f"Parser returned 0 params for payload (len={len(frame)}): {frame[:50].hex()}...")
+            return
+
+        # Name and message in one pass of the opcode's compiled schema decoder
+        values = parsed_packet.values()
+        if values is None:
+            # Cut off at the end of the segment: keep what arrived, as parse() always has
+            parameters = parsed_packet.parameters
+            if len(parameters) < 2:
+                logger.debug(f"Guild packet truncated (len={len(frame)}): {frame[:50].hex()}...")
+                return
+            values = (parameters[0].value, parameters[1].value)
+
+        # Build the message to send to Discord webhook
+        message: Guild_message = Guild_message(
+            name=values[0],
+            content=values[1]
+        )
+        times["parse"] += time.perf_counter() - t2
+        self._emit(message)
+
+    def add_message(self, message: Guild_message) -> None:
+        """Hand a parsed message to the transform stage; also used for messages from parse processes."""
+        self.stages["transform"].put(message)
+
+    def _transform(self, message: Guild_message) -> None:
+        own_name = self._config.in_game_char_name
+        if own_name and own_name in message.name:
+            if self.echo is not None:
+                self.echo.ack(message.content)
+            return
+
+        # Clean up the message
+        message.cleanmessage()
+        message.replace_mentions()
+        self.stages["deliver"].put(message)
+
+    def _deliver(self, message: Guild_message) -> None:
+        self._sink.deliver(message)
+
+    @property
+    def stage_times(self) -> dict[str, float]:
+        """Accumulated wall time per processing stage, in seconds."""
+        times = dict(self._times)
+        for name, stage in self.stages.items():
+            times[name] = stage.metrics.busy_s
+        return times
+
+    def stage_metrics(self) -> dict[str, dict]:
+        """Depth, throughput and latency of the capture queue and each stage."""
+        metrics = {"capture": {"depth": self.queue_size, "maxsize": self.queue_maxsize, "workers": 1}}
+        for name, stage in self.stages.items():
+            metrics[name] = stage.snapshot()
+        return metrics
+
     def start(self):
         """Starts the worker thread."""
+        for stage in self.stages.values():
+            stage.start()
         if self._worker_thread is None or not self._worker_thread.is_alive():
             self._worker_thread = threading.Thread(
                 target=self._loop, daemon=True
@@ -135,13 +259,35 @@ class PacketWorker:
             logger.info("PacketWorker thread stopped.")
         else:
             logger.info("PacketWorker thread is not running or not initialized.")
-
-    def add_packet(self, packet):
-        """Adds a packet to the internal queue for processing by the worker thread."""
+        # Stages finish what is queued, upstream first
+        for stage in self.stages.values():
+            stage.stop()
+        # Let queued webhook posts finish
+        if self._sink is not None:
+            self._sink.close()
+
+    def add_packet(self, packet, block: bool = False):
+        """Adds a packet to the internal queue for processing by the worker thread.
+
+        Takes a CaptureRecord or payload bytes. A pyshark packet is reduced to
+        its payload bytes here, so no layer tree ever sits in the queue.
+        With block=True waits for queue space instead of dropping (offline replay).
+        """
+        if not isinstance(packet, (CaptureRecord, bytes)):
+            packet = payload_from_pyshark(packet)
+            if not packet:
+                return
         try:
-            self._queue.put_nowait(packet)
+            self._queue.put(packet, block=block)
         except queue.Full:
             logger.warning("PacketWorker queue full, dropping packet.")
+            stats.increment('packets_dropped')
+
+    def drain(self):
+        """Blocks until every queued packet has been processed and handed to the sink."""
+        self._queue.join()
+        for stage in self.stages.values():
+            stage.join()
 
     @property
     def queue_size(self):
@@ -155,48 +301,45 @@ class PacketWorker:
 
 
 class PacketSniffer(threading.Thread):
-    def __init__(self, config: PacketSnifferConfig, worker_instance: PacketWorker):
+    def __init__(self, config: PacketSnifferConfig, worker_instance: PacketWorker,
+                 backend: Optional[CaptureBackend] = None):
         super().__init__(daemon=True)
         self._config = config
         self.worker_instance = worker_instance
         self.running = True
-        self.capture: Optional[pyshark.LiveCapture] = None
+        self._backend = backend
+        self.capture: Optional[CaptureBackend] = None
         self.loop: Optional[asyncio.AbstractEventLoop] = None
 
     def run(self):
+        # pyshark needs an event loop in the capture thread
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
 
         logger.info(f"Starting packet sniffer on interface: {self._config.network_interface}")
         try:
-            self.capture = pyshark.LiveCapture(
+            self.capture = self._backend or create_capture_backend(
+                self._config.capture_backend,
                 interface=self._config.network_interface,
                 bpf_filter=self._config.bpf_filter,
-                override_prefs={"tcp.desegment_tcp_streams": "TRUE"}
+                native_reassembly=self._config.native_reassembly,
+                guild_only=self._config.guild_capture_filter,
             )
-            for packet in self.capture.sniff_continuously():
+            logger.info(f"Using capture backend: {self.capture.name}")
+            for record in self.capture.records():
                 if not self.running:
                     logger.info("Sniffing stopped by stop() call.")
                     break
 
-                if 'TCP' not in packet:
-                    continue
-
-                # Accept packets with either payload or reassembled_data (must be strings)
-                tcp = packet.tcp
-                has_payload = hasattr(tcp, "payload") and isinstance(getattr(tcp, "payload", None), str)
-                has_reassembled = hasattr(tcp, "reassembled_data") and isinstance(getattr(tcp, "reassembled_data", None), str)
-                
-                if not (has_payload or has_reassembled):
-                    continue
-
-                self.worker_instance.add_packet(packet)
+                self.worker_instance.add_packet(record)
 
         except Exception as e:
             logger.exception(f"Packet sniffer error: {e}")
         finally:
             if self.capture:
                 self.capture.close()
+                if self.capture.reassembler is not None:
+                    logger.info(f"Reassembly stats: {self.capture.reassembler.stats}")
             if self.loop and self.loop.is_running():
                 self.loop.stop()
             if self.loop and not self.loop.is_closed():
@@ -209,3 +352,174 @@ class PacketSniffer(threading.Thread):
         logger.info("Stopping PacketSniffer...")
         if self.capture:
             self.capture.close()
+
+
+def create_packet_sniffer(config: PacketSnifferConfig, worker_instance: PacketWorker) -> threading.Thread:
+    """The in-process PacketSniffer, or a ShmPacketSniffer when config.capture_process is set."""
+    if config.capture_process:
+        return ShmPacketSniffer(config, worker_instance)
+    return PacketSniffer(config, worker_instance)
+
+
+def _log_to_queue(log_queue) -> None:
+    """Send this process's log records to the parent, which owns the console / TUI."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+
+def capture_to_ring(config: PacketSnifferConfig, ring: ShmRing, log_queue=None,
+                    backend: Optional[CaptureBackend] = None) -> None:
+    """Capture process: copy every captured record into `ring` until stopped."""
+    if log_queue is not None:
+        _log_to_queue(log_queue)
+    # Unwind on terminate() so the backend (and tshark) is closed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    capture = None
+    try:
+        capture = backend or create_capture_backend(
+            config.capture_backend,
+            interface=config.network_interface,
+            bpf_filter=config.bpf_filter,
+            native_reassembly=config.native_reassembly,
+            guild_only=config.guild_capture_filter,
+        )
+        logger.info(f"Capture process using backend: {capture.name}")
+        for record in capture.records():
+            if ring.stop_requested:
+                break
+            ring.put(record)
+    except Exception as e:
+        logger.exception(f"Capture process error: {e}")
+    finally:
+        if capture:
+            capture.close()
+        ring.close_writer()
+        ring.close()
+        loop.close()
+
+
+def parse_from_ring(config: PacketSnifferConfig, ring: ShmRing, messages, log_queue=None) -> None:
+    """Extra parse process: parses records from `ring` until the writer closes.
+
+    Only decode and parse run here. Messages go back to the parent over
+    `messages`; its PacketWorker alone acks echoes, cleans, spools and
+    delivers, so the spool file and the echo tracker have a single owner.
+    """
+    if log_queue is not None:
+        _log_to_queue(log_queue)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker = PacketWorker(config, output=messages.put)
+    worker.start()
+    try:
+        while (record := ring.get()) is not None:
+            worker.add_packet(record, block=True)
+    finally:
+        worker.drain()
+        worker.stop()
+        ring.close()
+        logger.info(f"Parse process {multiprocessing.current_process().name} done: {stats.snapshot()}")
+
+
+class ShmPacketSniffer(threading.Thread):
+    """PacketSniffer with capture moved to its own process.
+
+    The capture process (capture_to_ring) copies records into a ShmRing;
+    this thread reads them back for the local PacketWorker, and
+    `config.parse_processes` extra processes (parse_from_ring) read from the
+    same ring. Capture, dissection and parsing then no longer share one GIL.
+    The parse processes send their messages back to the local PacketWorker,
+    which does everything after parsing. Records dropped because the ring
+    was full count as packets_dropped.
+    """
+
+    def __init__(self, config: PacketSnifferConfig, worker_instance: PacketWorker,
+                 backend: Optional[CaptureBackend] = None):
+        super().__init__(daemon=True)
+        self._config = config
+        self.worker_instance = worker_instance
+        self.running = True
+        # Handed to the capture process instead of building one from config
+        self._backend = backend
+        self.ring: Optional[ShmRing] = None
+        self._processes: list = []
+        self._overruns = 0
+
+    def _relay(self, messages) -> None:
+        """Hand messages from the parse processes to the local worker until None arrives."""
+        while (message := messages.get()) is not None:
+            self.worker_instance.add_message(message)
+
+    def _count_overruns(self) -> None:
+        overruns = self.ring.overruns
+        if overruns != self._overruns:
+            stats.increment('packets_dropped', overruns - self._overruns)
+            self._overruns = overruns
+
+    def run(self):
+        config = self._config
+        # spawn, not fork: this process already runs worker and webhook threads
+        ctx = multiprocessing.get_context("spawn")
+        log_queue = ctx.Queue()
+        listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers,
+                                                  respect_handler_level=True)
+        listener.start()
+        ring = self.ring = ShmRing(config.ring_size, lock=ctx.Lock())
+        # Bounded, so parse processes slow down with the local transform stage
+        messages = ctx.Queue(maxsize=config.stage_queue_size)
+        relay = threading.Thread(target=self._relay, args=(messages,), name="parse-relay", daemon=True)
+        capture = ctx.Process(target=capture_to_ring, args=(config, ring, log_queue, self._backend),
+                              name="capture", daemon=True)
+        self._processes = [capture] + [
+            ctx.Process(target=parse_from_ring, args=(config, ring, messages, log_queue),
+                        name=f"parse-{i}", daemon=True)
+            for i in range(config.parse_processes)
+        ]
+        logger.info(f"Starting capture process on interface: {config.network_interface} "
+                    f"({config.ring_size} byte ring, {config.parse_processes} extra parse processes)")
+        try:
+            relay.start()
+            for process in self._processes:
+                process.start()
+            while self.running:
+                record = ring.get(timeout=0.5)
+                self._count_overruns()
+                if record is not None:
+                    self.worker_instance.add_packet(record, block=True)
+                elif ring.closed or not capture.is_alive():
+                    break
+        except Exception as e:
+            logger.exception(f"Shared-memory sniffer error: {e}")
+        finally:
+            started = [process for process in self._processes if process.pid is not None]
+            ring.request_stop()
+            if capture in started:
+                capture.join(timeout=2)
+                if capture.is_alive():
+                    capture.terminate()
+                    capture.join()
+            # Capture is gone; hand on what is left in the ring
+            ring.close_writer()
+            while (record := ring.get()) is not None:
+                self.worker_instance.add_packet(record, block=True)
+            self._count_overruns()
+            for process in started[1:]:
+                process.join()
+            # Everything the parse processes sent is queued ahead of this
+            messages.put(None)
+            relay.join()
+            logger.info(f"Ring stats: {ring.snapshot()}")
+            ring.close()
+            listener.stop()
+            logger.info("ShmPacketSniffer stopped.")
+
+    def stop(self):
+        """Stops the capture process; records already in the ring are still handled."""
+        self.running = False
+        logger.info("Stopping ShmPacketSniffer...")
+        if self.ring is not None:
+            self.ring.request_stop()
@@ -0,0 +1,128 @@
+"""Bounded worker stages for the packet pipeline.
+
+A Stage is a bounded queue drained by its own worker thread(s), with a
+handler called for every item. PacketWorker chains them - capture queue
+(decode + parse) -> transform -> deliver - so a slow Discord fills the
+deliver queue instead of stalling parsing and dropping packets at capture.
+
+Every stage keeps its own metrics: items processed, time spent in the
+handler, time items waited in the queue, current depth and the highest
+depth seen. With more than one worker a stage no longer keeps item order.
+"""
+import logging
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STAGE_QUEUE_SIZE = 1000
+
+
+@dataclass
+class StageMetrics:
+    processed: int = 0
+    errors: int = 0
+    # Seconds spent in the handler
+    busy_s: float = 0.0
+    # Seconds items spent queued before a worker picked them up
+    wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    high_water: int = 0
+
+
+class Stage:
+    """Bounded queue + `workers` threads calling `handler` on each item."""
+
+    def __init__(self, name: str, handler: Callable[[Any], None], workers: int = 1,
+                 maxsize: int = DEFAULT_STAGE_QUEUE_SIZE):
+        self.name = name
+        self._handler = handler
+        self.workers = max(1, workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.metrics = StageMetrics()
+
+    def put(self, item: Any, block: bool = True) -> bool:
+        """Queue `item`; returns False when not blocking and the queue is full."""
+        try:
+            self._queue.put((time.perf_counter(), item), block=block)
+        except queue.Full:
+            return False
+        depth = self._queue.qsize()
+        if depth > self.metrics.high_water:
+            with self._lock:
+                self.metrics.high_water = max(self.metrics.high_water, depth)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            queued = self._queue.get()
+            try:
+                if queued is None:
+                    break
+                enqueued_at, item = queued
+                t0 = time.perf_counter()
+                error = False
+                try:
+                    self._handler(item)
+                except Exception as e:
+                    error = True
+                    logger.exception(f"Error in {self.name} stage: {e}")
+                t1 = time.perf_counter()
+                with self._lock:
+                    m = self.metrics
+                    m.processed += 1
+                    m.errors += error
+                    m.busy_s += t1 - t0
+                    wait = t0 - enqueued_at
+                    m.wait_s += wait
+                    if wait > m.max_wait_s:
+                        m.max_wait_s = wait
+            finally:
+                self._queue.task_done()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self) -> None:
+        """Block until every queued item has been handled."""
+        self._queue.join()
+
+    def stop(self) -> None:
+        """Handle what is queued, then stop the workers."""
+        if not self._threads:
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def maxsize(self) -> int:
+        return self._queue.maxsize
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snap = asdict(self.metrics)
+        snap["depth"] = self.depth
+        snap["maxsize"] = self.maxsize
+        snap["workers"] = self.workers
+        processed = snap["processed"] or 1
+        snap["mean_wait_ms"] = snap["wait_s"] / processed * 1000
+        snap["mean_busy_ms"] = snap["busy_s"] / processed * 1000
+        return snap
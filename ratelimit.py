@@ -0,0 +1,210 @@
+"""Discord rate limit tracking for webhook posts.
+
+Discord reports each route's budget in response headers:
+X-RateLimit-Bucket (bucket id), -Limit, -Remaining and -Reset-After
+(seconds until the budget refills). A 429 carries Retry-After and, when it
+is the global limit, X-RateLimit-Global.
+
+RateLimiter learns those per bucket and paces posts: the remaining budget is
+spread evenly over the time left in the window, and one request is kept in
+reserve, so a burst slows down before Discord starts answering 429. Given
+several webhooks, reserve_any() sends on whichever has budget soonest.
+
+A bucket id is not a budget on its own: Discord sends the same hash for
+every webhook's execute route and keeps a separate budget per webhook (the
+route's major parameter). Budgets are therefore keyed by (bucket id,
+webhook id).
+"""
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+# Requests left unused in every window as a safety margin
+DEFAULT_RESERVE = 1
+
+_WEBHOOK_ID = re.compile(r"/webhooks/(\d+)(?:/|$)")
+# The token after the webhook id is the webhook's password
+_WEBHOOK_TOKEN = re.compile(r"(/webhooks/\d+/)[^/?#\s'\"]+")
+
+# (bucket id, major parameter); "" until Discord names the bucket
+BucketKey = tuple[str, str]
+
+
+def webhook_id(route: str) -> str:
+    """The webhook id in a Discord webhook URL, or the URL itself for anything else."""
+    match = _WEBHOOK_ID.search(route)
+    return match.group(1) if match else route
+
+
+def redact_webhooks(text: str) -> str:
+    """`text` with every webhook token masked; use on anything logged that may hold a webhook URL."""
+    return _WEBHOOK_TOKEN.sub(r"\1***", text)
+
+
+@dataclass
+class Bucket:
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    # Monotonic time the budget refills; 0 = unknown
+    reset_at: float = 0.0
+    # Monotonic time the last post was let through
+    last_sent: float = 0.0
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """Per-bucket webhook budgets learned from Discord's rate limit headers."""
+
+    def __init__(self, reserve: int = DEFAULT_RESERVE, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.reserve = reserve
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # route (webhook URL) -> bucket key; routes are their own bucket until Discord names one
+        self._route_buckets: dict[str, BucketKey] = {}
+        self._buckets: dict[BucketKey, Bucket] = {}
+        self._global_until = 0.0
+        self.waited = 0.0
+        self.rate_limited = 0
+
+    def bucket(self, route: str) -> Bucket:
+        with self._lock:
+            return self._bucket(route)
+
+    def _key(self, route: str) -> BucketKey:
+        return self._route_buckets.get(route) or ("", route)
+
+    def _bucket(self, route: str) -> Bucket:
+        key = self._key(route)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket()
+        return bucket
+
+    def reserve_slot(self, route: str) -> float:
+        """Take one request from `route`'s budget.
+
+        Returns 0.0 when the request may go now (budget taken), otherwise the
+        seconds to wait before asking again.
+        """
+        return self.reserve_any((route,))[1]
+
+    def reserve_any(self, routes: Sequence[str]) -> tuple[str, float]:
+        """Take one request from whichever of `routes` can send soonest.
+
+        Ties go to the route with the most budget left, then the one used
+        least recently. Returns the route and
+        0.0 when the request may go now on it, otherwise the route to ask for
+        again and the seconds to wait.
+        """
+        with self._lock:
+            now = self._clock()
+            if now < self._global_until:
+                return routes[0], self._global_until - now
+
+            best = None
+            for route in routes:
+                bucket = self._bucket(route)
+                wait = self._wait(bucket, now)
+                left = bucket.remaining if bucket.remaining is not None else float("inf")
+                key = (wait, -left, bucket.last_sent)
+                if best is None or key < best[0]:
+                    best = (key, route, bucket)
+            (wait, _, _), route, bucket = best
+            if wait > 0:
+                return route, wait
+
+            if bucket.remaining is not None:
+                bucket.remaining -= 1
+            bucket.last_sent = now
+            return route, 0.0
+
+    def _wait(self, bucket: Bucket, now: float) -> float:
+        if bucket.reset_at and now >= bucket.reset_at:
+            # Window over, budget refilled
+            bucket.remaining = bucket.limit
+            bucket.reset_at = 0.0
+
+        if bucket.remaining is not None and bucket.reset_at:
+            usable = bucket.remaining - self.reserve
+            if usable <= 0:
+                return bucket.reset_at - now
+            # Spread what is left evenly over the rest of the window
+            spacing = (bucket.reset_at - now) / usable
+            return max(0.0, bucket.last_sent + spacing - now)
+        return 0.0
+
+    def acquire(self, route: str) -> float:
+        """Block until a post on `route` may be sent; returns the seconds waited."""
+        return self.acquire_any((route,))[1]
+
+    def acquire_any(self, routes: Sequence[str]) -> tuple[str, float]:
+        """Block until a post may be sent on one of `routes`; returns it and the seconds waited."""
+        waited = 0.0
+        while True:
+            route, delay = self.reserve_any(routes)
+            if delay <= 0:
+                if waited:
+                    with self._lock:
+                        self.waited += waited
+                return route, waited
+            self._sleep(delay)
+            waited += delay
+
+    def update(self, route: str, status_code: int, headers: Mapping[str, str]) -> float:
+        """Learn from a response. Returns the seconds to wait before retrying a 429, else 0."""
+        with self._lock:
+            now = self._clock()
+            bucket_id = headers.get("X-RateLimit-Bucket")
+            if bucket_id:
+                key = (bucket_id, webhook_id(route))
+                old_key = self._key(route)
+                if old_key != key:
+                    self._route_buckets[route] = key
+                    self._buckets.setdefault(key, self._buckets.pop(old_key, Bucket()))
+            bucket = self._bucket(route)
+
+            limit = _header_float(headers, "X-RateLimit-Limit")
+            remaining = _header_float(headers, "X-RateLimit-Remaining")
+            reset_after = _header_float(headers, "X-RateLimit-Reset-After")
+            if limit is not None:
+                bucket.limit = int(limit)
+            if reset_after is not None:
+                reset_at = now + reset_after
+                if not bucket.reset_at or reset_at > bucket.reset_at + 0.5:
+                    # New window: the server's count is authoritative
+                    bucket.remaining = None
+                bucket.reset_at = reset_at
+            if remaining is not None:
+                # Responses to parallel posts arrive out of order; keep the lowest count
+                server = int(remaining)
+                bucket.remaining = server if bucket.remaining is None else min(bucket.remaining, server)
+
+            if status_code != 429:
+                return 0.0
+
+            self.rate_limited += 1
+            retry_after = _header_float(headers, "Retry-After") or reset_after or 1.0
+            if headers.get("X-RateLimit-Global", "").lower() == "true":
+                self._global_until = max(self._global_until, now + retry_after)
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
+            logger.warning(f"Discord rate limit hit on {redact_webhooks(route)}, retrying in {retry_after:.2f}s")
+            return retry_after
@@ -0,0 +1,267 @@
+"""Offline replay of a saved capture through the guild chat pipeline.
+
+Reads a pcap/pcapng file, pushes every TCP payload through PacketWorker ->
+guildparser.parse -> Guild_message at full speed and reports throughput.
+Doubles as the standard hot path benchmark:
+
+    uv run replay.py capture.pcapng --sink null
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Sequence, Union
+
+from capture_backends import PcapFileBackend
+from dedupe import DEFAULT_WINDOW
+from packet_sniffer import PacketSnifferConfig, PacketWorker
+from sinks import MessageSink, NullSink, StdoutSink, WebhookSink
+
+
+logger = logging.getLogger(__name__)
+
+SINKS = ("null", "stdout", "mock-webhook")
+MOCK_BUCKET = "mock-webhook"
+
+
+class MockWebhookServer:
+    """Local HTTP server answering webhook posts like Discord does (200, JSON body).
+
+    Keeps connections alive like Discord does. `latency` delays every answer,
+    `status` replaces the 200. With `rate_limit=(limit, window_s)` it sends
+    Discord's X-RateLimit-* headers and answers 429 + Retry-After once the
+    window's budget is used up. Posted bodies are kept in `payloads`, client
+    (host, port) pairs in `connections`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 rate_limit: Optional[tuple[int, float]] = None):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                with server._lock:
+                    server.requests += 1
+                    server.connections.add(self.client_address)
+                    status = server.status
+                    headers = server._rate_limit_headers()
+                    if "Retry-After" in headers:
+                        status = 429
+                        server.rate_limited += 1
+                    else:
+                        try:
+                            server.payloads.append(json.loads(raw or b"null"))
+                        except ValueError:
+                            server.payloads.append(None)
+                if server.latency:
+                    time.sleep(server.latency)
+                if status == 429:
+                    body = json.dumps({"message": "You are being rate limited.",
+                                       "retry_after": float(headers["Retry-After"]), "global": False}).encode()
+                else:
+                    body = b"{}"
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.latency = latency
+        self.status = 200
+        self.rate_limit = rate_limit
+        self.rate_limited = 0
+        self.payloads: list = []
+        self.connections: set = set()
+        self._window_start = 0.0
+        self._window_used = 0
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    def _rate_limit_headers(self) -> dict[str, str]:
+        """Count one request against the rate limit window (call with the lock held)."""
+        if not self.rate_limit:
+            return {}
+        limit, window = self.rate_limit
+        now = time.monotonic()
+        if now - self._window_start >= window:
+            self._window_start = now
+            self._window_used = 0
+        reset_after = self._window_start + window - now
+        headers = {
+            # Like Discord: one bucket hash for every webhook, each with its own budget
+            "X-RateLimit-Bucket": MOCK_BUCKET,
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if self._window_used >= limit:
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["Retry-After"] = f"{reset_after:.3f}"
+            return headers
+        self._window_used += 1
+        headers["X-RateLimit-Remaining"] = str(limit - self._window_used)
+        return headers
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def create_sink(name: str, webhook_url: Union[str, Sequence[str]] = "") -> MessageSink:
+    if name == "null":
+        return NullSink()
+    if name == "stdout":
+        return StdoutSink()
+    if name == "mock-webhook":
+        return WebhookSink(webhook_url)
+    raise ValueError(f"Unknown sink '{name}', expected one of: {', '.join(SINKS)}")
+
+
+def replay(path: str, sink: MessageSink, bpf_filter: str = "", in_game_char_name: str = "",
+           queue_maxsize: int = 1000, native_reassembly: bool = False,
+           guild_only: bool = False, dedupe_window: float = 0.0) -> dict:
+    """Replay `path` through a PacketWorker and return the benchmark report."""
+    config = PacketSnifferConfig(
+        discord_webhook_url="",
+        network_interface=path,
+        in_game_char_name=in_game_char_name,
+        queue_maxsize=queue_maxsize,
+        bpf_filter=bpf_filter,
+        capture_backend=PcapFileBackend.name,
+        native_reassembly=native_reassembly,
+        guild_capture_filter=guild_only,
+        dedupe_window=dedupe_window,
+    )
+    backend = PcapFileBackend(path, bpf_filter, native_reassembly, guild_only)
+    worker = PacketWorker(config, sink=sink)
+    worker.start()
+
+    packets = 0
+    start = time.perf_counter()
+    for record in backend.records():
+        worker.add_packet(record, block=True)
+        packets += 1
+    worker.drain()
+    sink.flush()
+    elapsed = time.perf_counter() - start
+    stages = worker.stage_metrics()
+    worker.stop()
+
+    return {
+        "frames": backend.frames_read,
+        "packets": packets,
+        "messages": sink.delivered,
+        "duplicates": worker.dedupe.dropped if worker.dedupe else 0,
+        "elapsed_s": elapsed,
+        "packets_per_s": packets / elapsed if elapsed else 0.0,
+        "messages_per_s": sink.delivered / elapsed if elapsed else 0.0,
+        "stage_times_s": dict(worker.stage_times),
+        "stages": {name: {k: m[k] for k in ("high_water", "maxsize", "mean_wait_ms", "max_wait_s")}
+                   for name, m in stages.items() if name != "capture"},
+        "frames_per_segment": dict(sorted(worker.frames_per_segment.items())),
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"frames read:   {report['frames']}",
+        f"tcp payloads:  {report['packets']}",
+        f"messages:      {report['messages']}",
+        f"duplicates:    {report.get('duplicates', 0)}",
+        f"elapsed:       {report['elapsed_s']:.3f} s",
+        f"packets/s:     {report['packets_per_s']:.0f}",
+        f"messages/s:    {report['messages_per_s']:.0f}",
+        "frames per segment: " + ", ".join(
+            f"{frames} -> {count}" for frames, count in report.get("frames_per_segment", {}).items()),
+        "stage time:",
+    ]
+    packets = report["packets"] or 1
+    for stage, seconds in report["stage_times_s"].items():
+        lines.append(f"  {stage:<10} {seconds * 1000:10.2f} ms  {seconds / packets * 1e6:8.2f} us/packet")
+    if report.get("stages"):
+        lines.append("stage queues:")
+        for stage, m in report["stages"].items():
+            lines.append(f"  {stage:<10} peak {m['high_water']:>5}/{m['maxsize']:<5} "
+                         f"wait {m['mean_wait_ms']:8.3f} ms mean {m['max_wait_s'] * 1000:8.3f} ms max")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a pcap/pcapng file through the guild chat parser.")
+    parser.add_argument("pcap", help="pcap or pcapng file to replay")
+    parser.add_argument("--sink", choices=SINKS, default="null", help="where parsed messages go (default: null)")
+    parser.add_argument("--filter", default="src host 54.214.176.167",
+                        help="[src|dst] host filter applied to frames ('' for none)")
+    parser.add_argument("--char-name", default="", help="own character name, its messages are skipped")
+    parser.add_argument("--native-reassembly", action="store_true",
+                        help="reassemble TCP streams into Mabinogi frames before parsing")
+    parser.add_argument("--guild-only", action="store_true",
+                        help="drop segments that do not start with a guild chat frame (capture filter)")
+    parser.add_argument("--dedupe-window", type=float, default=0.0,
+                        help=f"seconds repeated guild frames are dropped (default: 0 = off, e.g. {DEFAULT_WINDOW})")
+    parser.add_argument("--mock-rate-limit", metavar="LIMIT/SECONDS",
+                        help="make the mock webhook enforce a Discord style rate limit, e.g. 5/2")
+    parser.add_argument("--mock-webhooks", type=int, default=1, metavar="N",
+                        help="run N mock webhooks and spread posts over them (default: 1)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log at INFO level")
+    args = parser.parse_args(argv)
+    if args.guild_only and args.native_reassembly:
+        parser.error("--guild-only cannot be combined with --native-reassembly")
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s [%(levelname)-8s] %(name)s: %(message)s",
+        datefmt="%H:%M:%S"
+    )
+
+    servers: list[MockWebhookServer] = []
+    if args.sink == "mock-webhook":
+        rate_limit = None
+        if args.mock_rate_limit:
+            limit, _, window = args.mock_rate_limit.partition("/")
+            rate_limit = (int(limit), float(window or 1))
+        for _ in range(max(1, args.mock_webhooks)):
+            server = MockWebhookServer(rate_limit=rate_limit)
+            server.start()
+            servers.append(server)
+    try:
+        sink = create_sink(args.sink, [server.url for server in servers])
+        report = replay(args.pcap, sink, bpf_filter=args.filter, in_game_char_name=args.char_name,
+                        native_reassembly=args.native_reassembly, guild_only=args.guild_only,
+                        dedupe_window=args.dedupe_window)
+    finally:
+        for server in servers:
+            server.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
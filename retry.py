@@ -0,0 +1,292 @@
+"""Retry stage for webhook delivery.
+
+RetryingSink wraps another sink. A message whose delivery fails is tried
+again after a capped exponential backoff with full jitter
+(RetryPolicy.delay), up to `max_attempts` times, and then written to a
+dead-letter file. Errors Discord will never accept (4xx other than 429,
+which DeliveryEngine already waits out) go to the dead-letter file at once;
+they still show Discord is reachable, so the breaker counts them as a success.
+
+A CircuitBreaker counts consecutive failures. Once it opens, nothing is
+sent: new and due messages are held in order until `reset_timeout` has
+passed, then a single probe goes out. A successful probe closes the
+breaker and the held messages are sent; a failed one opens it again.
+
+deliver() never waits for any of this - retries are scheduled on a
+background thread - so the packet worker keeps parsing newer messages
+while older ones back off. Per-sender order is kept for messages that
+succeed first time; a retried message is posted after newer ones.
+"""
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from delivery import WebhookError
+from Guildmessage import Guild_message
+from ratelimit import redact_webhooks
+from sinks import DeliveryAbandoned, MessageSink
+from stats import stats
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    base_delay: float = DEFAULT_BASE_DELAY
+    max_delay: float = DEFAULT_MAX_DELAY
+
+    def delay(self, attempts: int, rng: Callable[[], float] = random.random) -> float:
+        """Seconds to wait after the `attempts`-th failed attempt: uniform in [0, capped backoff]."""
+        return rng() * min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+
+def is_permanent(error: BaseException) -> bool:
+    """True for failures a retry cannot fix."""
+    if isinstance(error, WebhookError):
+        return 400 <= error.status_code < 500 and error.status_code not in (408, 429)
+    return False
+
+
+class CircuitBreaker:
+    """Stops delivery after `failure_threshold` consecutive failures."""
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """May a post go out now? In half-open state only the first caller gets to probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() >= self._opened_at + self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a probe through."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Webhook delivery recovered, circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                if self.state == CLOSED:
+                    self.trips += 1
+                    logger.warning(f"Webhook delivery failed {self.failures} times in a row, "
+                                   f"pausing for {self.reset_timeout:.0f}s")
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+
+@dataclass(eq=False)
+class _Entry:
+    message: Guild_message
+    future: Future = field(default_factory=Future)
+    attempts: int = 0
+    last_error: str = ""
+
+
+class RetryingSink(MessageSink):
+    """Retries failed deliveries of `inner` with backoff, dead-letters the rest."""
+
+    def __init__(self, inner: MessageSink, policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, dead_letter_path: str = "",
+                 clock: Callable[[], float] = time.monotonic, rng: Callable[[], float] = random.random):
+        super().__init__()
+        self._inner = inner
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.dead_letter_path = dead_letter_path
+        self._clock = clock
+        self._rng = rng
+        self._cond = threading.Condition()
+        # (due, seq, entry) waiting out their backoff
+        self._scheduled: list[tuple[float, int, _Entry]] = []
+        self._seq = itertools.count()
+        # Entries waiting for the breaker, oldest first
+        self._held: list[_Entry] = []
+        # Entries not yet delivered or dead-lettered
+        self._outstanding = 0
+        self._dead_letter_lock = threading.Lock()
+        self._closed = False
+        self.retries = 0
+        self.dead_lettered = 0
+        self._thread = threading.Thread(target=self._run, name="webhook-retry", daemon=True)
+        self._thread.start()
+
+    def deliver(self, message: Guild_message) -> Future:
+        entry = _Entry(message)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RetryingSink is closed")
+            self._outstanding += 1
+        self._send(entry)
+        return entry.future
+
+    def _send(self, entry: _Entry) -> None:
+        with self._cond:
+            # Behind messages already waiting for the breaker, to keep their order
+            if self._held or not self.breaker.allow():
+                self._held.append(entry)
+                self._cond.notify_all()
+                return
+        self._dispatch(entry)
+
+    def _dispatch(self, entry: _Entry) -> None:
+        entry.attempts += 1
+        try:
+            future = self._inner.deliver(entry.message)
+        except Exception as e:
+            self._failed(entry, e)
+            return
+        if future is None:
+            self._succeeded(entry)
+        else:
+            future.add_done_callback(lambda f: self._on_done(entry, f))
+
+    def _on_done(self, entry: _Entry, future: Future) -> None:
+        error = CancelledError() if future.cancelled() else future.exception()
+        if error is None:
+            self._succeeded(entry)
+        else:
+            self._failed(entry, error)
+
+    def _succeeded(self, entry: _Entry) -> None:
+        self.breaker.record_success()
+        self._count()
+        self._resolve(entry, None)
+
+    def _failed(self, entry: _Entry, error: BaseException) -> None:
+        # Logged and written to the dead-letter file; requests errors quote the webhook URL
+        entry.last_error = redact_webhooks(str(error))
+        if is_permanent(error):
+            # Discord answered, so the endpoint is up; this also ends a half-open probe
+            self.breaker.record_success()
+            self._dead_letter(entry)
+            return
+        self.breaker.record_failure()
+        if entry.attempts >= self.policy.max_attempts:
+            self._dead_letter(entry)
+            return
+        delay = self.policy.delay(entry.attempts, self._rng)
+        logger.warning(f"Delivery of message from {entry.message.name} failed (attempt {entry.attempts}), "
+                       f"retrying in {delay:.1f}s: {entry.last_error}")
+        self.retries += 1
+        stats.increment('retries')
+        with self._cond:
+            heapq.heappush(self._scheduled, (self._clock() + delay, next(self._seq), entry))
+            self._cond.notify_all()
+
+    def _dead_letter(self, entry: _Entry) -> None:
+        logger.error(f"Giving up on message from {entry.message.name} after {entry.attempts} attempt(s): "
+                     f"{entry.last_error}")
+        self.dead_lettered += 1
+        stats.increment('dead_letters')
+        if self.dead_letter_path:
+            record = {"time": time.time(), "name": entry.message.name, "content": entry.message.content,
+                      "attempts": entry.attempts, "error": entry.last_error}
+            try:
+                with self._dead_letter_lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.error(f"Could not write dead letter to {self.dead_letter_path}: {e}")
+        self._resolve(entry, DeliveryAbandoned(entry.last_error))
+
+    def _resolve(self, entry: _Entry, error: Optional[BaseException]) -> None:
+        if error is None:
+            entry.future.set_result(None)
+        else:
+            entry.future.set_exception(error)
+        with self._cond:
+            self._outstanding -= 1
+            # A success may have closed the breaker for held messages
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            due: list[_Entry] = []
+            released: list[_Entry] = []
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    now = self._clock()
+                    while self._scheduled and self._scheduled[0][0] <= now:
+                        due.append(heapq.heappop(self._scheduled)[2])
+                    while self._held and self.breaker.allow():
+                        released.append(self._held.pop(0))
+                    if due or released:
+                        break
+                    timeout = None
+                    if self._scheduled:
+                        timeout = self._scheduled[0][0] - now
+                    if self._held and self.breaker.state == OPEN:
+                        wait = self.breaker.retry_in()
+                        timeout = wait if timeout is None else min(timeout, wait)
+                    self._cond.wait(timeout)
+            for entry in released:
+                self._dispatch(entry)
+            # Due retries pass the breaker like new messages
+            for entry in due:
+                self._send(entry)
+
+    @property
+    def pending(self) -> int:
+        """Messages not yet delivered or dead-lettered."""
+        with self._cond:
+            return self._outstanding
+
+    def flush(self) -> None:
+        """Block until every message is delivered or dead-lettered."""
+        with self._cond:
+            while self._outstanding and not self._closed:
+                self._cond.wait()
+        self._inner.flush()
+
+    def close(self) -> None:
+        """Stop retrying; messages still waiting are abandoned (a spool keeps them)."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._inner.close()
@@ -0,0 +1,209 @@
+"""Shared-memory ring buffer between a capture process and parse processes.
+
+One capture process writes CaptureRecords into a
+multiprocessing.shared_memory block; one or more processes read them back
+out. A record is a fixed header (payload length, timestamp, flow id) plus
+the payload bytes copied in place, so nothing is pickled on the way.
+
+Positions are byte counters that only grow; the offset in the data area
+is the position modulo the capacity. A record never straddles the end of
+the data area: when it does not fit, the writer marks the rest as skipped
+(WRAP) and starts again at offset 0. The single writer owns write_pos and
+publishes it after the record is in place. Readers share read_pos under
+a multiprocessing.Lock.
+
+When the ring is full the writer drops the record and counts an overrun
+instead of waiting, like the capture queue does. Fill level, high water
+mark and overruns live in the shared header, so any process can read them.
+"""
+import logging
+import struct
+import time
+from multiprocessing import shared_memory
+from multiprocessing.synchronize import Lock
+from typing import Optional
+
+from capture_backends import CaptureRecord
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RING_SIZE = 4 * 1024 * 1024
+
+# Shared header: u64 counters, then two flag bytes
+_U64 = struct.Struct("<Q")
+_WRITE = 0
+_READ = 8
+_OVERRUNS = 16
+_WRITTEN = 24
+_HIGH_WATER = 32
+_TAKEN = 40
+_CLOSED = 48
+_STOP = 49
+HEADER_SIZE = 64
+
+# Record header: payload length, capture time, flow id (96 bits, see flow_id)
+_RECORD = struct.Struct("<Id12s")
+_LENGTH = struct.Struct("<I")
+WRAP = 0xFFFFFFFF
+
+
+class ShmRing:
+    """Byte ring of CaptureRecords in shared memory; one writer, any number of readers.
+
+    Created without `name` it allocates the block (and unlinks it on close);
+    pickled into a child process it attaches to the same block by name.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_RING_SIZE, name: Optional[str] = None,
+                 lock: Optional[Lock] = None, poll_interval: float = 0.001):
+        if lock is None:
+            import multiprocessing
+            lock = multiprocessing.get_context("spawn").Lock()
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self._lock = lock
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + capacity)
+            self._shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        else:
+            # The creating process owns cleanup; don't let this one's tracker unlink it
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        self._buf = self._shm.buf
+        # Writer side cache of write_pos; only the writer process changes it
+        self._write = self._load(_WRITE)
+
+    def __reduce__(self):
+        return (ShmRing, (self.capacity, self.name, self._lock, self.poll_interval))
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def _load(self, offset: int) -> int:
+        return _U64.unpack_from(self._buf, offset)[0]
+
+    def _store(self, offset: int, value: int) -> None:
+        _U64.pack_into(self._buf, offset, value)
+
+    def put(self, record: CaptureRecord) -> bool:
+        """Copy `record` into the ring; False (and an overrun) when it does not fit."""
+        payload = record.payload
+        size = _RECORD.size + len(payload)
+        capacity = self.capacity
+        write = self._write
+        offset = write % capacity
+        tail = capacity - offset
+        needed = size if tail >= size else tail + size
+        used = write - self._load(_READ)
+        if size > capacity or used + needed > capacity:
+            self._store(_OVERRUNS, self._load(_OVERRUNS) + 1)
+            return False
+        buf = self._buf
+        if tail < size:
+            if tail >= _LENGTH.size:
+                _LENGTH.pack_into(buf, HEADER_SIZE + offset, WRAP)
+            write += tail
+            offset = 0
+        start = HEADER_SIZE + offset
+        _RECORD.pack_into(buf, start, len(payload), record.ts, record.flow.to_bytes(12, "big"))
+        start += _RECORD.size
+        buf[start:start + len(payload)] = payload
+        write += size
+        self._write = write
+        # Publish only once the record is in place
+        self._store(_WRITE, write)
+        self._store(_WRITTEN, self._load(_WRITTEN) + 1)
+        used += needed
+        if used > self._load(_HIGH_WATER):
+            self._store(_HIGH_WATER, used)
+        return True
+
+    def _take(self) -> Optional[CaptureRecord]:
+        with self._lock:
+            read = self._load(_READ)
+            if read == self._load(_WRITE):
+                return None
+            capacity = self.capacity
+            buf = self._buf
+            offset = read % capacity
+            tail = capacity - offset
+            if tail < _LENGTH.size or _LENGTH.unpack_from(buf, HEADER_SIZE + offset)[0] == WRAP:
+                read += tail
+                offset = 0
+            start = HEADER_SIZE + offset
+            length, ts, flow = _RECORD.unpack_from(buf, start)
+            start += _RECORD.size
+            payload = bytes(buf[start:start + length])
+            self._store(_READ, read + _RECORD.size + length)
+            self._store(_TAKEN, self._load(_TAKEN) + 1)
+        return CaptureRecord(ts, int.from_bytes(flow, "big"), payload)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CaptureRecord]:
+        """Next record, waiting up to `timeout` seconds (forever if None).
+
+        Returns None on timeout, or once the writer has closed and the ring is empty.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Read the flag first: a record published before close is still taken
+            closed = self.closed
+            record = self._take()
+            if record is not None or closed:
+                return record
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    @property
+    def closed(self) -> bool:
+        """The writer is done; what is left in the ring is all there will be."""
+        return bool(self._buf[_CLOSED])
+
+    def close_writer(self) -> None:
+        if self._buf is not None:
+            self._buf[_CLOSED] = 1
+
+    @property
+    def stop_requested(self) -> bool:
+        return bool(self._buf[_STOP])
+
+    def request_stop(self) -> None:
+        """Ask the writer to stop capturing (it checks between records)."""
+        if self._buf is not None:
+            self._buf[_STOP] = 1
+
+    @property
+    def used(self) -> int:
+        """Bytes written and not yet read."""
+        return self._load(_WRITE) - self._load(_READ)
+
+    @property
+    def fill(self) -> float:
+        return self.used / self.capacity
+
+    @property
+    def overruns(self) -> int:
+        return self._load(_OVERRUNS)
+
+    def snapshot(self) -> dict:
+        used = self.used
+        return {
+            "capacity": self.capacity,
+            "used": used,
+            "fill": used / self.capacity,
+            "high_water": self._load(_HIGH_WATER),
+            "written": self._load(_WRITTEN),
+            "read": self._load(_TAKEN),
+            "overruns": self._load(_OVERRUNS),
+        }
+
+    def close(self) -> None:
+        """Detach from the block; the creating process also frees it."""
+        if self._buf is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
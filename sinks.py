@@ -0,0 +1,256 @@
+import logging
+import sys
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Optional, Sequence, TextIO, Union
+
+from discord_webhook import DiscordWebhook
+from batching import DEFAULT_MAX_BATCH, MessageBatcher
+from delivery import DEFAULT_MAX_IN_FLIGHT, DeliveryEngine
+from Guildmessage import Guild_message
+from ratelimit import redact_webhooks
+
+from stats import stats
+
+
+logger = logging.getLogger(__name__)
+
+# Discord has 2000 char limit per message - chunk below it
+MAX_CHUNK = 1900
+# Discord username limit
+MAX_USERNAME = 80
+# Discord embed limit per message
+MAX_EMBEDS = 10
+# Lane every batched post goes through, keeping batches in order
+BATCH_LANE = "batch"
+
+
+def chunk_content(content: str, max_chunk: int = MAX_CHUNK) -> list[str]:
+    """Split message content into Discord-sized chunks."""
+    return [content[i:i + max_chunk] for i in range(0, len(content), max_chunk)]
+
+
+def build_payloads(message: Guild_message) -> list[dict]:
+    """Webhook JSON bodies for `message`, one per chunk, emote embeds included."""
+    payloads = []
+    for i, chunk in enumerate(chunk_content(message.content)):
+        webhook = DiscordWebhook(
+            url="",
+            username=message.name[:MAX_USERNAME] if i == 0 else "",
+            content=chunk
+        )
+        message.add_emotes(webhook)
+        payload = webhook.json
+        # Query parameter, not part of the body
+        payload.pop("wait", None)
+        payloads.append(payload)
+    return payloads
+
+
+def _emote_count(message: Guild_message) -> int:
+    probe = DiscordWebhook(url="")
+    message.add_emotes(probe)
+    return len(probe.embeds)
+
+
+def _render_batch(messages: list[Guild_message], bot_name: str) -> dict:
+    senders = {m.name for m in messages}
+    if len(senders) == 1:
+        username = messages[0].name
+        content = "\n".join(m.content for m in messages)
+    else:
+        username = bot_name
+        content = "\n".join(f"**{m.name}**: {m.content}" for m in messages)
+    webhook = DiscordWebhook(url="", username=username[:MAX_USERNAME], content=content)
+    for m in messages:
+        m.add_emotes(webhook)
+    payload = webhook.json
+    payload.pop("wait", None)
+    return payload
+
+
+def build_batch_payloads(messages: list[Guild_message], bot_name: str) -> list[tuple[dict, int]]:
+    """Webhook JSON bodies for a batch of messages, as (payload, messages in it) pairs.
+
+    Messages are packed in order into as few posts as fit under MAX_CHUNK
+    characters and MAX_EMBEDS embeds. A post from a single sender goes out
+    under their name; a mixed post goes out as `bot_name` with every line
+    prefixed by its sender. A message too long for one post on its own falls
+    back to build_payloads() chunking and counts once, on its last chunk.
+    """
+    out: list[tuple[dict, int]] = []
+    group: list[Guild_message] = []
+    length = 0
+    embeds = 0
+
+    def close_group() -> None:
+        nonlocal group, length, embeds
+        if group:
+            out.append((_render_batch(group, bot_name), len(group)))
+        group, length, embeds = [], 0, 0
+
+    for message in messages:
+        # Sized as a prefixed line, the longest form it can be rendered in
+        line = len(f"**{message.name}**: {message.content}")
+        emotes = _emote_count(message)
+        if line > MAX_CHUNK:
+            close_group()
+            chunks = build_payloads(message)
+            out.extend((payload, 1 if i == len(chunks) - 1 else 0) for i, payload in enumerate(chunks))
+            continue
+        if group and (length + 1 + line > MAX_CHUNK or embeds + emotes > MAX_EMBEDS):
+            close_group()
+        group.append(message)
+        length += line + (1 if length else 0)
+        embeds += emotes
+    close_group()
+    return out
+
+
+class DeliveryAbandoned(Exception):
+    """A message was given up on and recorded elsewhere (dead-letter file); do not retry it."""
+
+
+def _resolve_when_done(parts: list[Future], targets: list[Future]) -> None:
+    """Resolve every future in `targets` once all of `parts` are done, failed if any part failed."""
+    remaining = [len(parts)]
+    lock = threading.Lock()
+
+    def done(_: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        error = None
+        for part in parts:
+            error = CancelledError() if part.cancelled() else part.exception()
+            if error is not None:
+                break
+        for target in targets:
+            if target.done():
+                continue
+            if error is None:
+                target.set_result(None)
+            else:
+                target.set_exception(error)
+
+    for part in parts:
+        part.add_done_callback(done)
+
+
+class MessageSink:
+    """Destination for cleaned guild messages coming out of PacketWorker."""
+
+    def __init__(self):
+        self._count_lock = threading.Lock()
+        self.delivered = 0
+
+    def deliver(self, message: Guild_message) -> Optional[Future]:
+        """Hand over `message`. Returns a Future resolved once it is delivered
+        when that happens in the background, None when it already has been."""
+        raise NotImplementedError
+
+    def _count(self, n: int = 1) -> None:
+        with self._count_lock:
+            self.delivered += n
+
+    def flush(self) -> None:
+        """Block until every message handed to deliver() has been sent."""
+
+    def close(self) -> None:
+        pass
+
+
+class WebhookSink(MessageSink):
+    """Posts messages to a Discord webhook through a pooled DeliveryEngine.
+
+    deliver() only queues the chunks and returns; they are posted in the
+    background, in order per sender. `webhook_url` may be a list of webhooks
+    for the same channel to spread posts over.
+
+    With `batch_window` > 0, messages arriving within that many seconds of
+    each other (up to `max_batch`) are coalesced into shared posts by
+    build_batch_payloads(); batches are posted in order on one lane.
+    """
+
+    def __init__(self, webhook_url: Union[str, Sequence[str]], max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 engine: Optional[DeliveryEngine] = None, batch_window: float = 0.0,
+                 max_batch: int = DEFAULT_MAX_BATCH, bot_name: str = "DefaultBot"):
+        super().__init__()
+        self._webhook_url = webhook_url
+        self._engine = engine or DeliveryEngine(webhook_url, max_in_flight)
+        self._bot_name = bot_name
+        self._batcher: Optional[MessageBatcher[tuple[Guild_message, Future]]] = None
+        if batch_window > 0:
+            self._batcher = MessageBatcher(self._post_batch, batch_window, max_batch)
+
+    def deliver(self, message: Guild_message) -> Future:
+        delivered: Future = Future()
+        if self._batcher is not None:
+            self._batcher.add((message, delivered))
+            return delivered
+        parts = []
+        for payload in build_payloads(message):
+            logger.info(f"{message.name}: {payload.get('content', '')}")
+            future = self._engine.submit(payload, lane=message.name)
+            future.add_done_callback(self._on_done)
+            parts.append(future)
+        _resolve_when_done(parts, [delivered])
+        return delivered
+
+    def _post_batch(self, items: list[tuple[Guild_message, Future]]) -> None:
+        parts: list[Future] = []
+        i = 0
+        for payload, n in build_batch_payloads([message for message, _ in items], self._bot_name):
+            logger.info(f"{payload.get('username', '')}: {payload.get('content', '')}")
+            future = self._engine.submit(payload, lane=BATCH_LANE)
+            future.add_done_callback(lambda f, n=n: self._on_done(f, n))
+            parts.append(future)
+            if n:
+                # Earlier chunks of an oversized message count towards it too
+                _resolve_when_done(parts, [delivered for _, delivered in items[i:i + n]])
+                parts = []
+                i += n
+
+    def _on_done(self, future: Future, n: int = 1) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            # requests errors quote the URL, token included
+            logger.error(f"Webhook post failed: {redact_webhooks(str(error))}")
+            stats.increment('errors')
+            return
+        logger.debug(f"Webhook response: {future.result().status_code}")
+        if n:
+            stats.increment('messages_to_discord', n)
+            self._count(n)
+
+    def flush(self) -> None:
+        if self._batcher is not None:
+            self._batcher.flush()
+        self._engine.join()
+
+    def close(self) -> None:
+        if self._batcher is not None:
+            self._batcher.close()
+        self._engine.close()
+
+
+class NullSink(MessageSink):
+    """Discards messages; counts them only. Used for benchmarking."""
+
+    def deliver(self, message: Guild_message) -> None:
+        self._count()
+
+
+class StdoutSink(MessageSink):
+    """Writes messages as ``name: content`` lines."""
+
+    def __init__(self, stream: TextIO | None = None):
+        super().__init__()
+        self._stream = stream or sys.stdout
+
+    def deliver(self, message: Guild_message) -> None:
+        self._stream.write(f"{message.name}: {message.content}\n")
+        self._count()
@@ -0,0 +1,334 @@
+"""Durable on-disk spool for guild messages waiting to be delivered.
+
+Spool is an append-only write-ahead log of JSON lines: a put record
+({"id", "name", "content"}) when a message is accepted and an ack record
+({"ack": id}) once it has been posted. On startup the log is read back and
+every put without an ack is pending again, in the original order, so a
+crash, restart or Discord outage loses nothing. Ids only ever grow and an
+acked id is never handed out again, so a message is posted at most once
+per put - unless the process dies between Discord accepting a post and its
+ack reaching the disk (at most `sync_interval`).
+
+Writes use group commit: put()/ack() only append to an in-memory buffer,
+a background thread writes and fsyncs everything buffered once per
+`sync_interval`. One fsync covers every record of that interval, so the
+packet worker never waits on the disk. When the log has grown past
+`compact_bytes` and is mostly acked records, it is rewritten with only
+the pending puts and swapped in atomically. The rewrite works from a
+snapshot and does not hold the lock put()/ack() need; it costs one pass
+over the pending messages and is tried at most once per doubling of the
+log, whether or not it pays off.
+
+SpoolingSink puts every message in the spool and feeds an inner sink from
+it with at most `max_in_flight` messages outstanding, so a slow or down
+Discord backs messages up on disk instead of blocking the packet worker.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Optional
+
+from Guildmessage import Guild_message
+from sinks import DeliveryAbandoned, MessageSink
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_INTERVAL = 0.05
+DEFAULT_COMPACT_BYTES = 1 << 20
+DEFAULT_SPOOL_IN_FLIGHT = 100
+
+
+class Spool:
+    """Append-only, group-committed log of pending messages."""
+
+    def __init__(self, path: str, sync_interval: float = DEFAULT_SYNC_INTERVAL,
+                 compact_bytes: int = DEFAULT_COMPACT_BYTES):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.compact_bytes = compact_bytes
+        self._cond = threading.Condition()
+        # id -> (name, content), in put order
+        self._pending: "OrderedDict[int, tuple[str, str]]" = OrderedDict()
+        self._buffer: list[str] = []
+        # Records appended / records known to be on disk
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._next_id = 1
+        self._closed = False
+        self.compactions = 0
+        self.recovered = self._load()
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        # Log size that triggers the next compaction attempt
+        self._compact_at = compact_bytes
+        self._thread = threading.Thread(target=self._run, name="spool-sync", daemon=True)
+        self._thread.start()
+
+    def _load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write at the tail from a crash; the record never counted
+                    logger.warning(f"Skipping unreadable spool record in {self.path}")
+                    continue
+                if "next" in record:
+                    # Written by compaction: acked ids below it are gone from the file
+                    self._next_id = max(self._next_id, record["next"])
+                elif "ack" in record:
+                    self._pending.pop(record["ack"], None)
+                    self._next_id = max(self._next_id, record["ack"] + 1)
+                else:
+                    self._pending[record["id"]] = (record["name"], record["content"])
+                    self._next_id = max(self._next_id, record["id"] + 1)
+        if self._pending:
+            logger.info(f"Recovered {len(self._pending)} undelivered message(s) from {self.path}")
+        return len(self._pending)
+
+    def _append(self, record: dict) -> None:
+        # Caller holds self._cond
+        if self._closed:
+            raise RuntimeError("Spool is closed")
+        self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self._written_seq += 1
+        if len(self._buffer) == 1:
+            self._cond.notify_all()
+
+    def put(self, message: Guild_message) -> int:
+        """Spool `message`; returns its id. Durable within `sync_interval`."""
+        with self._cond:
+            message_id = self._next_id
+            self._next_id += 1
+            self._pending[message_id] = (message.name, message.content)
+            self._append({"id": message_id, "name": message.name, "content": message.content})
+            return message_id
+
+    def ack(self, message_id: int) -> None:
+        """Mark `message_id` delivered; it will not be replayed."""
+        with self._cond:
+            if self._pending.pop(message_id, None) is not None:
+                self._append({"ack": message_id})
+
+    def pending(self) -> list[tuple[int, Guild_message]]:
+        """Messages not yet acked, oldest first."""
+        with self._cond:
+            return [(i, Guild_message(name, content)) for i, (name, content) in self._pending.items()]
+
+    def pending_ids(self) -> list[int]:
+        """Ids of the messages not yet acked, oldest first."""
+        with self._cond:
+            return list(self._pending)
+
+    def get(self, message_id: int) -> Optional[Guild_message]:
+        """The pending message `message_id`, or None once it is acked."""
+        with self._cond:
+            record = self._pending.get(message_id)
+        return None if record is None else Guild_message(*record)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def sync(self) -> None:
+        """Block until everything put/acked so far is on disk."""
+        with self._cond:
+            target = self._written_seq
+            self._cond.notify_all()
+            while self._synced_seq < target and not self._closed:
+                self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                closed = self._closed
+            if not closed:
+                # Let the rest of this interval's records join the same fsync
+                with self._cond:
+                    self._cond.wait(self.sync_interval)
+            self._commit()
+            if closed:
+                return
+
+    def _commit(self) -> None:
+        with self._cond:
+            lines, self._buffer = self._buffer, []
+            seq = self._written_seq
+        if lines:
+            data = "".join(lines)
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._size += len(data.encode("utf-8"))
+        with self._cond:
+            self._synced_seq = seq
+            self._cond.notify_all()
+        if self._size > self._compact_at:
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        # Only this thread writes the file; put()/ack() keep appending to the buffer meanwhile
+        with self._cond:
+            next_id = self._next_id
+            pending = list(self._pending.items())
+            # Buffered records already reflected in the snapshot, and where they end
+            covered = len(self._buffer)
+            seq = self._written_seq
+        live = [json.dumps({"next": next_id}) + "\n"]
+        live += [json.dumps({"id": i, "name": name, "content": content}, ensure_ascii=False) + "\n"
+                 for i, (name, content) in pending]
+        data = "".join(live)
+        size = len(data.encode("utf-8"))
+        # Only worth it once acked records are most of the file
+        if size * 2 > self._size:
+            self._compact_at = 2 * self._size
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._fsync_dir()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = size
+        self._compact_at = max(self.compact_bytes, 2 * size)
+        with self._cond:
+            # The new file holds the snapshot: its puts are in it, its acks left them out
+            del self._buffer[:covered]
+            self._synced_seq = max(self._synced_seq, seq)
+            self._cond.notify_all()
+            self.compactions += 1
+        logger.debug(f"Compacted spool {self.path} to {len(pending)} pending message(s)")
+
+    def _fsync_dir(self) -> None:
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._file.close()
+
+
+class SpoolingSink(MessageSink):
+    """Spools every message to disk, then delivers it through `inner`.
+
+    Messages left in the spool by an earlier run are delivered first. Only
+    their ids are queued here; the message itself is read back from the
+    spool when it is handed to `inner`. A message is acked once `inner`
+    reports it delivered or abandoned (DeliveryAbandoned). Any other
+    failure leaves it in the spool but not in the queue: it is not tried
+    again until the next start, so `inner` should do its own retrying
+    (RetryingSink) and only give up through DeliveryAbandoned.
+    """
+
+    def __init__(self, inner: MessageSink, spool: Spool, max_in_flight: int = DEFAULT_SPOOL_IN_FLIGHT):
+        super().__init__()
+        self._inner = inner
+        self._spool = spool
+        self.max_in_flight = max(1, max_in_flight)
+        self._cond = threading.Condition()
+        # Ids spooled this run (or recovered), not yet handed to inner
+        self._queue: deque[int] = deque(spool.pending_ids())
+        self._in_flight = 0
+        self._closing = False
+        self.failed = 0
+        self._thread = threading.Thread(target=self._pump, name="spool-pump", daemon=True)
+        self._thread.start()
+
+    def deliver(self, message: Guild_message) -> None:
+        message_id = self._spool.put(message)
+        with self._cond:
+            self._queue.append(message_id)
+            self._cond.notify_all()
+
+    def _pump(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closing and (not self._queue or self._in_flight >= self.max_in_flight):
+                    self._cond.wait()
+                if self._closing:
+                    return
+                message_id = self._queue.popleft()
+                self._in_flight += 1
+            message = self._spool.get(message_id)
+            if message is None:
+                # Acked since it was queued; nothing left to send
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+                continue
+            try:
+                future = self._inner.deliver(message)
+            except Exception as e:
+                logger.error(f"Spooled message {message_id} could not be handed over: {e}")
+                self._finish(message_id, False)
+                continue
+            if future is None:
+                self._finish(message_id, True)
+            else:
+                future.add_done_callback(lambda f, i=message_id: self._on_done(i, f))
+
+    def _on_done(self, message_id: int, future: Future) -> None:
+        if future.cancelled():
+            self._finish(message_id, False)
+        elif isinstance(future.exception(), DeliveryAbandoned):
+            # Dead-lettered: not delivered, but not to be replayed either
+            self._spool.ack(message_id)
+            self._finish(message_id, False)
+        else:
+            self._finish(message_id, future.exception() is None)
+
+    def _finish(self, message_id: int, delivered: bool) -> None:
+        if delivered:
+            self._spool.ack(message_id)
+            self._count()
+        else:
+            self.failed += 1
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @property
+    def backlog(self) -> int:
+        """Messages spooled but not yet handed to the inner sink."""
+        with self._cond:
+            return len(self._queue)
+
+    def flush(self) -> None:
+        with self._cond:
+            while (self._queue or self._in_flight) and not self._closing:
+                self._cond.wait()
+        self._inner.flush()
+        self._spool.sync()
+
+    def close(self) -> None:
+        """Stop handing out messages; what is not delivered yet stays spooled."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._inner.close()
+        self._spool.close()
@@ -10,6 +10,12 @@ class Stats:
     messages_to_discord: int = 0
     messages_to_game: int = 0
     errors: int = 0
+    duplicates_dropped: int = 0
+    packets_dropped: int = 0
+    retries: int = 0
+    dead_letters: int = 0
+    game_retypes: int = 0
+    game_lost: int = 0
     start_time: float = field(default_factory=time.time)
     _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
@@ -31,6 +37,12 @@ class Stats:
                 "messages_to_discord": self.messages_to_discord,
                 "messages_to_game": self.messages_to_game,
                 "errors": self.errors,
+                "duplicates_dropped": self.duplicates_dropped,
+                "packets_dropped": self.packets_dropped,
+                "retries": self.retries,
+                "dead_letters": self.dead_letters,
+                "game_retypes": self.game_retypes,
+                "game_lost": self.game_lost,
                 "start_time": self.start_time,
             }
 
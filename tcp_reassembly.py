@@ -0,0 +1,198 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from Mabipacket.framing import LENGTH_FIELD_END, find_frame_start, frame_length, plausible_frame
+
+
+logger = logging.getLogger(__name__)
+
+SEQ_MOD = 1 << 32
+SEQ_HALF = 1 << 31
+
+# (src_ip, src_port, dst_ip, dst_port)
+FlowKey = tuple[bytes, int, bytes, int]
+
+
+def seq_diff(a: int, b: int) -> int:
+    """Signed distance a - b in 32-bit TCP sequence space."""
+    return ((a - b + SEQ_HALF) % SEQ_MOD) - SEQ_HALF
+
+
+@dataclass
+class FlowState:
+    next_seq: int
+    buffer: bytearray = field(default_factory=bytearray)
+    # Out-of-order segments waiting for the gap before them, keyed by seq
+    pending: dict[int, bytes] = field(default_factory=dict)
+    pending_bytes: int = 0
+    last_seen: float = 0.0
+    # Whether buffer[0] is known to start a frame; not on a new flow, after a gap
+    # or after unframed data
+    aligned: bool = False
+
+
+@dataclass
+class ReassemblyStats:
+    segments: int = 0
+    frames: int = 0
+    retransmits: int = 0
+    out_of_order: int = 0
+    gaps: int = 0
+    overflows: int = 0
+    evicted_flows: int = 0
+    # Times the stream did not start with a frame header, and the bytes skipped to find one
+    realigns: int = 0
+    skipped_bytes: int = 0
+
+
+class TcpReassembler:
+    """Per-flow TCP reassembly that emits complete Mabinogi frames.
+
+    Segments are ordered by sequence number, retransmitted bytes are trimmed
+    and out-of-order segments are held until the hole before them fills.
+    Frames are cut on the header length field (Mabipacket.framing). The
+    first bytes of a flow are not trusted to start a frame: when it was
+    joined mid-frame, or the header where a frame should start does not look
+    like one, the reassembler skips ahead to the next plausible header
+    (Mabipacket.framing.find_frame_start). Data with no plausible header at
+    all is passed through as one chunk, as the per-segment path would.
+
+    Memory is bounded per flow (buffered + pending bytes) and by flow count.
+    A flow that exceeds its budget gives up on the hole and resyncs on the
+    newest segment, which is assumed to start a frame.
+    """
+
+    def __init__(self, max_flows: int = 64, max_flow_bytes: int = 256 * 1024,
+                 flow_timeout: float = 300.0):
+        self.max_flows = max_flows
+        self.max_flow_bytes = max_flow_bytes
+        self.flow_timeout = flow_timeout
+        self._flows: OrderedDict[FlowKey, FlowState] = OrderedDict()
+        self.stats = ReassemblyStats()
+
+    @property
+    def flow_count(self) -> int:
+        return len(self._flows)
+
+    def buffered_bytes(self) -> int:
+        return sum(len(s.buffer) + s.pending_bytes for s in self._flows.values())
+
+    def feed(self, flow: FlowKey, seq: int, payload: bytes, now: float | None = None) -> list[bytes]:
+        """Add a segment and return the frames it completed, in stream order."""
+        if not payload:
+            return []
+        now = time.monotonic() if now is None else now
+        self.stats.segments += 1
+
+        state = self._flows.get(flow)
+        if state is None:
+            self._expire(now)
+            state = FlowState(next_seq=seq)
+            self._flows[flow] = state
+            if len(self._flows) > self.max_flows:
+                self._flows.popitem(last=False)
+                self.stats.evicted_flows += 1
+        else:
+            self._flows.move_to_end(flow)
+        state.last_seen = now
+
+        diff = seq_diff(seq, state.next_seq)
+        if diff < 0:
+            # Retransmit or overlap: keep only bytes we have not seen yet
+            if -diff >= len(payload):
+                self.stats.retransmits += 1
+                return []
+            payload = payload[-diff:]
+            seq = state.next_seq
+            diff = 0
+
+        if diff > 0:
+            self.stats.out_of_order += 1
+            if seq in state.pending:
+                self.stats.retransmits += 1
+                return []
+            if len(state.buffer) + state.pending_bytes + len(payload) > self.max_flow_bytes:
+                self._resync(state, seq)
+            else:
+                state.pending[seq] = payload
+                state.pending_bytes += len(payload)
+                return []
+
+        self._append(state, payload)
+        self._drain_pending(state)
+        return self._cut_frames(state)
+
+    def _append(self, state: FlowState, payload: bytes) -> None:
+        state.buffer += payload
+        state.next_seq = (state.next_seq + len(payload)) % SEQ_MOD
+
+    def _drain_pending(self, state: FlowState) -> None:
+        while state.pending:
+            progressed = False
+            for seq in list(state.pending):
+                diff = seq_diff(seq, state.next_seq)
+                if diff > 0:
+                    continue
+                payload = state.pending.pop(seq)
+                state.pending_bytes -= len(payload)
+                if -diff < len(payload):
+                    self._append(state, payload[-diff:])
+                    progressed = True
+            if not progressed:
+                break
+
+    def _resync(self, state: FlowState, seq: int) -> None:
+        self.stats.gaps += 1
+        logger.debug(f"Reassembly gap on flow, resyncing at seq {seq}")
+        state.buffer.clear()
+        state.pending.clear()
+        state.pending_bytes = 0
+        state.next_seq = seq
+        state.aligned = False
+
+    def _cut_frames(self, state: FlowState) -> list[bytes]:
+        frames = []
+        buf = state.buffer
+        offset = 0
+        while len(buf) - offset >= LENGTH_FIELD_END:
+            if not state.aligned or not plausible_frame(buf, offset):
+                # Joined mid-frame or lost track: skip to the next frame header
+                start = find_frame_start(buf, offset)
+                if start is None:
+                    # Nothing to frame on: hand the rest over unframed
+                    frames.append(bytes(buf[offset:]))
+                    offset = len(buf)
+                    state.aligned = False
+                    break
+                if start != offset:
+                    self.stats.realigns += 1
+                    self.stats.skipped_bytes += start - offset
+                    logger.debug(f"Reassembly realigned, skipped {start - offset} bytes")
+                    offset = start
+                state.aligned = True
+            length = frame_length(buf, offset)
+            if length is None or len(buf) - offset < length:
+                break
+            frames.append(bytes(buf[offset:offset + length]))
+            offset += length
+        if offset:
+            del buf[:offset]
+        if len(buf) > self.max_flow_bytes:
+            self.stats.overflows += 1
+            buf.clear()
+            state.aligned = False
+        self.stats.frames += len(frames)
+        return frames
+
+    def _expire(self, now: float) -> None:
+        while self._flows:
+            flow, state = next(iter(self._flows.items()))
+            if now - state.last_seen < self.flow_timeout:
+                break
+            del self._flows[flow]
+            self.stats.evicted_flows += 1
+
+    def reset(self) -> None:
+        self._flows.clear()
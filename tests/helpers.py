@@ -0,0 +1,58 @@
+"""Builders and fakes shared by the test modules."""
+import struct
+
+
+SERVER_IP = bytes([54, 214, 176, 167])
+CLIENT_IP = bytes([192, 168, 1, 10])
+
+
+class FakeClock:
+    """Stand-in for time.monotonic (call it) and time.sleep (advances `now`)."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def mabi_frame(body: bytes) -> bytes:
+    """Plaintext Mabinogi-style frame: 3 magic bytes, LE length at 3-4, flags byte, body.
+
+    The magic is the plaintext 0x70 (0x88 marks an encrypted frame, which the
+    parsers reject). The header grows a seventh byte when the length is over
+    255, as guildparser expects.
+    """
+    header_len = 7 if 6 + len(body) > 255 else 6
+    length = header_len + len(body)
+    return b"\x70\x00\x00" + length.to_bytes(2, "little") + b"\x00" * (header_len - 5) + body
+
+
+def make_guild_payload(name: str, message: str) -> bytes:
+    """TCP payload carrying one guild chat frame from `name`."""
+    params = b""
+    for text in (name, message):
+        raw = text.encode("utf-8")
+        params += b"\x06" + struct.pack(">H", len(raw)) + raw
+    return b"\x00" * 6 + b"\xc3\x6f\x00\x00" + b"\x00" * 8 + b"\x01" + params
+
+
+def make_ip_packet(payload: bytes, src: bytes = SERVER_IP, dst: bytes = CLIENT_IP, protocol: int = 6,
+                   frag: int = 0, seq: int = 1, tcp_options: bytes = b"") -> bytes:
+    """IPv4/TCP packet around `payload`, server port 11020 to client port 50000."""
+    offset_words = (20 + len(tcp_options)) // 4
+    tcp = struct.pack("!HHIIBBHHH", 11020, 50000, seq, 1, offset_words << 4, 0x18, 1024, 0, 0) + tcp_options
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp) + len(payload), 0, frag, 64, protocol, 0, src, dst)
+    return ip + tcp + payload
+
+
+def make_frame(payload: bytes, vlan: bool = False, padding: bytes = b"", **kwargs) -> bytes:
+    """Ethernet frame around make_ip_packet(payload, **kwargs)."""
+    eth = b"\x00" * 12
+    if vlan:
+        eth += struct.pack("!HH", 0x8100, 1)
+    eth += struct.pack("!H", 0x0800)
+    return eth + make_ip_packet(payload, **kwargs) + padding
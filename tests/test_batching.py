@@ -0,0 +1,103 @@
+import pytest
+import threading
+import time
+
+from batching import MessageBatcher
+from Guildmessage import Guild_message
+from sinks import MAX_CHUNK, MAX_EMBEDS, build_batch_payloads
+
+
+def _collector():
+    batches = []
+    done = threading.Event()
+
+    def on_batch(batch):
+        batches.append(batch)
+        done.set()
+    return batches, done, on_batch
+
+
+class TestMessageBatcher:
+    def test_window_coalesces(self):
+        batches, done, on_batch = _collector()
+        batcher = MessageBatcher(on_batch, window=0.1)
+        for i in range(3):
+            batcher.add(i)
+        assert done.wait(2)
+        batcher.close()
+        assert batches == [[0, 1, 2]]
+
+    def test_max_batch_flushes_immediately(self):
+        batches, _, on_batch = _collector()
+        batcher = MessageBatcher(on_batch, window=60, max_batch=2)
+        for i in range(5):
+            batcher.add(i)
+        assert batches == [[0, 1], [2, 3]]
+        assert len(batcher) == 1
+        batcher.close()
+        assert batches == [[0, 1], [2, 3], [4]]
+
+    def test_flush_and_close(self):
+        batches, _, on_batch = _collector()
+        batcher = MessageBatcher(on_batch, window=60)
+        batcher.add("a")
+        batcher.flush()
+        assert batches == [["a"]]
+        batcher.close()
+        batcher.close()
+        assert batches == [["a"]]
+
+    def test_closed_rejects(self):
+        batcher = MessageBatcher(lambda batch: None, window=0.1)
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.add(1)
+
+    def test_window_starts_at_first_message(self):
+        batches, done, on_batch = _collector()
+        batcher = MessageBatcher(on_batch, window=0.05)
+        start = time.monotonic()
+        batcher.add(1)
+        assert done.wait(2)
+        assert time.monotonic() - start >= 0.05
+        batcher.close()
+
+
+class TestBuildBatchPayloads:
+    def test_single_sender_keeps_username(self):
+        out = build_batch_payloads([Guild_message("Alice", "hi"), Guild_message("Alice", "there")], "Bot")
+        assert len(out) == 1
+        payload, n = out[0]
+        assert n == 2
+        assert payload["username"] == "Alice"
+        assert payload["content"] == "hi\nthere"
+
+    def test_mixed_senders_prefixed(self):
+        out = build_batch_payloads([Guild_message("Alice", "hi"), Guild_message("Bob", "yo")], "Bot")
+        payload, n = out[0]
+        assert n == 2
+        assert payload["username"] == "Bot"
+        assert payload["content"] == "**Alice**: hi\n**Bob**: yo"
+
+    def test_splits_under_limit(self):
+        messages = [Guild_message(f"P{i}", "x" * 600) for i in range(5)]
+        out = build_batch_payloads(messages, "Bot")
+        assert len(out) > 1
+        assert sum(n for _, n in out) == 5
+        assert all(len(p["content"]) <= MAX_CHUNK for p, _ in out)
+        joined = "\n".join(p["content"] for p, _ in out)
+        assert [line.split("**")[1] for line in joined.split("\n")] == [f"P{i}" for i in range(5)]
+
+    def test_oversized_message_falls_back_to_chunks(self):
+        messages = [Guild_message("Alice", "short"), Guild_message("Bob", "y" * 4000)]
+        out = build_batch_payloads(messages, "Bot")
+        assert [n for _, n in out] == [1, 0, 0, 1]
+        assert out[0][0]["content"] == "short"
+        assert out[1][0]["username"] == "Bob"
+        assert "".join(p["content"] for p, _ in out[1:]) == "y" * 4000
+
+    def test_embed_limit(self):
+        messages = [Guild_message("Alice", ":foxspin:") for _ in range(MAX_EMBEDS + 2)]
+        out = build_batch_payloads(messages, "Bot")
+        assert [n for _, n in out] == [MAX_EMBEDS, 2]
+        assert all(len(p["embeds"]) <= MAX_EMBEDS for p, _ in out)
@@ -0,0 +1,310 @@
+import pytest
+import struct
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from capture_backends import (
+    AFPacketBackend,
+    CaptureRecord,
+    IterableBackend,
+    PysharkBackend,
+    create_capture_backend,
+    flow_id,
+    parse_host_filter,
+    payload_from_pyshark,
+    TcpSegment,
+    segment_from_pyshark,
+    tcp_segment_from_frame,
+    TsharkFieldsBackend,
+    record_from_fields,
+    segment_from_fields,
+    tshark_fields_command,
+)
+from packet_sniffer import PacketSnifferConfig, PacketWorker, PacketSniffer
+
+from tests.helpers import CLIENT_IP, SERVER_IP, make_frame
+
+
+class TestTcpSegmentFromFrame:
+    def test_extracts_segment(self):
+        result = tcp_segment_from_frame(make_frame(b"hello", seq=1234))
+        assert result == TcpSegment(SERVER_IP, CLIENT_IP, 11020, 50000, 1234, b"hello")
+        assert result.flow == (SERVER_IP, 11020, CLIENT_IP, 50000)
+
+    def test_vlan_tagged_frame(self):
+        result = tcp_segment_from_frame(make_frame(b"hello", vlan=True))
+        assert result is not None
+        assert result.payload == b"hello"
+
+    def test_trims_ethernet_padding(self):
+        result = tcp_segment_from_frame(make_frame(b"hi", padding=b"\x00" * 10))
+        assert result is not None
+        assert result.payload == b"hi"
+
+    def test_non_tcp_returns_none(self):
+        assert tcp_segment_from_frame(make_frame(b"hello", protocol=17)) is None
+
+    def test_non_ipv4_returns_none(self):
+        frame = b"\x00" * 12 + struct.pack("!H", 0x86DD) + b"\x00" * 60
+        assert tcp_segment_from_frame(frame) is None
+
+    def test_truncated_frame_returns_none(self):
+        assert tcp_segment_from_frame(b"\x00" * 10) is None
+        assert tcp_segment_from_frame(make_frame(b"")[:30]) is None
+
+
+class TestParseHostFilter:
+    def test_src_host(self):
+        assert parse_host_filter("src host 54.214.176.167") == ("src", SERVER_IP)
+
+    def test_dst_host(self):
+        assert parse_host_filter("dst host 54.214.176.167") == ("dst", SERVER_IP)
+
+    def test_any_host(self):
+        assert parse_host_filter("host 54.214.176.167") == ("any", SERVER_IP)
+
+    def test_complex_filter_unsupported(self):
+        assert parse_host_filter("tcp and port 11020") is None
+        assert parse_host_filter("src host not-an-ip") is None
+
+
+class TestAFPacketBackend:
+    def test_matches_src_filter(self):
+        backend = AFPacketBackend("eth0", "src host 54.214.176.167")
+        assert backend._host_filter.matches(SERVER_IP, CLIENT_IP)
+        assert not backend._host_filter.matches(CLIENT_IP, SERVER_IP)
+
+    def test_unsupported_filter_captures_all(self, caplog):
+        backend = AFPacketBackend("eth0", "tcp port 11020")
+        assert "cannot apply filter" in caplog.text
+        assert backend._host_filter.matches(CLIENT_IP, SERVER_IP)
+
+    @patch("capture_backends.socket.socket")
+    def test_payloads_filters_frames(self, mock_socket_class):
+        backend = AFPacketBackend("eth0", "src host 54.214.176.167")
+        mock_sock = MagicMock()
+        mock_socket_class.return_value = mock_sock
+        frames = [
+            make_frame(b"from server"),
+            make_frame(b"from client", src=CLIENT_IP, dst=SERVER_IP),
+            make_frame(b"udp", protocol=17),
+            make_frame(b""),
+        ]
+
+        def recv(_size):
+            if frames:
+                return frames.pop(0)
+            backend.close()
+            raise TimeoutError
+
+        mock_sock.recv.side_effect = recv
+        assert list(backend.payloads()) == [b"from server"]
+        mock_sock.bind.assert_called_once_with(("eth0", 0))
+        mock_sock.close.assert_called_once()
+
+
+class TestNativeReassembly:
+    @patch("capture_backends.socket.socket")
+    def test_afpacket_joins_split_frame(self, mock_socket_class):
+        backend = AFPacketBackend("eth0", "src host 54.214.176.167", native_reassembly=True)
+        frame = b"\x00\x00\x00\x0a\x00\x00ABCD"  # 10-byte Mabinogi frame
+        frames = [make_frame(frame[:4], seq=100), make_frame(frame[4:], seq=104)]
+
+        def recv(_size):
+            if frames:
+                return frames.pop(0)
+            backend.close()
+            raise TimeoutError
+
+        mock_socket_class.return_value.recv.side_effect = recv
+        assert list(backend.payloads()) == [frame]
+
+    def test_segment_from_pyshark(self):
+        packet = MagicMock()
+        packet.ip.src = "54.214.176.167"
+        packet.ip.dst = "192.168.1.10"
+        packet.tcp.srcport = "11020"
+        packet.tcp.dstport = "50000"
+        packet.tcp.seq_raw = "77"
+        packet.tcp.payload = "41:42"
+        assert segment_from_pyshark(packet) == TcpSegment(SERVER_IP, CLIENT_IP, 11020, 50000, 77, b"AB")
+
+    @patch("capture_backends.pyshark.LiveCapture")
+    def test_pyshark_native_disables_desegment(self, mock_live_capture):
+        mock_live_capture.return_value.sniff_continuously.return_value = iter([])
+        backend = PysharkBackend("eth0", "", native_reassembly=True)
+        assert list(backend.payloads()) == []
+        assert mock_live_capture.call_args.kwargs["override_prefs"] == {"tcp.desegment_tcp_streams": "FALSE"}
+
+
+class TestPysharkBackend:
+    def test_payload_prefers_reassembled(self):
+        packet = MagicMock()
+        packet.tcp.reassembled_data = "41:42"
+        packet.tcp.payload = "43:44"
+        assert payload_from_pyshark(packet) == b"AB"
+
+    def test_payload_falls_back_to_segment(self):
+        packet = MagicMock()
+        packet.tcp.reassembled_data = None
+        packet.tcp.payload = "43:44"
+        assert payload_from_pyshark(packet) == b"CD"
+
+    def test_payload_missing(self):
+        packet = MagicMock()
+        del packet.tcp
+        assert payload_from_pyshark(packet) is None
+
+    @patch("capture_backends.pyshark.LiveCapture")
+    def test_payloads_skips_non_tcp(self, mock_live_capture):
+        tcp_packet = MagicMock()
+        tcp_packet.__contains__ = MagicMock(return_value=True)
+        tcp_packet.tcp.payload = "48656c6c6f"
+        other_packet = MagicMock()
+        other_packet.__contains__ = MagicMock(return_value=False)
+        mock_live_capture.return_value.sniff_continuously.return_value = iter([tcp_packet, other_packet])
+
+        backend = PysharkBackend("eth0", "src host 1.2.3.4")
+        assert list(backend.payloads()) == [b"Hello"]
+        backend.close()
+        mock_live_capture.return_value.close.assert_called_once()
+
+    @patch("capture_backends.pyshark.LiveCapture")
+    def test_records_carry_flow_and_time(self, mock_live_capture):
+        packet = MagicMock()
+        packet.__contains__ = MagicMock(return_value=True)
+        packet.sniff_timestamp = "1700000000.5"
+        packet.ip.src = "54.214.176.167"
+        packet.ip.dst = "192.168.1.10"
+        packet.tcp.srcport = "11020"
+        packet.tcp.dstport = "50000"
+        packet.tcp.payload = "48656c6c6f"
+        mock_live_capture.return_value.sniff_continuously.return_value = iter([packet])
+
+        records = list(PysharkBackend("eth0", "").records())
+        assert records == [CaptureRecord(1700000000.5, flow_id(SERVER_IP, 11020, CLIENT_IP, 50000), b"Hello")]
+
+
+def fields_line(payload: str = "48656c6c6f", reassembled: str = "", seq: int = 1) -> bytes:
+    return "\t".join(["1700000000.5", "3", "54.214.176.167", "11020", "192.168.1.10", "50000",
+                      str(seq), payload, reassembled]).encode() + b"\n"
+
+
+class TestTsharkFieldsBackend:
+    def test_command(self):
+        cmd = tshark_fields_command("eth0", "src host 1.2.3.4", desegment=False)
+        assert cmd[:3] == ["tshark", "-i", "eth0"]
+        assert "tcp.desegment_tcp_streams:FALSE" in cmd
+        assert cmd[cmd.index("-f") + 1] == "src host 1.2.3.4"
+        assert cmd[cmd.index("-T") + 1] == "fields"
+        assert [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-e"][-2:] == ["tcp.payload", "tcp.reassembled.data"]
+
+    def test_record_prefers_reassembled(self):
+        record = record_from_fields(fields_line("4344", "41:42"))
+        assert record == CaptureRecord(1700000000.5, flow_id(SERVER_IP, 11020, CLIENT_IP, 50000), b"AB")
+
+    def test_record_skips_empty_and_malformed(self):
+        assert record_from_fields(fields_line("")) is None
+        assert record_from_fields(b"1700000000.5\t3\n") is None
+        assert record_from_fields(fields_line("zz")) is None
+
+    def test_segment(self):
+        segment = segment_from_fields(fields_line("4344", "4142", seq=7))
+        assert segment == TcpSegment(SERVER_IP, CLIENT_IP, 11020, 50000, 7, b"CD")
+        assert segment.ts == 1700000000.5
+
+    @patch("capture_backends.subprocess.Popen")
+    def test_records_from_tshark_output(self, mock_popen):
+        proc = mock_popen.return_value
+        proc.stdout = iter([fields_line(), fields_line(""), fields_line("4142")])
+        proc.poll.return_value = None
+        proc.returncode = 0
+
+        backend = TsharkFieldsBackend("eth0", "src host 1.2.3.4")
+        assert list(backend.payloads()) == [b"Hello", b"AB"]
+        assert backend.lines_read == 3
+        assert "tcp.desegment_tcp_streams:TRUE" in mock_popen.call_args[0][0]
+        proc.terminate.assert_called_once()
+
+    @patch("capture_backends.subprocess.Popen")
+    def test_native_reassembly_reads_segments(self, mock_popen):
+        proc = mock_popen.return_value
+        proc.stdout = iter([fields_line("4142", seq=1), fields_line("4344", seq=3)])
+        proc.returncode = 0
+
+        backend = TsharkFieldsBackend("eth0", "", native_reassembly=True)
+        list(backend.records())
+        assert "tcp.desegment_tcp_streams:FALSE" in mock_popen.call_args[0][0]
+
+
+    def test_chatty_stderr_does_not_stall_capture(self, caplog):
+        # Far more than a pipe buffer on stderr before the one line on stdout
+        script = (f"import sys; sys.stderr.write('warning\\n' * 100000); sys.stderr.flush(); "
+                  f"sys.stdout.buffer.write({fields_line()!r}); sys.exit(2)")
+        backend = TsharkFieldsBackend("eth0", "")
+        payloads = []
+        with patch("capture_backends.tshark_fields_command", return_value=[sys.executable, "-c", script]):
+            reader = threading.Thread(target=lambda: payloads.extend(backend.payloads()), daemon=True)
+            reader.start()
+            reader.join(timeout=10)
+        assert not reader.is_alive()
+        assert payloads == [b"Hello"]
+        assert "tshark exited with 2: warning" in caplog.text
+
+
+class TestCaptureRecord:
+    def test_slotted(self):
+        record = CaptureRecord(0.0, 0, b"x")
+        assert not hasattr(record, "__dict__")
+
+    def test_flow_id_distinguishes_direction(self):
+        assert flow_id(SERVER_IP, 11020, CLIENT_IP, 50000) != flow_id(CLIENT_IP, 50000, SERVER_IP, 11020)
+
+    def test_pyshark_packet_reduced_to_bytes_on_queue(self):
+        config = PacketSnifferConfig(
+            discord_webhook_url="https://discord.com/api/webhooks/test",
+            network_interface="Ethernet",
+            in_game_char_name="TestChar",
+        )
+        worker = PacketWorker(config)
+        packet = MagicMock()
+        packet.tcp.payload = "48656c6c6f"
+        worker.add_packet(packet)
+        assert worker._queue.get_nowait() == b"Hello"
+
+
+class TestCreateCaptureBackend:
+    def test_known_backends(self):
+        assert isinstance(create_capture_backend("pyshark", "eth0", ""), PysharkBackend)
+        assert isinstance(create_capture_backend("afpacket", "eth0", ""), AFPacketBackend)
+        assert isinstance(create_capture_backend("tshark", "eth0", ""), TsharkFieldsBackend)
+
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError, match="Unknown capture backend"):
+            create_capture_backend("nope", "eth0", "")
+
+    def test_guild_only_rejects_native_reassembly(self):
+        # Filtered segments would be sequence holes that stall the flow
+        with pytest.raises(ValueError, match="native reassembly"):
+            create_capture_backend("afpacket", "eth0", "", native_reassembly=True, guild_only=True)
+
+
+class TestSnifferWithInjectedBackend:
+    @patch("packet_sniffer.parser.parse_view")
+    def test_backend_payloads_reach_worker(self, mock_parse):
+        mock_parse.return_value = False
+        config = PacketSnifferConfig(
+            discord_webhook_url="https://discord.com/api/webhooks/test",
+            network_interface="Ethernet",
+            in_game_char_name="TestChar",
+        )
+        worker = PacketWorker(config)
+        worker.start()
+        sniffer = PacketSniffer(config, worker, backend=IterableBackend([b"one", b"two"]))
+        sniffer.run()
+        time.sleep(0.1)
+        worker.stop()
+
+        assert [c.args[0] for c in mock_parse.call_args_list] == [b"one", b"two"]
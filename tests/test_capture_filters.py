@@ -0,0 +1,153 @@
+import pytest
+import socket
+import struct
+from unittest.mock import patch
+
+from capture_filters import (
+    BPF_RET_K,
+    attach_bpf,
+    build_capture_program,
+    guild_bpf_expression,
+    guild_display_filter,
+    matches_guild_opcode,
+)
+from capture_backends import PcapFileBackend, PysharkBackend
+from tests.helpers import CLIENT_IP, SERVER_IP, make_frame, mabi_frame
+
+
+GUILD = b"\xc3\x6f\x00\x00"
+MOVE = b"\x00\x00\x52\x1d"
+
+
+def opcode_frame(opcode: bytes, body_len: int = 20) -> bytes:
+    return mabi_frame(opcode + b"\x00" * body_len)
+
+
+def run_bpf(program, packet: bytes) -> int:
+    """Minimal classic BPF interpreter covering the opcodes the builder emits."""
+    a = x = pc = 0
+    while True:
+        code, jt, jf, k = program[pc]
+        pc += 1
+        if code == 0x20:
+            a = int.from_bytes(packet[k:k + 4], "big")
+        elif code == 0x28:
+            a = int.from_bytes(packet[k:k + 2], "big")
+        elif code == 0x30:
+            a = packet[k]
+        elif code == 0x40:
+            a = int.from_bytes(packet[x + k:x + k + 4], "big")
+        elif code == 0x50:
+            a = packet[x + k]
+        elif code == 0xB1:
+            x = 4 * (packet[k] & 0x0F)
+        elif code == 0x54:
+            a &= k
+        elif code == 0x74:
+            a >>= k
+        elif code == 0x0C:
+            a = (a + x) & 0xFFFFFFFF
+        elif code == 0x07:
+            x = a
+        elif code == 0x15:
+            pc += jt if a == k else jf
+        elif code == 0x45:
+            pc += jt if a & k else jf
+        elif code == BPF_RET_K:
+            return k
+        else:
+            raise AssertionError(f"unexpected opcode {code:#x}")
+
+
+class TestMatchesGuildOpcode:
+    def test_short_header(self):
+        assert matches_guild_opcode(opcode_frame(GUILD))
+
+    def test_long_header(self):
+        assert matches_guild_opcode(opcode_frame(GUILD, body_len=300))
+
+    def test_other_opcode(self):
+        assert not matches_guild_opcode(opcode_frame(MOVE))
+        assert not matches_guild_opcode(opcode_frame(MOVE, body_len=300))
+
+    def test_too_short(self):
+        assert not matches_guild_opcode(b"\x88\x00")
+
+
+class TestBpfProgram:
+    @pytest.fixture
+    def program(self):
+        return build_capture_program(("src", SERVER_IP), guild_only=True)
+
+    def test_accepts_guild_frames(self, program):
+        assert run_bpf(program, make_frame(opcode_frame(GUILD))) > 0
+        assert run_bpf(program, make_frame(opcode_frame(GUILD, body_len=300))) > 0
+
+    def test_handles_tcp_options(self, program):
+        options = b"\x01\x01\x08\x0a" + b"\x00" * 8  # NOP NOP timestamps
+        assert run_bpf(program, make_frame(opcode_frame(GUILD), tcp_options=options)) > 0
+
+    def test_drops_other_opcodes(self, program):
+        assert run_bpf(program, make_frame(opcode_frame(MOVE))) == 0
+        assert run_bpf(program, make_frame(opcode_frame(MOVE, body_len=300))) == 0
+
+    def test_drops_wrong_host(self, program):
+        assert run_bpf(program, make_frame(opcode_frame(GUILD), src=CLIENT_IP, dst=SERVER_IP)) == 0
+
+    def test_drops_non_tcp_and_fragments(self, program):
+        assert run_bpf(program, make_frame(opcode_frame(GUILD), protocol=17)) == 0
+        assert run_bpf(program, make_frame(opcode_frame(GUILD), frag=5)) == 0
+
+    def test_any_host_direction(self):
+        program = build_capture_program(("any", SERVER_IP), guild_only=False)
+        assert run_bpf(program, make_frame(b"x", src=SERVER_IP, dst=CLIENT_IP)) > 0
+        assert run_bpf(program, make_frame(b"x", src=CLIENT_IP, dst=SERVER_IP)) > 0
+        assert run_bpf(program, make_frame(b"x", src=CLIENT_IP, dst=CLIENT_IP)) == 0
+
+    def test_no_host_filter(self):
+        program = build_capture_program(None, guild_only=True)
+        assert run_bpf(program, make_frame(opcode_frame(GUILD), src=CLIENT_IP)) > 0
+
+    def test_attach_to_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            attach_bpf(sock, build_capture_program(("src", SERVER_IP), guild_only=True))
+        except OSError as e:
+            pytest.skip(f"SO_ATTACH_FILTER unavailable: {e}")
+        finally:
+            sock.close()
+
+
+class TestFilterExpressions:
+    def test_bpf_expression_combines_base(self):
+        expr = guild_bpf_expression("src host 54.214.176.167")
+        assert expr.startswith("(src host 54.214.176.167) and tcp and ")
+        assert "0xc36f0000" in expr
+        assert "+ 6:4]" in expr and "+ 7:4]" in expr
+
+    def test_bpf_expression_without_base(self):
+        assert guild_bpf_expression().startswith("tcp and ")
+
+    def test_display_filter(self):
+        assert "tcp.payload[6:4] == c3:6f:00:00" in guild_display_filter()
+
+
+class TestGuildOnlyBackends:
+    @patch("capture_backends.pyshark.LiveCapture")
+    def test_pyshark_compiles_opcode_into_bpf(self, mock_live_capture):
+        mock_live_capture.return_value.sniff_continuously.return_value = iter([])
+        backend = PysharkBackend("eth0", "src host 54.214.176.167", guild_only=True)
+        list(backend.payloads())
+        assert mock_live_capture.call_args.kwargs["bpf_filter"] == guild_bpf_expression("src host 54.214.176.167")
+
+    def test_pcap_backend_guild_only(self, tmp_path):
+        frames = [make_frame(opcode_frame(GUILD)), make_frame(opcode_frame(MOVE)), make_frame(opcode_frame(GUILD, 300))]
+        out = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)
+        for frame in frames:
+            out += struct.pack("<IIII", 0, 0, len(frame), len(frame)) + frame
+        path = tmp_path / "cap.pcap"
+        path.write_bytes(out)
+
+        assert len(list(PcapFileBackend(str(path), "", guild_only=False).payloads())) == 3
+        payloads = list(PcapFileBackend(str(path), "", guild_only=True).payloads())
+        assert [p[6:10] if p[4] == 0 else p[7:11] for p in payloads] == [GUILD, GUILD]
@@ -0,0 +1,52 @@
+from dedupe import DedupeCache, frame_key
+from tests.helpers import FakeClock
+
+
+class TestDedupeCache:
+    def test_repeat_dropped(self):
+        cache = DedupeCache(window=2.0)
+        assert not cache.seen(b"frame", now=0.0)
+        assert cache.seen(b"frame", now=1.0)
+        assert cache.dropped == 1
+        assert cache.checked == 2
+
+    def test_different_frames_kept(self):
+        cache = DedupeCache()
+        assert not cache.seen(b"one", now=0.0)
+        assert not cache.seen(b"two", now=0.0)
+        assert len(cache) == 2
+
+    def test_window_expires(self):
+        clock = FakeClock()
+        cache = DedupeCache(window=2.0, clock=clock)
+        assert not cache.seen(b"frame")
+        clock.now = 2.5
+        assert not cache.seen(b"frame")
+        assert cache.dropped == 0
+
+    def test_window_counts_from_first_sighting(self):
+        cache = DedupeCache(window=2.0)
+        cache.seen(b"frame", now=0.0)
+        assert cache.seen(b"frame", now=1.5)
+        assert not cache.seen(b"frame", now=2.1)
+
+    def test_bounded(self):
+        cache = DedupeCache(window=60.0, max_entries=3)
+        for i in range(5):
+            cache.seen(bytes([i]), now=0.0)
+        assert len(cache) == 3
+        # Oldest entries were evicted
+        assert not cache.seen(bytes([0]), now=0.0)
+
+    def test_memoryview_matches_bytes(self):
+        cache = DedupeCache()
+        data = b"xx" + b"guild frame"
+        assert frame_key(memoryview(data)[2:]) == frame_key(b"guild frame")
+        assert not cache.seen(memoryview(data)[2:], now=0.0)
+        assert cache.seen(bytearray(b"guild frame"), now=0.0)
+
+    def test_clear(self):
+        cache = DedupeCache()
+        cache.seen(b"frame", now=0.0)
+        cache.clear()
+        assert not cache.seen(b"frame", now=0.0)
@@ -0,0 +1,176 @@
+import pytest
+import time
+
+from delivery import DeliveryEngine, WebhookError
+from Guildmessage import Guild_message
+from replay import MockWebhookServer
+from sinks import WebhookSink
+from stats import stats
+
+
+@pytest.fixture
+def server():
+    server = MockWebhookServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+class TestDeliveryEngine:
+    def test_submit_returns_future(self, server):
+        engine = DeliveryEngine(server.url)
+        future = engine.submit({"content": "hi"}, lane="Alice")
+        assert future.result(timeout=5).status_code == 200
+        engine.close()
+        assert server.payloads == [{"content": "hi"}]
+
+    def test_connections_are_reused(self, server):
+        engine = DeliveryEngine(server.url, max_in_flight=1)
+        for i in range(5):
+            engine.submit({"content": str(i)}).result(timeout=5)
+        engine.close()
+        assert server.requests == 5
+        assert len(server.connections) == 1
+
+    def test_lane_order_kept(self, server):
+        engine = DeliveryEngine(server.url, max_in_flight=4)
+        for i in range(20):
+            engine.submit({"content": f"a{i}"}, lane="Alice")
+            engine.submit({"content": f"b{i}"}, lane="Bob")
+        engine.join()
+        engine.close()
+        contents = [p["content"] for p in server.payloads]
+        assert [c for c in contents if c.startswith("a")] == [f"a{i}" for i in range(20)]
+        assert [c for c in contents if c.startswith("b")] == [f"b{i}" for i in range(20)]
+
+    def test_posts_in_parallel(self, server):
+        server.latency = 0.2
+        engine = DeliveryEngine(server.url, max_in_flight=4)
+        lanes = []
+        # Pick four lanes that land on four different sender threads
+        i = 0
+        while len({engine._slot(lane) for lane in lanes}) < 4:
+            lane = f"user{i}"
+            if engine._slot(lane) not in {engine._slot(other) for other in lanes}:
+                lanes.append(lane)
+            i += 1
+        start = time.perf_counter()
+        futures = [engine.submit({"content": lane}, lane=lane) for lane in lanes]
+        for future in futures:
+            future.result(timeout=5)
+        elapsed = time.perf_counter() - start
+        engine.close()
+        assert elapsed < 0.2 * 3
+
+    def test_error_status_fails_future(self, server):
+        server.status = 500
+        engine = DeliveryEngine(server.url)
+        future = engine.submit({"content": "hi"})
+        with pytest.raises(WebhookError) as exc_info:
+            future.result(timeout=5)
+        assert exc_info.value.status_code == 500
+        engine.close()
+
+    def test_submit_does_not_block(self, server):
+        server.latency = 0.3
+        engine = DeliveryEngine(server.url, max_in_flight=1)
+        start = time.perf_counter()
+        futures = [engine.submit({"content": str(i)}) for i in range(3)]
+        assert time.perf_counter() - start < 0.1
+        assert engine.pending == 3
+        engine.join()
+        assert all(f.done() for f in futures)
+        engine.close()
+
+    def test_needs_a_url(self):
+        with pytest.raises(ValueError):
+            DeliveryEngine([])
+
+    def test_lane_order_kept_across_webhooks(self, server):
+        other = MockWebhookServer()
+        other.start()
+        engine = DeliveryEngine([server.url, other.url], max_in_flight=2)
+        for i in range(20):
+            engine.submit({"content": str(i)}, lane="Alice")
+        engine.close()
+        other.stop()
+        assert engine.sent == {server.url: 10, other.url: 10}
+        # Posts of one lane go out one after another, so each webhook sees its share in order
+        for s in (server, other):
+            contents = [int(p["content"]) for p in s.payloads]
+            assert contents == sorted(contents)
+
+    def test_closed_engine_rejects_posts(self, server):
+        engine = DeliveryEngine(server.url)
+        engine.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            engine.submit({"content": "late"})
+
+    def test_close_finishes_queued_posts(self, server):
+        server.latency = 0.05
+        engine = DeliveryEngine(server.url, max_in_flight=1)
+        futures = [engine.submit({"content": str(i)}) for i in range(3)]
+        engine.close()
+        assert all(f.done() and not f.exception() for f in futures)
+        assert server.requests == 3
+
+
+class TestWebhookSink:
+    def test_deliver_posts_in_background(self, server):
+        server.latency = 0.2
+        sink = WebhookSink(server.url)
+        start = time.perf_counter()
+        sink.deliver(Guild_message(name="Alice", content="hello"))
+        assert time.perf_counter() - start < 0.15
+        sink.flush()
+        assert sink.delivered == 1
+        assert server.payloads[0]["username"] == "Alice"
+        assert server.payloads[0]["content"] == "hello"
+        assert "wait" not in server.payloads[0]
+        sink.close()
+
+    def test_failed_post_counted_as_error(self, server):
+        server.status = 400
+        sink = WebhookSink(server.url)
+        errors = stats.errors
+        sink.deliver(Guild_message(name="Alice", content="hello"))
+        sink.flush()
+        sink.close()
+        assert sink.delivered == 0
+        assert stats.errors == errors + 1
+
+    def test_deliver_future_resolves_per_message(self, server):
+        sink = WebhookSink(server.url)
+        future = sink.deliver(Guild_message(name="Alice", content="x" * 4000))
+        assert future.result(timeout=5) is None
+        assert len(server.payloads) == 3
+        server.status = 400
+        assert isinstance(sink.deliver(Guild_message(name="Alice", content="hi")).exception(timeout=5), WebhookError)
+        sink.close()
+
+    def test_batch_futures_resolve_per_message(self, server):
+        sink = WebhookSink(server.url, batch_window=0.05)
+        futures = [sink.deliver(Guild_message("Alice", str(i))) for i in range(3)]
+        assert [f.result(timeout=5) for f in futures] == [None] * 3
+        assert len(server.payloads) == 1
+        sink.close()
+
+    def test_batch_window_coalesces_posts(self, server):
+        sink = WebhookSink(server.url, batch_window=0.1, bot_name="Bot")
+        sink.deliver(Guild_message("Alice", "one"))
+        sink.deliver(Guild_message("Bob", "two"))
+        sink.deliver(Guild_message("Alice", "three"))
+        sink.flush()
+        sink.close()
+        assert len(server.payloads) == 1
+        assert server.payloads[0]["username"] == "Bot"
+        assert server.payloads[0]["content"] == "**Alice**: one\n**Bob**: two\n**Alice**: three"
+        assert sink.delivered == 3
+
+    def test_batches_posted_in_order(self, server):
+        sink = WebhookSink(server.url, batch_window=60, max_batch=2)
+        for i in range(6):
+            sink.deliver(Guild_message("Alice", str(i)))
+        sink.close()
+        assert [p["content"] for p in server.payloads] == ["0\n1", "2\n3", "4\n5"]
+        assert sink.delivered == 6
@@ -0,0 +1,104 @@
+import threading
+
+from echo import EchoTracker
+from input_backends import FakeInputBackend
+from stats import stats
+from tests.helpers import FakeClock
+from to_client_worker import ToClientWorker
+
+
+class EchoingGame(FakeInputBackend):
+    """Fake input backend whose "game" echoes each sent line to an EchoTracker."""
+
+    def __init__(self, echo, drop=0):
+        super().__init__()
+        self.echo = echo
+        # Number of sent lines that never come back
+        self.drop = drop
+        self._typed = ""
+
+    def type_text(self, text):
+        super().type_text(text)
+        self._typed = text
+
+    def key(self, keysym):
+        super().key(keysym)
+        if self._typed:
+            line, self._typed = self._typed, ""
+            if self.drop:
+                self.drop -= 1
+            else:
+                threading.Timer(0.01, self.echo.ack, args=(line,)).start()
+
+
+class TestEchoTracker:
+    def test_ack_matches_waiting_line(self):
+        clock = FakeClock()
+        echo = EchoTracker(clock=clock)
+        expected = echo.expect("[Bob] : hello  there", queued_at=1.0)
+        clock.now = 1.25
+        assert echo.ack(" [Bob] : hello there")
+        assert expected.wait(0)
+        assert expected.latency == 0.25
+        snap = echo.snapshot()
+        assert (snap["acked"], snap["latency_last_ms"]) == (1, 250.0)
+        assert echo.pending == 0
+
+    def test_same_line_needs_two_echoes(self):
+        echo = EchoTracker()
+        first = echo.expect("gg")
+        second = echo.expect("gg")
+        echo.ack("gg")
+        assert first.wait(0)
+        assert not second.wait(0)
+        echo.ack("gg")
+        assert second.wait(0)
+
+    def test_unmatched_and_cancelled(self):
+        echo = EchoTracker()
+        expected = echo.expect("lost line")
+        echo.cancel(expected)
+        assert not echo.ack("lost line")
+        assert not echo.ack("typed by hand")
+        assert echo.unmatched == 2
+        assert not expected.wait(0)
+
+
+class TestClosedLoopTyping:
+    def _run(self, game, echo, lines, retypes=1):
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=game, echo=echo,
+                                echo_timeout=0.2, echo_retypes=retypes)
+        for line in lines:
+            worker.enqueue(line)
+        worker.start()
+        worker._queue.join()
+        worker.stop()
+        return worker
+
+    def test_lines_paced_by_echo(self):
+        echo = EchoTracker()
+        game = EchoingGame(echo)
+        worker = self._run(game, echo, ["one", "two", "three"])
+        assert [e for e in game.events if e[0] == "type"] == [("type", "one"), ("type", "two"), ("type", "three")]
+        assert echo.acked == 3
+        assert (worker.retyped, worker.lost) == (0, 0)
+        assert echo.snapshot()["latency_max_ms"] > 0
+
+    def test_line_retyped_when_echo_missing(self):
+        echo = EchoTracker()
+        game = EchoingGame(echo, drop=1)
+        before = stats.snapshot()["game_retypes"]
+        worker = self._run(game, echo, ["hello"])
+        assert [e for e in game.events if e[0] == "type"] == [("type", "hello"), ("type", "hello")]
+        assert worker.retyped == 1
+        assert stats.snapshot()["game_retypes"] == before + 1
+        assert echo.acked == 1
+
+    def test_line_lost_after_retypes(self, caplog):
+        echo = EchoTracker()
+        game = EchoingGame(echo, drop=5)
+        worker = self._run(game, echo, ["void"], retypes=2)
+        assert len([e for e in game.events if e[0] == "type"]) == 3
+        assert worker.lost == 1
+        assert "never showed up" in caplog.text
+        assert echo.pending == 0
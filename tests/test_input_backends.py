@@ -0,0 +1,260 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from echo import EchoTracker
+from input_backends import (
+    FakeInputBackend,
+    LibxdoBackend,
+    XdotoolBackend,
+    create_input_backend,
+    set_clipboard,
+)
+from to_client_worker import ToClientWorker
+
+
+class TestCreateInputBackend:
+    def test_known_backends(self):
+        assert isinstance(create_input_backend("xdotool"), XdotoolBackend)
+        assert isinstance(create_input_backend("fake"), FakeInputBackend)
+
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError, match="Unknown input backend"):
+            create_input_backend("nope")
+
+    @patch("input_backends.ctypes.util.find_library", return_value=None)
+    def test_auto_falls_back_to_xdotool(self, mock_find_library):
+        assert isinstance(create_input_backend("auto"), XdotoolBackend)
+
+    @patch("input_backends.ctypes.util.find_library", return_value=None)
+    def test_libxdo_missing_raises(self, mock_find_library):
+        with pytest.raises(OSError, match="libxdo not found"):
+            create_input_backend("libxdo")
+
+
+class TestLibxdoBackend:
+    def test_one_connection_for_all_input(self):
+        lib = MagicMock()
+        backend = LibxdoBackend(lib=lib, type_delay=0.005)
+        backend.key("Return")
+        backend.type_text("héllo")
+        backend.key("Return")
+        lib.xdo_new.assert_called_once_with(None)
+        xdo = lib.xdo_new.return_value
+        lib.xdo_send_keysequence_window.assert_called_with(xdo, 0, b"Return", 0)
+        lib.xdo_enter_text_window.assert_called_once_with(xdo, 0, "héllo".encode(), 5000)
+        backend.close()
+        backend.close()
+        lib.xdo_free.assert_called_once_with(xdo)
+
+    def test_no_display(self):
+        lib = MagicMock()
+        lib.xdo_new.return_value = None
+        with pytest.raises(OSError, match="cannot open X display"):
+            LibxdoBackend(lib=lib)
+
+    def test_activate_without_window(self, caplog):
+        lib = MagicMock()
+        lib.xdo_search_windows.return_value = 1
+        LibxdoBackend(lib=lib).activate_window()
+        lib.xdo_activate_window.assert_not_called()
+        assert "No window named 'Mabinogi'" in caplog.text
+
+
+class TestWorkerWithBackend:
+    def test_types_through_backend_and_closes_it(self):
+        backend = FakeInputBackend()
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=backend)
+        worker.start()
+        worker.enqueue("one")
+        worker.enqueue("two")
+        worker._queue.join()
+        worker.stop()
+        assert [text for kind, *text in backend.events if kind == "type"] == [["one"], ["two"]]
+        assert backend.closed
+
+    def test_backend_created_on_worker_thread(self):
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend="fake")
+        worker.start()
+        worker.enqueue("hi")
+        worker._queue.join()
+        worker.stop()
+        assert ("type", "hi") in worker._backend.events
+
+
+class TestWindowCache:
+    def _worker(self, backend):
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=backend)
+        worker.start()
+        return worker
+
+    def _type(self, worker, *messages):
+        # One typing session per message
+        for message in messages:
+            worker.enqueue(message)
+            worker._queue.join()
+
+    def test_searches_once_for_consecutive_chunks(self):
+        backend = FakeInputBackend()
+        worker = self._worker(backend)
+        self._type(worker, "chunk 1", "chunk 2", "chunk 3")
+        worker.stop()
+        assert backend.events.count(("search",)) == 1
+        assert (worker.window_hits, worker.window_misses) == (2, 1)
+
+    def test_searches_again_when_window_replaced(self):
+        backend = FakeInputBackend()
+        worker = self._worker(backend)
+        self._type(worker, "before")
+        # Game restarted under a new window id
+        backend.window = 7
+        self._type(worker, "after", "again")
+        worker.stop()
+        assert backend.events.count(("search",)) == 2
+        assert ("activate", 7) in backend.events
+        assert (worker.window_hits, worker.window_misses) == (1, 2)
+
+    def test_searches_again_when_activation_fails(self):
+        backend = FakeInputBackend()
+        worker = self._worker(backend)
+        self._type(worker, "one")
+        backend.is_window = lambda window: True
+        backend.activate = MagicMock(side_effect=[False, True])
+        self._type(worker, "two")
+        worker.stop()
+        assert backend.events.count(("search",)) == 2
+        assert worker.window_misses == 2
+
+    def test_no_window(self, caplog):
+        backend = FakeInputBackend()
+        backend.window = None
+        worker = self._worker(backend)
+        self._type(worker, "one", "two")
+        worker.stop()
+        assert backend.events.count(("search",)) == 2
+        assert "No window named 'Mabinogi' found" in caplog.text
+
+
+class TestXdotoolWindow:
+    @patch("input_backends.subprocess.run")
+    def test_is_window_checks_name(self, mock_run):
+        mock_run.return_value.returncode = 0
+        mock_run.return_value.stdout = "Mabinogi\n"
+        assert XdotoolBackend().is_window(5)
+        mock_run.assert_called_once_with(["xdotool", "getwindowname", "5"], capture_output=True, text=True,
+                                         check=False)
+        mock_run.return_value.stdout = "Terminal\n"
+        assert not XdotoolBackend().is_window(5)
+        mock_run.return_value.returncode = 1
+        mock_run.return_value.stdout = ""
+        assert not XdotoolBackend().is_window(5)
+
+
+class TestTypingSession:
+    def test_queued_chunks_typed_in_one_session(self):
+        backend = FakeInputBackend()
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=backend)
+        # Queued before the thread starts, so the first get() sees all three
+        for chunk in ("part 1", "part 2", "part 3"):
+            worker.enqueue(chunk)
+        worker.start()
+        worker._queue.join()
+        worker.stop()
+        assert backend.events.count(("activate", 1)) == 1
+        assert [e for e in backend.events if e[0] == "type"] == [("type", "part 1"), ("type", "part 2"),
+                                                                 ("type", "part 3")]
+        # Open chat, one Return per line, close chat
+        assert backend.events.count(("key", "Return")) == 5
+
+    def test_shutdown_after_batch(self):
+        backend = FakeInputBackend()
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=backend)
+        worker.enqueue("last words")
+        worker._queue.put(None)
+        worker.start()
+        worker._thread.join(timeout=1)
+        assert not worker._thread.is_alive()
+        assert ("type", "last words") in backend.events
+
+
+LONG_LINE = "[Alice] : this line is long enough to paste"
+
+
+class TestClipboard:
+    @patch("input_backends.subprocess.run")
+    def test_xclip(self, mock_run):
+        mock_run.return_value.returncode = 0
+        assert set_clipboard("héllo")
+        mock_run.assert_called_once_with(("xclip", "-selection", "clipboard"), input="héllo".encode(),
+                                         check=False, timeout=1)
+
+    @patch("input_backends.subprocess.run")
+    def test_falls_back_to_xsel(self, mock_run):
+        mock_run.side_effect = [FileNotFoundError(), MagicMock(returncode=0)]
+        assert set_clipboard("x")
+        assert mock_run.call_args.args[0][0] == "xsel"
+
+    @patch("input_backends.subprocess.run", side_effect=FileNotFoundError())
+    def test_no_clipboard_tool(self, mock_run):
+        assert not set_clipboard("x")
+
+    @patch("input_backends.set_clipboard", return_value=True)
+    @patch("input_backends.subprocess.run")
+    def test_paste_presses_chord(self, mock_run, mock_set_clipboard):
+        assert XdotoolBackend().paste_text(LONG_LINE)
+        mock_run.assert_called_once_with(["xdotool", "key", "ctrl+v"], check=False)
+
+    @patch("input_backends.set_clipboard", return_value=True)
+    def test_control_characters_not_pasted(self, mock_set_clipboard):
+        assert not XdotoolBackend().paste_text("line\twith tab")
+        mock_set_clipboard.assert_not_called()
+
+
+class TestPasteMode:
+    def _write(self, backend, *lines, paste=True):
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=backend, paste=paste)
+        for line in lines:
+            worker.enqueue(line)
+        worker.start()
+        worker._queue.join()
+        worker.stop()
+        return worker
+
+    def test_long_lines_pasted_short_typed(self):
+        backend = FakeInputBackend()
+        worker = self._write(backend, LONG_LINE, "ok")
+        assert [e for e in backend.events if e[0] in ("type", "paste")] == [("paste", LONG_LINE), ("type", "ok")]
+        assert worker.pasted == 1
+
+    def test_typed_when_paste_fails(self):
+        backend = FakeInputBackend()
+        backend.paste_ok = False
+        self._write(backend, LONG_LINE)
+        assert ("type", LONG_LINE) in backend.events
+
+    def test_off_by_default(self):
+        backend = FakeInputBackend()
+        self._write(backend, LONG_LINE, paste=False)
+        assert ("type", LONG_LINE) in backend.events
+
+    def test_window_that_drops_pastes_gets_typed_lines(self):
+        echo = EchoTracker()
+        backend = FakeInputBackend()
+
+        # The game ignores Ctrl+V but echoes typed lines
+        def type_text(text):
+            backend.events.append(("type", text))
+            echo.ack(text)
+        backend.type_text = type_text
+
+        worker = ToClientWorker(queue_maxsize=10, delay_seconds=0, input_backend=backend, paste=True,
+                                echo=echo, echo_timeout=0.05)
+        worker.start()
+        worker.enqueue(LONG_LINE)
+        worker._queue.join()
+        worker.enqueue(LONG_LINE + " again")
+        worker._queue.join()
+        worker.stop()
+        assert [e for e in backend.events if e[0] in ("type", "paste")] == [
+            ("paste", LONG_LINE), ("type", LONG_LINE), ("type", LONG_LINE + " again")]
+        assert worker.lost == 0
@@ -11,8 +11,10 @@ from message_normalizer import (
 )
 from to_client_worker import (
     type_message,
+    type_messages,
     ToClientWorker,
 )
+from input_backends import FakeInputBackend
 from discord_client import (
     ToClientConfig,
     DiscordClient,
@@ -165,21 +167,43 @@ class TestNormalizeMessageChunks:
 class TestTypeMessage:
     """Test the type_message function."""
 
-    @patch("to_client_worker.os.system")
-    @patch("to_client_worker.subprocess.run")
+    @patch("input_backends.subprocess.run")
     @patch("to_client_worker.time.sleep")
-    def test_type_message_calls_xdotool(self, mock_sleep, mock_run, mock_system):
+    def test_type_message_calls_xdotool(self, mock_sleep, mock_run):
+        mock_run.return_value.stdout = "41943041\n"
         type_message("test message", 0.01)
-        
+
         # Check xdotool search and activate
-        mock_system.assert_any_call('xdotool search --name "Mabinogi" windowactivate')
+        mock_run.assert_any_call(["xdotool", "search", "--name", "Mabinogi"], capture_output=True, text=True,
+                                 check=False)
+        mock_run.assert_any_call(["xdotool", "windowactivate", "41943041"], check=False)
         # Check key presses
-        assert mock_system.call_count >= 3  # activate, Return, Return, Return
-        # Check subprocess.run for typing
-        mock_run.assert_called_once_with(["xdotool", "type", "test message"], check=False)
+        assert mock_run.call_args_list.count(call(["xdotool", "key", "Return"], check=False)) == 3
+        # Check typing
+        mock_run.assert_any_call(["xdotool", "type", "--delay", "12", "test message"], check=False)
         # Check sleep calls
         assert mock_sleep.call_count >= 4
 
+    @patch("to_client_worker.time.sleep")
+    def test_type_message_with_backend(self, mock_sleep):
+        backend = FakeInputBackend()
+        type_message("hi", 0.01, backend=backend)
+        assert backend.events == [("search",), ("activate", 1), ("key", "Return"), ("type", "hi"),
+                                  ("key", "Return"), ("key", "Return")]
+
+
+class TestTypeMessages:
+    @patch("to_client_worker.time.sleep")
+    def test_one_session_for_all_lines(self, mock_sleep):
+        backend = FakeInputBackend()
+        type_messages(["one", "two", "three"], 0.01, backend=backend)
+        assert backend.events == [("search",), ("activate", 1), ("key", "Return"),
+                                  ("type", "one"), ("key", "Return"),
+                                  ("type", "two"), ("key", "Return"),
+                                  ("type", "three"), ("key", "Return"),
+                                  ("key", "Return")]
+        assert mock_sleep.call_count == 9
+
 
 class TestToClientWorker:
     """Test the ToClientWorker class."""
@@ -245,8 +269,8 @@ class TestToClientWorker:
         worker = ToClientWorker(queue_maxsize=100, delay_seconds=0.01)
         assert worker._queue.maxsize == 100
 
-    @patch("to_client_worker.type_message")
-    def test_loop_processes_messages(self, mock_type_message):
+    @patch("to_client_worker.type_messages")
+    def test_loop_processes_messages(self, mock_type_messages):
         worker = ToClientWorker(queue_maxsize=10, delay_seconds=0.01)
         worker.start()
         worker.enqueue("msg1")
@@ -255,11 +279,12 @@ class TestToClientWorker:
         import time
         time.sleep(0.1)
         worker.stop()
-        assert mock_type_message.call_count == 2
+        # Both lines typed, in one session if the second was queued in time
+        assert [line for c in mock_type_messages.call_args_list for line in c.args[0]] == ["msg1", "msg2"]
 
-    @patch("to_client_worker.type_message")
-    def test_loop_handles_exception(self, mock_type_message, caplog):
-        mock_type_message.side_effect = Exception("Test error")
+    @patch("to_client_worker.type_messages")
+    def test_loop_handles_exception(self, mock_type_messages, caplog):
+        mock_type_messages.side_effect = Exception("Test error")
         worker = ToClientWorker(queue_maxsize=10, delay_seconds=0.01)
         worker.start()
         worker.enqueue("msg1")
@@ -473,7 +498,11 @@ class TestToClientBotThread:
         thread = ToClientBotThread(config)
         thread.run()
         
-        mock_worker_class.assert_called_once_with(delay_seconds=config.delay_seconds)
+        mock_worker_class.assert_called_once_with(delay_seconds=config.delay_seconds,
+                                                  input_backend=config.input_backend, echo=None,
+                                                  echo_timeout=config.echo_timeout,
+                                                  echo_retypes=config.echo_retypes,
+                                                  paste=config.paste_mode)
         mock_client_class.assert_called_once()
         mock_client.run.assert_called_once_with(config.discord_token, log_handler=None)
         assert thread._client is mock_client
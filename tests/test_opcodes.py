@@ -0,0 +1,94 @@
+import pytest
+import struct
+
+from Mabipacket.opcodes import (
+    BIN, BYTE, FLOAT, GUILD_CHAT, INT, LONG, NONE, REGISTRY, SHORT, STRING,
+    OpcodeRegistry, OpcodeSchema, SchemaDecoder, opcode_at,
+)
+from Mabipacket.guildparser import parse as guild_parse, parse_view as guild_parse_view
+from Mabipacket.standardparser import parse as standard_parse
+
+
+def string_param(value: bytes, tag: int = STRING) -> bytes:
+    return bytes([tag]) + struct.pack(">H", len(value)) + value
+
+
+def guild_packet(name: bytes, msg: bytes, opcode: int = GUILD_CHAT.opcode) -> bytes:
+    return b"\x00" * 6 + opcode.to_bytes(4, "big") + b"\x00" * 9 + string_param(name) + string_param(msg)
+
+
+class TestSchemaDecoder:
+    def test_fixed_width_run(self):
+        decoder = SchemaDecoder((BYTE, SHORT, INT, LONG, NONE))
+        data = b"\x01\xff" + b"\x02\xff\xfe" + b"\x03\x00\x00\x01\x00" + b"\x04" + (5).to_bytes(8, "big") + b"\x00"
+        assert decoder.decode(data) == ((255, -2, 256, 5, None), len(data))
+
+    def test_float_is_little_endian(self):
+        decoder = SchemaDecoder((INT, FLOAT))
+        data = b"\x03\x00\x00\x00\x07" + b"\x05" + struct.pack("<f", 2.5)
+        assert decoder.decode(data) == ((7, 2.5), len(data))
+
+    def test_sized_params(self):
+        decoder = SchemaDecoder((STRING, BYTE, BIN))
+        data = string_param("héllo".encode()) + b"\x01\x09" + string_param(b"\x00\x01", BIN)
+        assert decoder.decode(memoryview(data)) == (("héllo", 9, b"\x00\x01"), len(data))
+
+    def test_offset(self):
+        decoder = SchemaDecoder((STRING,))
+        assert decoder.decode(b"junk" + string_param(b"hi"), 4) == (("hi",), 9)
+
+    def test_tag_mismatch(self):
+        assert SchemaDecoder((STRING,)).decode(string_param(b"hi", BIN)) is None
+        assert SchemaDecoder((INT,)).decode(b"\x02\x00\x00\x00\x00") is None
+
+    def test_truncated(self):
+        assert SchemaDecoder((STRING,)).decode(string_param(b"hello")[:-1]) is None
+        assert SchemaDecoder((INT,)).decode(b"\x03\x00") is None
+
+    def test_unknown_type_rejected(self):
+        with pytest.raises(ValueError, match="Unknown parameter type"):
+            SchemaDecoder((99,))
+
+
+class TestOpcodeRegistry:
+    def test_default_registry(self):
+        assert REGISTRY.get(0xC36F0000) is GUILD_CHAT
+        assert REGISTRY.is_dropped(0x0001D4C3)
+        assert not REGISTRY.is_dropped(0xC36F0000)
+        assert REGISTRY.get(0x12345678) is None
+
+    def test_duplicate_registration(self):
+        registry = OpcodeRegistry((GUILD_CHAT,))
+        with pytest.raises(ValueError, match="already registered"):
+            registry.register(OpcodeSchema(GUILD_CHAT.opcode, "other"))
+        registry.register(OpcodeSchema(GUILD_CHAT.opcode, "other"), replace=True)
+        assert registry.get(GUILD_CHAT.opcode).name == "other"  # type: ignore[union-attr]
+
+    def test_schema_decode_to_fields(self):
+        data = string_param(b"Tester") + string_param(b"hi guild")
+        assert GUILD_CHAT.decode(data) == {"name": "Tester", "content": "hi guild"}
+
+    def test_field_count_checked(self):
+        with pytest.raises(ValueError, match="field names"):
+            OpcodeSchema(1, "bad", (INT, INT), ("only_one",))
+
+    def test_opcode_at(self):
+        assert opcode_at(b"\x00" * 6 + b"\xc3\x6f\x00\x00", 6) == 0xC36F0000
+
+
+class TestParsersUseRegistry:
+    def test_guild_view_values(self):
+        view = guild_parse_view(guild_packet(b"Tester", b"hello"))
+        assert view.schema is GUILD_CHAT  # type: ignore[union-attr]
+        assert view.values() == ("Tester", "hello")  # type: ignore[union-attr]
+
+    def test_unregistered_opcode_has_no_values(self):
+        view = guild_parse_view(guild_packet(b"a", b"b", opcode=0x00000001))
+        assert view.paramCount == 0  # type: ignore[union-attr]
+        assert view.values() is None  # type: ignore[union-attr]
+
+    def test_dropped_opcode(self):
+        data = guild_packet(b"a", b"b", opcode=0x0001D4C3)
+        assert guild_parse(data, debug=False) is False
+        assert guild_parse_view(data) is None
+        assert standard_parse(data, debug=False) is None
@@ -1,9 +1,14 @@
 import pytest
 import struct
 from io import BytesIO
-from Mabipacket.varint import encode, decode_bytes, decode_stream, _read_one
+from Mabipacket.varint import encode, decode_at, decode_bytes, decode_many, decode_stream, _read_one
 from Mabipacket.standardparser import Parameter, Packet, decode_varint, parse as standard_parse
 from Mabipacket.guildparser import Parameter as GuildParameter, Packet as GuildPacket, parse as guild_parse
+from Mabipacket.framing import find_frame_start, frame_length, plausible_frame, split_frames
+from Mabipacket.guildparser import parse_view as guild_parse_view
+from Mabipacket.standardparser import parse_view as standard_parse_view
+from Mabipacket.packetview import PacketView, ParameterView, _UNSET
+from tests.helpers import mabi_frame
 
 
 class TestVarint:
@@ -45,6 +50,110 @@ class TestVarint:
         with pytest.raises(EOFError, match="Unexpected EOF"):
             _read_one(stream)
 
+    def test_decode_bytes_truncated(self):
+        with pytest.raises(EOFError):
+            decode_bytes(b"\x80")
+
+    def test_decode_bytes_beyond_uint32(self):
+        assert decode_bytes(encode(2**40 + 5)) == 2**40 + 5
+
+    def test_decode_at_offset(self):
+        assert decode_at(b"\xff\xac\x02", 1) == (300, 2)
+        assert decode_at(memoryview(b"xx\x7f"), 2) == (127, 1)
+
+    def test_decode_at_truncated(self):
+        with pytest.raises(ValueError, match="Unexpected end of data"):
+            decode_at(b"\x80\x80", 0)
+        with pytest.raises(ValueError, match="Unexpected end of data"):
+            decode_at(b"\x01", 1)
+
+    def test_decode_at_stops_at_five_bytes(self):
+        assert decode_at(b"\xff" * 6, 0)[1] == 5
+
+    def test_decode_many(self):
+        data = b"junk" + encode(5) + encode(300) + encode(0) + encode(70000)
+        assert decode_many(data, 4, 4) == ([5, 300, 0, 70000], len(data))
+        assert decode_many(memoryview(data), 2, 4) == ([5, 300], 7)
+
+    def test_decode_many_truncated(self):
+        with pytest.raises(ValueError, match="Unexpected end of data"):
+            decode_many(encode(5), 2)
+
+
+class TestFraming:
+    def test_frame_length_reads_bytes_3_4(self):
+        assert frame_length(b"\x88\x00\x00\x2c\x01\x00") == 300
+
+    def test_frame_length_at_offset(self):
+        assert frame_length(b"xx" + b"\x88\x00\x00\x10\x00", 2) == 16
+
+    def test_frame_length_incomplete_header(self):
+        assert frame_length(b"\x88\x00\x00\x10") is None
+
+    def test_frame_length_implausible(self):
+        assert frame_length(b"\x00" * 6) == 0
+
+    def test_split_single_frame(self):
+        frame = mabi_frame(b"hello")
+        frames = split_frames(frame)
+        assert [bytes(f) for f in frames] == [frame]
+
+    def test_split_coalesced_frames(self):
+        f1, f2, f3 = mabi_frame(b"one"), mabi_frame(b"two"), mabi_frame(b"three!")
+        frames = split_frames(f1 + f2 + f3)
+        assert [bytes(f) for f in frames] == [f1, f2, f3]
+
+    def test_split_is_zero_copy(self):
+        buf = mabi_frame(b"one") + mabi_frame(b"two")
+        frames = split_frames(buf)
+        assert all(isinstance(f, memoryview) and f.obj is buf for f in frames)
+
+    def test_split_truncated_tail_kept_whole(self):
+        f1, f2 = mabi_frame(b"one"), mabi_frame(b"a longer frame")
+        frames = split_frames(f1 + f2[:8])
+        assert [bytes(f) for f in frames] == [f1 + f2[:8]]
+
+    def test_split_trailing_bytes_kept_whole(self):
+        data = mabi_frame(b"one") + mabi_frame(b"two") + b"\x00\x01"
+        assert [bytes(f) for f in split_frames(data)] == [data]
+
+    def test_split_length_longer_than_payload_kept_whole(self):
+        # A guild message whose length field is not the frame length must not be cut
+        data = mabi_frame(b"guild message")[:-4]
+        frames = split_frames(data)
+        assert len(frames) == 1 and frames[0].obj is data
+
+    def test_split_unframed_data_kept_whole(self):
+        data = b"\x00" * 30
+        assert [bytes(f) for f in split_frames(data)] == [data]
+
+    def test_split_empty(self):
+        assert split_frames(b"") == []
+
+    def test_plausible_frame(self):
+        assert plausible_frame(mabi_frame(b"hi"))
+        assert not plausible_frame(b"\x88\x00\x01\x10\x00\x00")  # magic bytes 1-2 not zero
+        assert not plausible_frame(b"\x00" * 6)  # no usable length
+        assert not plausible_frame(b"\x88\x00\x00\x10")
+
+    def test_find_frame_start_skips_frame_tail(self):
+        frame = mabi_frame(b"next message")
+        assert find_frame_start(b"tail of a message" + frame) == 17
+
+    def test_find_frame_start_checks_following_header(self):
+        # "s\x00\x00\x09\x00" looks like a header, but no frame follows its 9 bytes
+        frame = mabi_frame(b"hello")
+        assert find_frame_start(b"ends\x00\x00\x09\x00xyz" + frame) == 11
+
+    def test_find_frame_start_prefers_confirmed(self):
+        # Inside a header, length high byte + flags look like magic bytes 1-2
+        frame = mabi_frame(b"hello")
+        assert find_frame_start(b"tail" + frame + frame[:8]) == 4
+        assert find_frame_start(b"tail" + frame[:8]) == 4
+
+    def test_find_frame_start_none(self):
+        assert find_frame_start(b"no header anywhere in here") is None
+
 
 class TestStandardParser:
     """Test standard packet parser."""
@@ -366,6 +475,18 @@ class TestGuildParser:
         assert result.parameters[1].type == 6  # type: ignore[attr-defined]
         assert result.parameters[1].value == msg  # type: ignore[attr-defined]
 
+    def test_parse_guild_packet_memoryview(self):
+        """Frames split from a coalesced segment arrive as memoryview slices."""
+        name_bytes, msg_bytes = b"TestUser", b"Hello"
+        params = [
+            (6, struct.pack(">H", len(name_bytes)) + name_bytes),
+            (6, struct.pack(">H", len(msg_bytes)) + msg_bytes),
+        ]
+        packet_data = self._make_guild_packet(params)
+        result = guild_parse(memoryview(b"xx" + packet_data)[2:], debug=False)
+        assert result is not False
+        assert result.parameters[1].value == "Hello"  # type: ignore[attr-defined]
+
     def test_parse_guild_packet_encrypted(self):
         """Test that encrypted packets (0x88) return False."""
         packet_data = b"\x88" + b"\x00" * 20
@@ -480,4 +601,75 @@ class TestGuildParser:
         """Test parsing with invalid/truncated data."""
         # Packet too short
         result = guild_parse(b"short", debug=False)
-        assert result is False
\ No newline at end of file
+        assert result is False
+
+
+class TestPacketView:
+    """Zero-copy packet views returned by parse_view()."""
+
+    def _guild_packet(self, name: bytes = b"TestUser", msg: bytes = b"Hello world", opcode: bytes = b"\xc3\x6f\x00\x00") -> bytes:
+        params = [(6, struct.pack(">H", len(name)) + name), (6, struct.pack(">H", len(msg)) + msg)]
+        return TestGuildParser()._make_guild_packet(params, opcode=opcode)
+
+    def test_guild_view_matches_parse(self):
+        data = self._guild_packet()
+        view = guild_parse_view(data)
+        packet = guild_parse(data, debug=False)
+        assert view.paramCount == packet.paramCount == 2  # type: ignore[union-attr]
+        assert [p.value for p in view.parameters] == [p.value for p in packet.parameters]  # type: ignore[union-attr]
+        assert view.opCode == packet.opCode  # type: ignore[union-attr]
+        assert view.opcode == 0xC36F0000
+
+    def test_values_decoded_lazily_and_cached(self):
+        view = guild_parse_view(self._guild_packet())
+        assert view._parameters is None
+        param = view.parameters[1]
+        assert param._value is _UNSET
+        first = param.value
+        assert first == "Hello world"
+        assert param.value is first
+
+    def test_content_is_zero_copy(self):
+        buf = bytearray(self._guild_packet())
+        view = guild_parse_view(buf)
+        content = view.parameters[0].content
+        assert isinstance(content, memoryview)
+        assert content.obj is buf
+        assert bytes(content) == b"TestUser"
+
+    def test_slots(self):
+        view = guild_parse_view(self._guild_packet())
+        assert not hasattr(view, "__dict__")
+        assert not hasattr(view.parameters[0], "__dict__")
+
+    def test_fixed_width_values(self):
+        data = memoryview(b"\x42" + b"\xff\xfe" + struct.pack("<f", 1.5))
+        assert ParameterView(data, 1, 0, 1).value == 0x42
+        assert ParameterView(data, 2, 1, 3).value == -2
+        assert ParameterView(data, 5, 3, 7).value == 1.5
+        assert ParameterView(data, 7, 1, 3).value == b"\xff\xfe"
+
+    def test_guild_view_rejects(self):
+        assert guild_parse_view(b"\x88" + b"\x00" * 20) is None
+        assert guild_parse_view(b"short") is None
+        assert guild_parse_view(self._guild_packet(opcode=b"\x00\x01\xd4\xc3")) is None
+
+    def test_guild_view_other_opcode(self):
+        view = guild_parse_view(self._guild_packet(opcode=b"\x00\x00\x00\x01"))
+        assert isinstance(view, PacketView)
+        assert view.paramCount == 0
+        assert view.parameters == []
+
+    def test_truncated_string_clamped(self):
+        data = self._guild_packet(msg=b"Hello world")[:-4]
+        view = guild_parse_view(data)
+        assert view.parameters[1].value == "Hello w"  # type: ignore[union-attr]
+
+    def test_standard_view_matches_parse(self):
+        params = [(3, b"\x00\x00\x01\x00"), (6, struct.pack(">H", 2) + b"hi")]
+        data = TestStandardParser()._make_packet(b"\x00\x00\x00\x01", b"\x00" * 8, params)
+        view = standard_parse_view(data)
+        packet = standard_parse(data, debug=False)
+        assert view.paramCount == packet.paramCount == 2  # type: ignore[union-attr]
+        assert [bytes(p.content) for p in view.parameters] == [bytes(p.content) for p in packet.parameters]  # type: ignore[union-attr]
+        assert view.parameters[0].value == 256  # type: ignore[union-attr]
@@ -4,8 +4,13 @@ import queue
 import threading
 import asyncio
 import binascii
+from dataclasses import replace
 from packet_sniffer import PacketSnifferConfig, PacketWorker, PacketSniffer
 from Guildmessage import Guild_message
+from dedupe import DEFAULT_WINDOW
+from echo import EchoTracker
+from Mabipacket.opcodes import SchemaDecoder
+from tests.helpers import make_guild_payload
 
 
 class TestPacketSnifferConfig:
@@ -78,6 +83,12 @@ class TestPacketWorker:
         worker.stop()
         assert not worker._worker_thread.is_alive()  # type: ignore[union-attr]
 
+    def test_spool_path_wraps_sink(self, config, tmp_path):
+        from spool import SpoolingSink
+        worker = PacketWorker(replace(config, spool_path=str(tmp_path / "spool.jsonl")))
+        assert isinstance(worker._sink, SpoolingSink)
+        worker.stop()
+
     def test_stop_when_not_running(self, config):
         worker = PacketWorker(config)
         # Should not raise
@@ -124,9 +135,10 @@ class TestPacketWorker:
         assert worker.queue_maxsize == 100
 
     @patch("packet_sniffer.Guild_message")
-    @patch("packet_sniffer.DiscordWebhook")
-    @patch("packet_sniffer.parser.parse")
-    def test_loop_processes_valid_packet(self, mock_parse, mock_webhook_class, mock_guild_msg, config):
+    @patch("sinks.DeliveryEngine")
+    @patch("sinks.DiscordWebhook")
+    @patch("packet_sniffer.parser.parse_view")
+    def test_loop_processes_valid_packet(self, mock_parse, mock_webhook_class, mock_engine_class, mock_guild_msg, config):
         worker = PacketWorker(config)
         worker.start()
         
@@ -136,10 +148,7 @@ class TestPacketWorker:
         
         mock_parsed = MagicMock()
         mock_parsed.paramCount = 2
-        mock_parsed.parameters = [
-            MagicMock(value="TestUser"),
-            MagicMock(value="Hello world")
-        ]
+        mock_parsed.values.return_value = ("TestUser", "Hello world")
         mock_parse.return_value = mock_parsed
         
         mock_guild = MagicMock()
@@ -163,9 +172,9 @@ class TestPacketWorker:
         mock_guild.cleanmessage.assert_called_once()
         mock_guild.replace_mentions.assert_called_once()
         mock_webhook_class.assert_called_once()
-        mock_webhook.execute.assert_called_once()
+        mock_engine_class.return_value.submit.assert_called_once_with(mock_webhook.json, lane="TestUser")
 
-    @patch("packet_sniffer.parser.parse")
+    @patch("packet_sniffer.parser.parse_view")
     def test_loop_skips_encrypted_packet(self, mock_parse, config):
         worker = PacketWorker(config)
         worker.start()
@@ -183,7 +192,7 @@ class TestPacketWorker:
         
         mock_parse.assert_called_once()
 
-    @patch("packet_sniffer.parser.parse")
+    @patch("packet_sniffer.parser.parse_view")
     def test_loop_skips_no_params(self, mock_parse, config):
         worker = PacketWorker(config)
         worker.start()
@@ -203,7 +212,7 @@ class TestPacketWorker:
         
         mock_parse.assert_called_once()
 
-    @patch("packet_sniffer.parser.parse")
+    @patch("packet_sniffer.parser.parse_view")
     def test_loop_skips_own_character(self, mock_parse, config):
         worker = PacketWorker(config)
         worker.start()
@@ -212,10 +221,8 @@ class TestPacketWorker:
         mock_packet.tcp.payload = "48656c6c6f"
         mock_parsed = MagicMock()
         mock_parsed.paramCount = 2
-        mock_parsed.parameters = [
-            MagicMock(value="TestChar"),  # Same as in_game_char_name
-            MagicMock(value="Hello world")
-        ]
+        # Same name as in_game_char_name
+        mock_parsed.values.return_value = ("TestChar", "Hello world")
         mock_parse.return_value = mock_parsed
         
         worker.add_packet(mock_packet)
@@ -227,10 +234,26 @@ class TestPacketWorker:
         
         # Should not create webhook for own character
 
+    @patch("packet_sniffer.parser.parse_view")
+    def test_own_character_acks_echo(self, mock_parse, config):
+        echo = EchoTracker()
+        expected = echo.expect("[Bob] : hi & bye")
+        sink = MagicMock()
+        worker = PacketWorker(config, sink=sink, echo=echo)
+        worker.start()
+        mock_parse.return_value = MagicMock(paramCount=2, **{"values.return_value": ("TestChar", "[Bob] : hi & bye")})
+        worker.add_packet(b"\x00" * 20)
+        worker.drain()
+        worker.stop()
+        # Matched on the raw text, before cleaning strips the "&"
+        assert expected.wait(0)
+        sink.deliver.assert_not_called()
+
     @patch("packet_sniffer.Guild_message")
-    @patch("packet_sniffer.DiscordWebhook")
-    @patch("packet_sniffer.parser.parse")
-    def test_loop_adds_emotes(self, mock_parse, mock_webhook_class, mock_guild_msg, config):
+    @patch("sinks.DeliveryEngine")
+    @patch("sinks.DiscordWebhook")
+    @patch("packet_sniffer.parser.parse_view")
+    def test_loop_adds_emotes(self, mock_parse, mock_webhook_class, mock_engine_class, mock_guild_msg, config):
         worker = PacketWorker(config)
         worker.start()
         
@@ -239,10 +262,7 @@ class TestPacketWorker:
         
         mock_parsed = MagicMock()
         mock_parsed.paramCount = 2
-        mock_parsed.parameters = [
-            MagicMock(value="TestUser"),
-            MagicMock(value="Check :foxspinn: this")
-        ]
+        mock_parsed.values.return_value = ("TestUser", "Check :foxspinn: this")
         mock_parse.return_value = mock_parsed
         
         mock_guild = MagicMock()
@@ -284,6 +304,84 @@ class TestPacketWorker:
         # (the exception is caught and logged internally)
         assert True  # Test passes if no crash
 
+    @patch("packet_sniffer.parser.parse_view")
+    def test_loop_splits_coalesced_frames(self, mock_parse, config):
+        mock_parse.return_value = False
+        worker = PacketWorker(config)
+        worker.start()
+
+        frame1 = b"\x88\x00\x00\x08\x00\x00ab"
+        frame2 = b"\x88\x00\x00\x09\x00\x00cde"
+        worker.add_packet(frame1 + frame2)
+        worker.add_packet(frame1)
+        worker.drain()
+        worker.stop()
+
+        assert [bytes(c.args[0]) for c in mock_parse.call_args_list] == [frame1, frame2, frame1]
+        assert worker.frames_per_segment == {2: 1, 1: 1}
+
+    @patch("packet_sniffer.parser.parse_view")
+    def test_duplicate_guild_frames_dropped_before_parse(self, mock_parse, config):
+        mock_parse.return_value = False
+        worker = PacketWorker(replace(config, dedupe_window=DEFAULT_WINDOW))
+        worker.start()
+
+        guild = b"\x00\x00\x00\x0e\x00\x00\xc3\x6f\x00\x00abcd"
+        other = b"\x00\x00\x00\x0e\x00\x00\x00\x00\x52\x1dabcd"
+        for payload in (guild, guild, other, other):
+            worker.add_packet(payload)
+        worker.drain()
+        worker.stop()
+
+        # Only guild frames are deduplicated
+        assert [bytes(c.args[0]) for c in mock_parse.call_args_list] == [guild, other, other]
+        assert worker.dedupe.dropped == 1  # type: ignore[union-attr]
+
+    def test_slow_sink_backs_up_in_deliver_stage(self, config):
+        gate = threading.Event()
+        sink = MagicMock()
+        sink.deliver.side_effect = lambda message: gate.wait()
+        worker = PacketWorker(replace(config, queue_maxsize=2, dedupe_window=0), sink=sink)
+        worker.start()
+        frame = b"\x00\x00\x00\x0e\x00\x00\xc3\x6f\x00\x00abcd"
+        parsed = MagicMock(paramCount=2, **{"values.return_value": ("Alice", "hi")})
+        with patch("packet_sniffer.parser.parse_view", return_value=parsed):
+            for _ in range(20):
+                worker.add_packet(frame, block=True)
+            worker._queue.join()
+            worker.stages["transform"].join()
+            # Parsing kept up; the blocked sink only shows as deliver backlog
+            assert worker.stage_metrics()["deliver"]["depth"] >= 18
+            gate.set()
+            worker.drain()
+        worker.stop()
+        assert sink.deliver.call_count == 20
+
+    def test_guild_message_uses_compiled_decoder(self, config):
+        messages = []
+        worker = PacketWorker(config, output=messages.append)
+        worker.start()
+        with patch.object(SchemaDecoder, "decode", autospec=True, side_effect=SchemaDecoder.decode) as decode:
+            worker.add_packet(make_guild_payload("Alice", "hello guild"))
+            worker.drain()
+        worker.stop()
+        assert decode.call_count == 1
+        assert [(m.name, m.content) for m in messages] == [("Alice", "hello guild")]
+
+    def test_guild_message_cut_off_keeps_what_arrived(self, config):
+        messages = []
+        worker = PacketWorker(config, output=messages.append)
+        worker.start()
+        worker.add_packet(make_guild_payload("Alice", "hello guild")[:-3])
+        worker.drain()
+        worker.stop()
+        assert [(m.name, m.content) for m in messages] == [("Alice", "hello gu")]
+
+    def test_dedupe_off_by_default(self, config):
+        # Content keyed: on by default it would drop a line a player repeats
+        worker = PacketWorker(config)
+        assert worker.dedupe is None
+
     def test_shutdown_signal(self, config):
         worker = PacketWorker(config)
         worker.start()
@@ -321,7 +419,7 @@ class TestPacketSniffer:
         assert sniffer.loop is None
         assert sniffer.daemon is True
 
-    @patch("packet_sniffer.pyshark.LiveCapture")
+    @patch("capture_backends.pyshark.LiveCapture")
     def test_run_starts_capture(self, mock_live_capture, config, worker):
         mock_capture = MagicMock()
         mock_live_capture.return_value = mock_capture
@@ -345,7 +443,7 @@ class TestPacketSniffer:
         mock_capture.sniff_continuously.assert_called_once()
         mock_capture.close.assert_called_once()
 
-    @patch("packet_sniffer.pyshark.LiveCapture")
+    @patch("capture_backends.pyshark.LiveCapture")
     def test_run_processes_tcp_packets(self, mock_live_capture, config, worker):
         mock_capture = MagicMock()
         mock_live_capture.return_value = mock_capture
@@ -378,7 +476,7 @@ class TestPacketSniffer:
         # At minimum, verify the worker thread was started
         assert worker._worker_thread is not None
 
-    @patch("packet_sniffer.pyshark.LiveCapture")
+    @patch("capture_backends.pyshark.LiveCapture")
     def test_run_skips_non_tcp(self, mock_live_capture, config, worker):
         mock_capture = MagicMock()
         mock_live_capture.return_value = mock_capture
@@ -399,7 +497,7 @@ class TestPacketSniffer:
         # Should not add to worker
         assert worker.queue_size == 0
 
-    @patch("packet_sniffer.pyshark.LiveCapture")
+    @patch("capture_backends.pyshark.LiveCapture")
     def test_run_skips_no_payload(self, mock_live_capture, config, worker):
         mock_capture = MagicMock()
         mock_live_capture.return_value = mock_capture
@@ -434,7 +532,7 @@ class TestPacketSniffer:
         sniffer.stop()
         mock_capture.close.assert_called_once()
 
-    @patch("packet_sniffer.pyshark.LiveCapture")
+    @patch("capture_backends.pyshark.LiveCapture")
     def test_run_handles_exception(self, mock_live_capture, config, worker, caplog):
         mock_live_capture.side_effect = Exception("Capture error")
         
@@ -448,7 +546,7 @@ class TestPacketSniffer:
         
         assert "Packet sniffer error" in caplog.text
 
-    @patch("packet_sniffer.pyshark.LiveCapture")
+    @patch("capture_backends.pyshark.LiveCapture")
     def test_run_cleans_up_loop(self, mock_live_capture, config, worker):
         mock_capture = MagicMock()
         mock_live_capture.return_value = mock_capture
@@ -0,0 +1,201 @@
+"""Parser correctness and performance regression suite.
+
+Runs the parsers over the frames in tests/corpus/parser_frames.json (built by
+benchmarks/build_parser_corpus.py). Results must match parser_golden.json,
+which that script produces by running the parsers of the first commit over
+the same frames, so the current parsers are held to the original ones.
+Time per packet and bytes allocated per packet must not exceed
+parser_perf_baseline.json by more than PARSER_PERF_THRESHOLD (default 0.5,
+i.e. 50% worse). Time is recorded relative to a fixed calibration loop so the
+baseline carries over between machines.
+
+After an intended speed change, regenerate the perf baseline:
+
+    PARSER_PERF_UPDATE=1 uv run pytest tests/test_parser_perf.py
+
+Skip the timing part with `-m "not perf"`.
+"""
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from Mabipacket import guildparser, standardparser
+from Mabipacket.packetview import PacketView
+
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+FRAMES_PATH = CORPUS_DIR / "parser_frames.json"
+GOLDEN_PATH = CORPUS_DIR / "parser_golden.json"
+BASELINE_PATH = CORPUS_DIR / "parser_perf_baseline.json"
+
+UPDATE = os.environ.get("PARSER_PERF_UPDATE", "") not in ("", "0")
+THRESHOLD = float(os.environ.get("PARSER_PERF_THRESHOLD", "0.5"))
+# Slack for frames that allocate next to nothing
+ALLOC_SLACK_BYTES = 16
+MEASURE_ATTEMPTS = 3
+
+PYTHON = f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def _read_values(packet):
+    """Decode every parameter value the way the worker reads name and message."""
+    if isinstance(packet, PacketView) and packet.values() is not None:
+        return packet
+    if packet:
+        for param in packet.parameters:
+            getattr(param, "value", None)
+    return packet
+
+
+PARSERS = {
+    "guildparser.parse": lambda data: _read_values(guildparser.parse(data, debug=False)),
+    "guildparser.parse_view": lambda data: _read_values(guildparser.parse_view(data)),
+    "standardparser.parse": lambda data: _read_values(standardparser.parse(data, debug=False)),
+    "standardparser.parse_view": lambda data: _read_values(standardparser.parse_view(data)),
+}
+
+
+def load_frames() -> list[tuple[str, str, bytes]]:
+    with FRAMES_PATH.open(encoding="utf-8") as f:
+        return [(e["name"], e["kind"], bytes.fromhex(e["hex"])) for e in json.load(f)]
+
+
+def snapshot(result):
+    """JSON-able summary of a parse result: None when rejected, raw bytes per parameter.
+
+    Must match the snapshot benchmarks/build_parser_corpus.py takes of the baseline parsers.
+    """
+    if not result:
+        return None
+    return {
+        "opCode": bytes(result.opCode).hex(),
+        "paramCount": result.paramCount,
+        "parameters": [[p.type, bytes(p.content).hex()] for p in result.parameters],
+    }
+
+
+def _load_json(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _update_json(path: Path, key: str, value) -> None:
+    data = _load_json(path)
+    data[key] = value
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+
+
+def _calibration():
+    buf = bytes(range(256)) * 4
+    total = 0
+    for i in range(0, 1024, 4):
+        total += int.from_bytes(buf[i:i + 4], "big")
+    return total
+
+
+def measure_ns(parse, frames: list[bytes], number: int = 50, repeat: int = 15) -> tuple[float, float]:
+    """(ns per packet, time per packet / time per calibration loop).
+
+    Parser and calibration runs are interleaved and the best of each is kept,
+    so load spikes on the machine hit both sides alike.
+    """
+    work = lambda: [parse(f) for f in frames]  # noqa: E731
+    best_parse = best_calibration = float("inf")
+    for _ in range(repeat):
+        best_parse = min(best_parse, timeit.timeit(work, number=number))
+        best_calibration = min(best_calibration, timeit.timeit(_calibration, number=number))
+    per_packet = best_parse / number / len(frames)
+    return per_packet * 1e9, per_packet / (best_calibration / number)
+
+
+def measure_bytes(parse, frames: list[bytes], rounds: int = 20) -> float:
+    """Peak traced bytes per packet while parsing and keeping the results."""
+    kept = [None] * (rounds * len(frames))
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        i = 0
+        for _ in range(rounds):
+            for frame in frames:
+                kept[i] = parse(frame)
+                i += 1
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return (peak - base) / len(kept)
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return load_frames()
+
+
+class TestCorpus:
+    def test_covers_frame_kinds(self, frames):
+        kinds = {kind for _, kind, _ in frames}
+        assert {"short", "long_header", "fragment", "encrypted"} <= kinds
+
+    def test_long_header_frames_use_7_bytes(self, frames):
+        for name, kind, data in frames:
+            if kind == "long_header":
+                assert data[3] | (data[4] << 8) > 255, name
+
+
+@pytest.mark.parametrize("parser_name", PARSERS)
+class TestParserGolden:
+    def test_matches_golden(self, parser_name, frames):
+        parse = PARSERS[parser_name]
+        actual = {name: snapshot(parse(data)) for name, _, data in frames}
+        golden = _load_json(GOLDEN_PATH).get(parser_name.split(".")[0])
+        assert golden is not None, "No goldens; run benchmarks/build_parser_corpus.py"
+        for name in actual:
+            assert actual[name] == golden.get(name), f"{parser_name} differs from the baseline parser on {name}"
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("parser_name", PARSERS)
+class TestParserPerf:
+    def test_no_regression(self, parser_name, frames):
+        parse = PARSERS[parser_name]
+        data = [d for _, _, d in frames]
+        allocated = measure_bytes(parse, data)
+        if UPDATE:
+            # Record the slowest of a few runs so timing noise does not fail later runs
+            ns, relative = max((measure_ns(parse, data) for _ in range(MEASURE_ATTEMPTS)), key=lambda m: m[1])
+            _update_json(BASELINE_PATH, parser_name, {
+                "python": PYTHON,
+                "ns_per_packet": round(ns, 1),
+                "relative_cost": round(relative, 4),
+                "bytes_per_packet": round(allocated, 1),
+            })
+
+        baseline = _load_json(BASELINE_PATH).get(parser_name)
+        if baseline is None:
+            pytest.fail(f"No baseline for {parser_name}; run with PARSER_PERF_UPDATE=1")
+        if baseline["python"] != PYTHON:
+            pytest.skip(f"Baseline recorded on Python {baseline['python']}, running {PYTHON}")
+
+        time_limit = baseline["relative_cost"] * (1 + THRESHOLD)
+        # A slow run is only a regression if it stays slow when measured again
+        for _ in range(MEASURE_ATTEMPTS):
+            ns, relative = measure_ns(parse, data)
+            if relative <= time_limit:
+                break
+        assert relative <= time_limit, (
+            f"{parser_name}: {ns:.0f} ns/packet, relative cost {relative:.3f} > {time_limit:.3f} "
+            f"(baseline {baseline['relative_cost']}, threshold {THRESHOLD:.0%})"
+        )
+        alloc_limit = baseline["bytes_per_packet"] * (1 + THRESHOLD) + ALLOC_SLACK_BYTES
+        assert allocated <= alloc_limit, (
+            f"{parser_name}: {allocated:.0f} B/packet > {alloc_limit:.0f} "
+            f"(baseline {baseline['bytes_per_packet']}, threshold {THRESHOLD:.0%})"
+        )
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from pipeline import Stage
+
+
+class TestStage:
+    def test_handles_items_in_order(self):
+        seen = []
+        stage = Stage("test", seen.append)
+        stage.start()
+        for i in range(100):
+            stage.put(i)
+        stage.join()
+        stage.stop()
+        assert seen == list(range(100))
+        assert stage.metrics.processed == 100
+
+    def test_stop_finishes_queued_items(self):
+        seen = []
+        stage = Stage("test", seen.append)
+        stage.start()
+        for i in range(10):
+            stage.put(i)
+        stage.stop()
+        assert seen == list(range(10))
+
+    def test_bounded_put(self):
+        gate = threading.Event()
+        stage = Stage("test", lambda item: gate.wait(), maxsize=2)
+        stage.start()
+        stage.put(0)
+        time.sleep(0.05)
+        assert stage.put(1, block=False)
+        assert stage.put(2, block=False)
+        assert not stage.put(3, block=False)
+        assert stage.depth == 2
+        gate.set()
+        stage.stop()
+        assert stage.metrics.high_water == 2
+
+    def test_errors_counted_not_fatal(self):
+        def handler(item):
+            if item == 1:
+                raise ValueError("bad item")
+        stage = Stage("test", handler)
+        stage.start()
+        for i in range(3):
+            stage.put(i)
+        stage.stop()
+        assert stage.metrics.processed == 3
+        assert stage.metrics.errors == 1
+
+    def test_workers_run_in_parallel(self):
+        stage = Stage("test", lambda item: time.sleep(0.1), workers=4)
+        stage.start()
+        start = time.perf_counter()
+        for i in range(4):
+            stage.put(i)
+        stage.join()
+        assert time.perf_counter() - start < 0.3
+        stage.stop()
+
+    def test_wait_latency_recorded(self):
+        stage = Stage("test", lambda item: time.sleep(0.02))
+        stage.start()
+        for i in range(3):
+            stage.put(i)
+        stage.stop()
+        snap = stage.snapshot()
+        assert snap["max_wait_s"] >= 0.03
+        assert snap["mean_busy_ms"] >= 15
+        assert snap["depth"] == 0
@@ -0,0 +1,190 @@
+import pytest
+import requests
+
+from delivery import DeliveryEngine
+from ratelimit import RateLimiter, redact_webhooks, webhook_id
+from replay import MockWebhookServer
+from tests.helpers import FakeClock
+
+
+ROUTE = "https://discord.com/api/webhooks/1/a"
+OTHER = "https://discord.com/api/webhooks/2/b"
+
+
+def headers(limit=5, remaining=4, reset_after=2.0, bucket="abc", **extra):
+    h = {
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset-After": str(reset_after),
+        "X-RateLimit-Bucket": bucket,
+    }
+    h.update(extra)
+    return h
+
+
+@pytest.fixture
+def clock():
+    return FakeClock(now=100.0)
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(reserve=1, clock=clock, sleep=clock.sleep)
+
+
+class TestRateLimiter:
+    def test_unknown_bucket_not_delayed(self, limiter):
+        for _ in range(10):
+            assert limiter.reserve_slot(ROUTE) == 0.0
+
+    def test_paces_remaining_budget(self, limiter):
+        assert limiter.reserve_slot(ROUTE) == 0.0
+        limiter.update(ROUTE, 200, headers(remaining=4, reset_after=2.0))
+        # 4 left, 1 kept in reserve: 3 posts spread over 2 seconds
+        assert limiter.reserve_slot(ROUTE) == pytest.approx(2.0 / 3)
+
+    def test_waits_for_reset_when_budget_used(self, limiter, clock):
+        limiter.reserve_slot(ROUTE)
+        limiter.update(ROUTE, 200, headers(remaining=1, reset_after=1.5))
+        assert limiter.reserve_slot(ROUTE) == pytest.approx(1.5)
+        clock.now += 1.5
+        # Window over: budget refilled to the limit
+        assert limiter.reserve_slot(ROUTE) == 0.0
+        assert limiter.bucket(ROUTE).remaining == 4
+
+    def test_429_blocks_bucket(self, limiter):
+        delay = limiter.update(ROUTE, 429, headers(remaining=0, reset_after=3.0, **{"Retry-After": "3"}))
+        assert delay == 3.0
+        assert limiter.rate_limited == 1
+        assert limiter.reserve_slot(ROUTE) == pytest.approx(3.0)
+        # Other webhooks are unaffected
+        assert limiter.reserve_slot(OTHER) == 0.0
+
+    def test_global_429_blocks_every_route(self, limiter):
+        limiter.update(ROUTE, 429, {"Retry-After": "2", "X-RateLimit-Global": "true"})
+        assert limiter.reserve_slot(OTHER) == pytest.approx(2.0)
+
+    def test_routes_of_one_webhook_share_a_bucket(self, limiter):
+        limiter.update(ROUTE, 200, headers(remaining=1, bucket="shared"))
+        limiter.update(ROUTE + "?wait=true", 200, headers(remaining=1, bucket="shared"))
+        assert limiter.bucket(ROUTE) is limiter.bucket(ROUTE + "?wait=true")
+
+    def test_webhooks_with_same_bucket_hash_keep_own_budget(self, limiter):
+        # Discord sends one hash for every webhook's execute route
+        limiter.update(ROUTE, 200, headers(remaining=0, reset_after=2.0, bucket="shared"))
+        limiter.update(OTHER, 200, headers(remaining=4, reset_after=2.0, bucket="shared"))
+        assert limiter.bucket(ROUTE) is not limiter.bucket(OTHER)
+        assert limiter.bucket(ROUTE).remaining == 0
+        assert limiter.reserve_any((ROUTE, OTHER)) == (OTHER, 0.0)
+
+    def test_out_of_order_responses_keep_lowest_remaining(self, limiter):
+        limiter.update(ROUTE, 200, headers(remaining=2))
+        limiter.update(ROUTE, 200, headers(remaining=3))
+        assert limiter.bucket(ROUTE).remaining == 2
+
+    def test_acquire_sleeps(self, limiter, clock):
+        limiter.reserve_slot(ROUTE)
+        limiter.update(ROUTE, 200, headers(remaining=1, reset_after=1.0))
+        start = clock.now
+        assert limiter.acquire(ROUTE) == pytest.approx(1.0)
+        assert clock.now - start == pytest.approx(1.0)
+        assert limiter.waited == pytest.approx(1.0)
+
+    def test_reserve_any_prefers_route_with_budget(self, limiter):
+        limiter.update(ROUTE, 200, headers(remaining=2, reset_after=1.0, bucket="a"))
+        limiter.update(OTHER, 200, headers(remaining=4, reset_after=1.0, bucket="b"))
+        assert limiter.reserve_any((ROUTE, OTHER)) == (OTHER, 0.0)
+        assert limiter.bucket(OTHER).remaining == 3
+
+    def test_reserve_any_waits_for_soonest(self, limiter):
+        limiter.reserve_slot(ROUTE)
+        limiter.update(ROUTE, 200, headers(remaining=1, reset_after=2.0, bucket="a"))
+        limiter.reserve_slot(OTHER)
+        limiter.update(OTHER, 200, headers(remaining=1, reset_after=0.5, bucket="b"))
+        route, wait = limiter.reserve_any((ROUTE, OTHER))
+        assert route == OTHER
+        assert wait == pytest.approx(0.5)
+
+    def test_unknown_routes_used_in_turn(self, limiter, clock):
+        routes = (ROUTE, OTHER)
+        used = []
+        for _ in range(4):
+            used.append(limiter.acquire_any(routes)[0])
+            clock.now += 0.01
+        assert used == [ROUTE, OTHER, ROUTE, OTHER]
+
+    def test_acquire_any_waits_less_than_one_route(self, limiter, clock):
+        routes = (ROUTE, OTHER)
+        for route, bucket in zip(routes, "ab"):
+            limiter.update(route, 200, headers(remaining=5, reset_after=1.0, bucket=bucket))
+        start = clock.now
+        used = [limiter.acquire_any(routes)[0] for _ in range(4)]
+        assert sorted(used) == sorted(routes * 2)
+        # Paced at ~1/3 s per bucket, two buckets fit four posts in well under a window
+        assert clock.now - start < 1.0
+
+
+class TestWebhookRoutes:
+    def test_webhook_id(self):
+        assert webhook_id(ROUTE) == "1"
+        assert webhook_id("http://127.0.0.1:8080/webhook") == "http://127.0.0.1:8080/webhook"
+
+    def test_redact_masks_token(self):
+        assert redact_webhooks(ROUTE + "?wait=true") == "https://discord.com/api/webhooks/1/***?wait=true"
+        assert redact_webhooks("url: /api/webhooks/22/tok-en_x (Caused by ...)") == \
+            "url: /api/webhooks/22/*** (Caused by ...)"
+
+    def test_429_log_has_no_token(self, limiter, caplog):
+        limiter.update("https://discord.com/api/webhooks/7/s3cret", 429, headers(remaining=0, **{"Retry-After": "1"}))
+        assert "webhooks/7/***" in caplog.text
+        assert "s3cret" not in caplog.text
+
+
+class TestRateLimitedDelivery:
+    def test_paced_posts_all_delivered(self):
+        server = MockWebhookServer(rate_limit=(5, 0.5))
+        server.start()
+        engine = DeliveryEngine(server.url, max_in_flight=1)
+        try:
+            futures = [engine.submit({"content": str(i)}) for i in range(12)]
+            assert all(f.result(timeout=10).status_code == 200 for f in futures)
+        finally:
+            engine.close()
+            server.stop()
+        assert [p["content"] for p in server.payloads] == [str(i) for i in range(12)]
+        assert server.rate_limited == 0
+
+    def test_429_retried_not_dropped(self):
+        server = MockWebhookServer(rate_limit=(3, 0.5))
+        server.start()
+        # Someone else used up the window; the engine knows nothing about it yet
+        for _ in range(3):
+            requests.post(server.url, json={"content": "other"}, timeout=5)
+        engine = DeliveryEngine(server.url, max_in_flight=1)
+        try:
+            futures = [engine.submit({"content": str(i)}) for i in range(3)]
+            assert all(f.result(timeout=10).status_code == 200 for f in futures)
+        finally:
+            engine.close()
+            server.stop()
+        assert [p["content"] for p in server.payloads[3:]] == ["0", "1", "2"]
+        assert server.rate_limited >= 1
+        assert engine.limiter.rate_limited == server.rate_limited
+
+    def test_webhooks_share_the_load(self):
+        servers = [MockWebhookServer(rate_limit=(3, 1.0)) for _ in range(3)]
+        for server in servers:
+            server.start()
+        engine = DeliveryEngine([server.url for server in servers], max_in_flight=1)
+        try:
+            futures = [engine.submit({"content": str(i)}, lane="Alice") for i in range(6)]
+            assert all(f.result(timeout=10).status_code == 200 for f in futures)
+        finally:
+            engine.close()
+            for server in servers:
+                server.stop()
+        # One webhook alone would have needed a second window for 6 posts, even
+        # though all three answer with the same bucket hash
+        assert all(server.payloads for server in servers)
+        assert sum(engine.sent.values()) == 6
+        assert sum(server.rate_limited for server in servers) == 0
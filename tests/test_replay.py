@@ -0,0 +1,170 @@
+import pytest
+import io
+import struct
+
+from capture_backends import PcapFileBackend, read_pcap_frames
+from replay import MockWebhookServer, create_sink, format_report, main, replay
+from sinks import NullSink, StdoutSink, WebhookSink
+from tests.helpers import CLIENT_IP, SERVER_IP, make_frame, make_guild_payload, make_ip_packet
+
+
+def write_pcap(path, frames: list[bytes], linktype: int = 1) -> None:
+    out = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, linktype)
+    for i, frame in enumerate(frames):
+        out += struct.pack("<IIII", 1700000000 + i, 500, len(frame), len(frame)) + frame
+    path.write_bytes(out)
+
+
+def pcapng_block(block_type: int, body: bytes) -> bytes:
+    body += b"\x00" * (-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack("<II", block_type, length) + body + struct.pack("<I", length)
+
+
+def write_pcapng(path, frames: list[bytes]) -> None:
+    out = pcapng_block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1))
+    # if_tsresol option: 10^-3 (milliseconds)
+    options = struct.pack("<HHB", 9, 1, 3) + b"\x00" * 3 + struct.pack("<HH", 0, 0)
+    out += pcapng_block(0x00000001, struct.pack("<HHI", 1, 0, 65535) + options)
+    for i, frame in enumerate(frames):
+        ts = 1700000000000 + i
+        out += pcapng_block(0x00000006, struct.pack("<IIIII", 0, ts >> 32, ts & 0xFFFFFFFF, len(frame), len(frame)) + frame)
+    path.write_bytes(out)
+
+
+@pytest.fixture
+def capture_frames():
+    return [
+        make_frame(make_guild_payload("Alice", "hello guild")),
+        make_frame(b"\x00" * 6 + b"\x00\x00\x00\x01" + b"\x00" * 12),  # not guild chat
+        make_frame(make_guild_payload("Bob", "hi"), src=CLIENT_IP, dst=SERVER_IP),  # outgoing
+        make_frame(make_guild_payload("Carol", "raid at 9")),
+    ]
+
+
+class TestReadPcapFrames:
+    def test_reads_pcap(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        frames = list(read_pcap_frames(str(path)))
+        assert [f[2] for f in frames] == capture_frames
+        assert frames[0][0] == 1
+        assert frames[0][1] == pytest.approx(1700000000.0005)
+
+    def test_reads_pcapng(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcapng"
+        write_pcapng(path, capture_frames)
+        frames = list(read_pcap_frames(str(path)))
+        assert [f[2] for f in frames] == capture_frames
+        assert frames[1][1] == pytest.approx(1700000000.001)
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_bytes(b"not a capture")
+        with pytest.raises(ValueError, match="not a pcap"):
+            list(read_pcap_frames(str(path)))
+
+    def test_backend_applies_host_filter(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        backend = PcapFileBackend(str(path), "src host 54.214.176.167")
+        assert len(list(backend.payloads())) == 3
+        assert backend.frames_read == 4
+
+    def test_backend_records_keep_capture_time(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        records = list(PcapFileBackend(str(path), "src host 54.214.176.167").records())
+        assert [r.ts for r in records] == pytest.approx([1700000000.0005, 1700000000.0005 + 1, 1700000000.0005 + 2])
+        assert len({r.flow for r in records}) == 1
+        assert records[0].flow != 0
+
+    def test_backend_raw_ip_linktype(self, tmp_path):
+        path = tmp_path / "raw.pcap"
+        write_pcap(path, [make_ip_packet(b"payload")], linktype=101)
+        assert list(PcapFileBackend(str(path), "").payloads()) == [b"payload"]
+
+
+class TestReplay:
+    def test_replay_null_sink(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        report = replay(str(path), NullSink(), bpf_filter="src host 54.214.176.167")
+        assert report["frames"] == 4
+        assert report["packets"] == 3
+        assert report["messages"] == 2
+        assert report["packets_per_s"] > 0
+        assert set(report["stage_times_s"]) == {"decode", "parse", "transform", "deliver"}
+        assert report["stages"]["deliver"]["high_water"] >= 1
+        assert "stage queues:" in format_report(report)
+
+    def test_replay_skips_own_character(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        report = replay(str(path), NullSink(), in_game_char_name="Alice")
+        assert report["messages"] == 2  # Bob (no filter) and Carol
+
+    def test_replay_drops_duplicates(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        # Same guild frame twice, as segment and reassembled copy
+        write_pcap(path, capture_frames + capture_frames[:1])
+        report = replay(str(path), NullSink(), bpf_filter="src host 54.214.176.167", dedupe_window=2.0)
+        assert report["messages"] == 2
+        assert report["duplicates"] == 1
+        report = replay(str(path), NullSink(), bpf_filter="src host 54.214.176.167")
+        assert report["messages"] == 3
+        assert report["duplicates"] == 0
+
+    def test_replay_stdout_sink(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcapng"
+        write_pcapng(path, capture_frames)
+        stream = io.StringIO()
+        replay(str(path), StdoutSink(stream), bpf_filter="src host 54.214.176.167")
+        assert stream.getvalue() == "Alice: hello guild\nCarol: raid at 9\n"
+
+    def test_replay_mock_webhook(self, tmp_path, capture_frames):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        server = MockWebhookServer()
+        server.start()
+        try:
+            report = replay(str(path), WebhookSink(server.url), bpf_filter="src host 54.214.176.167")
+        finally:
+            server.stop()
+        assert report["messages"] == 2
+        assert server.requests == 2
+
+    def test_create_sink(self):
+        assert isinstance(create_sink("null"), NullSink)
+        assert isinstance(create_sink("stdout"), StdoutSink)
+        assert isinstance(create_sink("mock-webhook", "http://127.0.0.1/"), WebhookSink)
+        with pytest.raises(ValueError, match="Unknown sink"):
+            create_sink("discord")
+
+    def test_format_report(self):
+        report = {
+            "frames": 10, "packets": 8, "messages": 2, "elapsed_s": 0.5,
+            "packets_per_s": 16.0, "messages_per_s": 4.0,
+            "stage_times_s": {"decode": 0.001, "parse": 0.002, "transform": 0.0, "deliver": 0.0},
+        }
+        text = format_report(report)
+        assert "packets/s:     16" in text
+        assert "parse" in text
+
+    def test_main_prints_report(self, tmp_path, capture_frames, capsys):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        assert main([str(path), "--sink", "null"]) == 0
+        assert "messages:      2" in capsys.readouterr().out
+
+    def test_main_mock_rate_limit(self, tmp_path, capture_frames, capsys):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        assert main([str(path), "--sink", "mock-webhook", "--mock-rate-limit", "1/0.2"]) == 0
+        assert "messages:      2" in capsys.readouterr().out
+
+    def test_main_mock_webhooks(self, tmp_path, capture_frames, capsys):
+        path = tmp_path / "cap.pcap"
+        write_pcap(path, capture_frames)
+        assert main([str(path), "--sink", "mock-webhook", "--mock-rate-limit", "1/0.2", "--mock-webhooks", "2"]) == 0
+        assert "messages:      2" in capsys.readouterr().out
@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+from delivery import WebhookError
+from Guildmessage import Guild_message
+from replay import MockWebhookServer
+from retry import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, RetryingSink, RetryPolicy, is_permanent
+from sinks import DeliveryAbandoned, MessageSink, WebhookSink
+from spool import Spool, SpoolingSink
+from tests.helpers import FakeClock
+
+
+class FlakySink(MessageSink):
+    """Fails the first `failures` deliveries with `error`, then succeeds."""
+
+    def __init__(self, failures=0, error=None):
+        super().__init__()
+        self.failures = failures
+        self.error = error or requests.ConnectionError("unreachable")
+        self.calls: list[str] = []
+        self.lock = threading.Lock()
+
+    def deliver(self, message):
+        future = Future()
+        with self.lock:
+            self.calls.append(message.content)
+            fail = len(self.calls) <= self.failures
+        if fail:
+            future.set_exception(self.error)
+        else:
+            self._count()
+            future.set_result(None)
+        return future
+
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02)
+
+
+class TestRetryPolicy:
+    def test_backoff_capped(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+        assert [policy.delay(n, rng=lambda: 1.0) for n in range(1, 7)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+
+    def test_full_jitter(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+        assert policy.delay(3, rng=lambda: 0.25) == 1.0
+
+    def test_permanent_errors(self):
+        assert is_permanent(WebhookError(400))
+        assert is_permanent(WebhookError(404))
+        assert not is_permanent(WebhookError(429))
+        assert not is_permanent(WebhookError(503))
+        assert not is_permanent(requests.ConnectionError())
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.retry_in() == 10
+
+    def test_half_open_single_probe(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock.now = 20
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+        assert breaker.trips == 1
+
+    def test_success_resets_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+
+class TestRetryingSink:
+    def test_retries_until_delivered(self):
+        inner = FlakySink(failures=2)
+        sink = RetryingSink(inner, FAST)
+        future = sink.deliver(Guild_message("Alice", "hi"))
+        assert future.result(timeout=5) is None
+        assert inner.calls == ["hi", "hi", "hi"]
+        assert sink.retries == 2
+        assert sink.delivered == 1
+        sink.close()
+
+    def test_dead_letter_after_max_attempts(self, tmp_path):
+        path = tmp_path / "dead.jsonl"
+        inner = FlakySink(failures=10)
+        sink = RetryingSink(inner, FAST, dead_letter_path=str(path))
+        future = sink.deliver(Guild_message("Alice", "lost"))
+        assert isinstance(future.exception(timeout=5), DeliveryAbandoned)
+        sink.close()
+        assert len(inner.calls) == 3
+        record = json.loads(path.read_text())
+        assert (record["name"], record["content"], record["attempts"]) == ("Alice", "lost", 3)
+        assert sink.dead_lettered == 1
+
+    def test_permanent_error_not_retried(self, tmp_path):
+        path = tmp_path / "dead.jsonl"
+        inner = FlakySink(failures=10, error=WebhookError(400, "bad embed"))
+        sink = RetryingSink(inner, FAST, dead_letter_path=str(path))
+        assert isinstance(sink.deliver(Guild_message("Alice", "x")).exception(timeout=5), DeliveryAbandoned)
+        sink.close()
+        assert len(inner.calls) == 1
+        assert "bad embed" in path.read_text()
+
+    def test_webhook_token_not_logged(self, tmp_path, caplog):
+        path = tmp_path / "dead.jsonl"
+        error = requests.ConnectionError("Max retries exceeded with url: /api/webhooks/123/s3cret (timeout)")
+        sink = RetryingSink(FlakySink(failures=10, error=error), FAST, dead_letter_path=str(path))
+        sink.deliver(Guild_message("Alice", "x")).exception(timeout=5)
+        sink.close()
+        assert "/api/webhooks/123/***" in path.read_text()
+        assert "s3cret" not in path.read_text() + caplog.text
+
+    def test_retry_does_not_block_new_messages(self):
+        inner = FlakySink(failures=1)
+        sink = RetryingSink(inner, RetryPolicy(base_delay=0.3, max_delay=0.3))
+        first = sink.deliver(Guild_message("Alice", "old"))
+        start = time.monotonic()
+        second = sink.deliver(Guild_message("Bob", "new"))
+        assert second.result(timeout=5) is None
+        assert time.monotonic() - start < 0.2
+        assert first.result(timeout=5) is None
+        assert inner.calls == ["old", "new", "old"]
+        sink.close()
+
+    def test_breaker_holds_messages_while_open(self):
+        inner = FlakySink(failures=2)
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        sink = RetryingSink(inner, RetryPolicy(max_attempts=10, base_delay=0.01, max_delay=0.01), breaker)
+        futures = [sink.deliver(Guild_message("Alice", str(i))) for i in range(2)]
+        # Both failed; breaker open, so nothing goes out until the reset timeout
+        assert breaker.state == OPEN
+        held = sink.deliver(Guild_message("Alice", "held"))
+        time.sleep(0.1)
+        assert len(inner.calls) == 2
+        assert held.result(timeout=5) is None
+        assert all(f.result(timeout=5) is None for f in futures)
+        assert breaker.state == CLOSED
+        assert sorted(inner.calls[2:]) == ["0", "1", "held"]
+        sink.close()
+
+    def test_permanent_error_on_probe_closes_breaker(self):
+        inner = FlakySink(failures=1)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        sink = RetryingSink(inner, RetryPolicy(max_attempts=10, base_delay=0.01, max_delay=0.01), breaker)
+        first = sink.deliver(Guild_message("Alice", "first"))
+        assert breaker.state == OPEN
+        # The probe is rejected for good, but Discord answered
+        inner.error = WebhookError(400, "bad embed")
+        inner.failures = 2
+        held = sink.deliver(Guild_message("Alice", "held"))
+        assert isinstance(held.exception(timeout=5), DeliveryAbandoned)
+        assert first.result(timeout=5) is None
+        assert breaker.state == CLOSED
+        assert sink.pending == 0
+        later = sink.deliver(Guild_message("Alice", "later"))
+        assert later.result(timeout=5) is None
+        sink.close()
+
+    def test_webhook_outage(self, tmp_path):
+        server = MockWebhookServer()
+        server.start()
+        server.status = 503
+        sink = RetryingSink(WebhookSink(server.url), RetryPolicy(max_attempts=20, base_delay=0.01, max_delay=0.05))
+        future = sink.deliver(Guild_message("Alice", "after outage"))
+        time.sleep(0.1)
+        server.status = 200
+        try:
+            assert future.result(timeout=5) is None
+        finally:
+            sink.close()
+            server.stop()
+        assert server.payloads[-1]["content"] == "after outage"
+
+    def test_dead_lettered_message_leaves_spool(self, tmp_path):
+        spool_path = str(tmp_path / "spool.jsonl")
+        inner = FlakySink(failures=10, error=WebhookError(400))
+        sink = SpoolingSink(RetryingSink(inner, FAST), Spool(spool_path))
+        sink.deliver(Guild_message("Alice", "x"))
+        sink.flush()
+        sink.close()
+        spool = Spool(spool_path)
+        spool.close()
+        assert len(spool) == 0
@@ -0,0 +1,177 @@
+import multiprocessing
+import time
+
+import pytest
+
+from capture_backends import CaptureRecord, IterableBackend, flow_id
+from echo import EchoTracker
+from packet_sniffer import PacketSniffer, PacketSnifferConfig, PacketWorker, ShmPacketSniffer, create_packet_sniffer
+from shm_ring import ShmRing
+from sinks import MessageSink
+from tests.helpers import CLIENT_IP, SERVER_IP, make_guild_payload
+
+
+class ListSink(MessageSink):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def deliver(self, message):
+        self.messages.append((message.name, message.content))
+
+
+def produce(ring, count):
+    for i in range(count):
+        while not ring.put(CaptureRecord(float(i), i, i.to_bytes(4, "big") * 8)):
+            time.sleep(0.001)
+    ring.close_writer()
+    ring.close()
+
+
+def consume(ring, results):
+    seen = []
+    while (record := ring.get()) is not None:
+        seen.append(record.flow)
+    results.put(seen)
+    ring.close()
+
+
+@pytest.fixture
+def ring():
+    ring = ShmRing(256)
+    yield ring
+    ring.close()
+
+
+class TestShmRing:
+    def test_round_trip(self, ring):
+        flow = flow_id(SERVER_IP, 11020, CLIENT_IP, 50000)
+        assert ring.put(CaptureRecord(1700000000.5, flow, b"Hello"))
+        assert ring.get(timeout=0) == CaptureRecord(1700000000.5, flow, b"Hello")
+        assert ring.get(timeout=0) is None
+
+    def test_wraps_around(self, ring):
+        for i in range(50):
+            assert ring.put(CaptureRecord(0.0, i, bytes([i]) * 70))
+            assert ring.get(timeout=0).payload == bytes([i]) * 70
+        assert ring.used == 0
+
+    def test_overrun_when_full(self, ring):
+        record = CaptureRecord(0.0, 0, b"x" * 100)
+        assert ring.put(record)
+        assert ring.put(record)
+        assert not ring.put(record)
+        assert not ring.put(CaptureRecord(0.0, 0, b"x" * 300))
+        snap = ring.snapshot()
+        assert (snap["written"], snap["overruns"]) == (2, 2)
+        assert snap["used"] == snap["high_water"] == 248
+        assert ring.fill == pytest.approx(248 / 256)
+        ring.get(timeout=0)
+        assert ring.put(record)
+
+    def test_closed_and_drained(self, ring):
+        ring.put(CaptureRecord(0.0, 0, b"last"))
+        ring.close_writer()
+        assert ring.get().payload == b"last"
+        assert ring.get() is None
+
+    def test_attach_by_name(self):
+        lock = multiprocessing.Lock()
+        ring = ShmRing(256, lock=lock)
+        other = ShmRing(256, name=ring.name, lock=lock)
+        try:
+            ring.put(CaptureRecord(0.0, 1, b"shared"))
+            assert other.get(timeout=0).payload == b"shared"
+            assert ring.snapshot()["read"] == 1
+        finally:
+            other.close()
+            ring.close()
+
+    def test_across_processes(self):
+        ctx = multiprocessing.get_context("spawn")
+        ring = ShmRing(1024, lock=ctx.Lock())
+        results = ctx.Queue()
+        consumers = [ctx.Process(target=consume, args=(ring, results)) for _ in range(2)]
+        producer = ctx.Process(target=produce, args=(ring, 500))
+        try:
+            for process in consumers + [producer]:
+                process.start()
+            seen = results.get(timeout=30) + results.get(timeout=30)
+            for process in consumers + [producer]:
+                process.join(timeout=10)
+        finally:
+            ring.close()
+        assert sorted(seen) == list(range(500))
+
+
+class TestShmPacketSniffer:
+    def test_messages_cross_the_ring(self):
+        config = PacketSnifferConfig(
+            discord_webhook_url="https://discord.com/api/webhooks/test",
+            network_interface="test",
+            in_game_char_name="",
+            dedupe_window=0,
+            capture_process=True,
+            ring_size=4096,
+        )
+        sink = ListSink()
+        worker = PacketWorker(config, sink=sink)
+        worker.start()
+        payloads = [make_guild_payload("Alice", f"message {i}") for i in range(20)]
+        sniffer = ShmPacketSniffer(config, worker, backend=IterableBackend(payloads))
+        sniffer.start()
+        sniffer.join(timeout=30)
+        assert not sniffer.is_alive()
+        worker.drain()
+        worker.stop()
+        assert sink.messages == [("Alice", f"message {i}") for i in range(20)]
+
+    def test_parse_processes_hand_messages_back(self):
+        config = PacketSnifferConfig(
+            discord_webhook_url="https://discord.com/api/webhooks/test",
+            network_interface="test",
+            in_game_char_name="Me",
+            dedupe_window=0,
+            capture_process=True,
+            ring_size=4096,
+            parse_processes=2,
+        )
+        sink = ListSink()
+        echo = EchoTracker()
+        typed = [echo.expect(f"typed {i}") for i in range(5)]
+        # Delivery and echo acks stay in this process, whoever parsed the frame
+        worker = PacketWorker(config, sink=sink, echo=echo)
+        worker.start()
+        payloads = [make_guild_payload("Alice", f"message {i}") for i in range(30)]
+        payloads += [make_guild_payload("Me", f"typed {i}") for i in range(5)]
+        sniffer = ShmPacketSniffer(config, worker, backend=IterableBackend(payloads))
+        sniffer.start()
+        sniffer.join(timeout=60)
+        assert not sniffer.is_alive()
+        worker.drain()
+        worker.stop()
+        assert sorted(sink.messages) == sorted(("Alice", f"message {i}") for i in range(30))
+        assert all(expected.acked_at is not None for expected in typed)
+
+    def test_parse_only_worker_has_no_sink(self, tmp_path):
+        config = PacketSnifferConfig(discord_webhook_url="https://discord.com/api/webhooks/test",
+                                     network_interface="test", in_game_char_name="",
+                                     spool_path=str(tmp_path / "spool.jsonl"))
+        parsed = []
+        worker = PacketWorker(config, output=parsed.append)
+        worker.start()
+        worker.add_packet(make_guild_payload("Alice", "hi"))
+        worker.drain()
+        worker.stop()
+        assert [(m.name, m.content) for m in parsed] == [("Alice", "hi")]
+        assert worker.stages == {}
+        assert not (tmp_path / "spool.jsonl").exists()
+
+    def test_factory(self):
+        config = PacketSnifferConfig(discord_webhook_url="https://discord.com/api/webhooks/test",
+                                     network_interface="test", in_game_char_name="")
+        worker = PacketWorker(config, sink=ListSink())
+        assert isinstance(create_packet_sniffer(config, worker), PacketSniffer)
+        config = PacketSnifferConfig(discord_webhook_url="https://discord.com/api/webhooks/test",
+                                     network_interface="test", in_game_char_name="", capture_process=True)
+        assert isinstance(create_packet_sniffer(config, worker), ShmPacketSniffer)
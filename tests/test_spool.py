@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from Guildmessage import Guild_message
+from replay import MockWebhookServer
+from sinks import MessageSink, WebhookSink
+from spool import Spool, SpoolingSink
+
+
+class GatedSink(MessageSink):
+    """Delivers only when the test resolves the returned futures."""
+
+    def __init__(self):
+        super().__init__()
+        self.futures: list[tuple[Guild_message, Future]] = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def deliver(self, message):
+        future = Future()
+        with self.lock:
+            self.futures.append((message, future))
+        return future
+
+    def close(self):
+        self.closed = True
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _pending(path):
+    spool = Spool(path)
+    spool.close()
+    return len(spool)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "spool.jsonl")
+
+
+class TestSpool:
+    def test_put_ack_and_recover(self, path):
+        spool = Spool(path)
+        a = spool.put(Guild_message("Alice", "one"))
+        b = spool.put(Guild_message("Bob", "two"))
+        spool.ack(a)
+        spool.close()
+
+        spool = Spool(path)
+        assert spool.recovered == 1
+        assert [(i, m.name, m.content) for i, m in spool.pending()] == [(b, "Bob", "two")]
+        # Ids keep growing across restarts
+        assert spool.put(Guild_message("Carol", "three")) > b
+        spool.close()
+
+    def test_group_commit(self, path):
+        spool = Spool(path, sync_interval=0.2)
+        for i in range(50):
+            spool.put(Guild_message("Alice", str(i)))
+        spool.sync()
+        with open(path) as f:
+            assert len(f.readlines()) == 50
+        spool.close()
+
+    def test_torn_tail_ignored(self, path):
+        spool = Spool(path)
+        spool.put(Guild_message("Alice", "one"))
+        spool.close()
+        with open(path, "a") as f:
+            f.write('{"id": 2, "name": "Bo')
+        spool = Spool(path)
+        assert [m.content for _, m in spool.pending()] == ["one"]
+        spool.close()
+
+    def test_compaction_keeps_pending_only(self, path):
+        spool = Spool(path, sync_interval=0.0, compact_bytes=2000)
+        keep = spool.put(Guild_message("Alice", "keep me"))
+        last = keep
+        for _ in range(200):
+            last = spool.put(Guild_message("Bob", "x" * 20))
+            spool.ack(last)
+        spool.sync()
+        # Compaction follows the commit that crossed the threshold
+        assert _wait_for(lambda: spool.compactions >= 1)
+        spool.close()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) < 50
+        spool = Spool(path)
+        assert [(i, m.content) for i, m in spool.pending()] == [(keep, "keep me")]
+        assert spool.put(Guild_message("Carol", "new")) > last
+        spool.close()
+
+    def test_records_put_during_compaction_survive(self, path):
+        spool = Spool(path, sync_interval=0.0, compact_bytes=500)
+        kept = []
+        for i in range(2000):
+            message_id = spool.put(Guild_message("Bob", str(i)))
+            if i % 100 == 0:
+                kept.append(message_id)
+            else:
+                spool.ack(message_id)
+        spool.close()
+        assert spool.compactions >= 1
+        spool = Spool(path)
+        assert [i for i, _ in spool.pending()] == kept
+        spool.close()
+
+    def test_compaction_waits_for_log_to_double(self, path):
+        spool = Spool(path, sync_interval=0.0, compact_bytes=2000)
+        # Nothing acked: compacting would not shrink the file, so it is tried once and deferred
+        while spool._size <= 2000:
+            spool.put(Guild_message("Alice", "x" * 20))
+            spool.sync()
+        assert _wait_for(lambda: spool._compact_at > 2000)
+        deferred_to = spool._compact_at
+        assert deferred_to == 2 * spool._size
+        spool.put(Guild_message("Alice", "x" * 20))
+        spool.sync()
+        assert spool._compact_at == deferred_to
+        assert spool.compactions == 0
+        spool.close()
+
+    def test_closed_rejects(self, path):
+        spool = Spool(path)
+        spool.close()
+        with pytest.raises(RuntimeError):
+            spool.put(Guild_message("Alice", "late"))
+
+
+class TestSpoolingSink:
+    def test_acks_after_delivery(self, path):
+        inner = GatedSink()
+        sink = SpoolingSink(inner, Spool(path))
+        sink.deliver(Guild_message("Alice", "hello"))
+        assert _wait_for(lambda: inner.futures)
+        assert len(sink._spool) == 1
+        inner.futures[0][1].set_result(None)
+        sink.flush()
+        assert len(sink._spool) == 0
+        assert sink.delivered == 1
+        sink.close()
+        assert inner.closed
+
+    def test_undelivered_survive_restart(self, path):
+        inner = GatedSink()
+        sink = SpoolingSink(inner, Spool(path), max_in_flight=1)
+        for i in range(3):
+            sink.deliver(Guild_message("Alice", str(i)))
+        assert _wait_for(lambda: inner.futures)
+        inner.futures[0][1].set_result(None)
+        assert _wait_for(lambda: len(inner.futures) == 2)
+        # Second one fails, third is still in flight at shutdown
+        inner.futures[1][1].set_exception(RuntimeError("discord down"))
+        assert _wait_for(lambda: len(inner.futures) == 3)
+        sink.close()
+
+        inner = GatedSink()
+        sink = SpoolingSink(inner, Spool(path))
+        assert _wait_for(lambda: len(inner.futures) == 2)
+        assert [m.content for m, _ in inner.futures] == ["1", "2"]
+        for _, future in inner.futures:
+            future.set_result(None)
+        sink.flush()
+        sink.close()
+        assert _pending(path) == 0
+
+    def test_runs_ahead_of_delivery(self, path):
+        inner = GatedSink()
+        sink = SpoolingSink(inner, Spool(path), max_in_flight=2)
+        for i in range(500):
+            sink.deliver(Guild_message("Alice", str(i)))
+        assert _wait_for(lambda: len(inner.futures) == 2)
+        assert sink.backlog == 498
+        # Only ids wait here; the spool holds the one copy of each message
+        assert list(sink._queue) == sink._spool.pending_ids()[2:]
+        sink.close()
+
+    def test_with_webhook_sink(self, path):
+        server = MockWebhookServer()
+        server.start()
+        try:
+            sink = SpoolingSink(WebhookSink(server.url, batch_window=0.05), Spool(path))
+            for i in range(5):
+                sink.deliver(Guild_message("Alice", str(i)))
+            sink.flush()
+            sink.close()
+        finally:
+            server.stop()
+        assert "\n".join(p["content"] for p in server.payloads) == "0\n1\n2\n3\n4"
+        assert sink.delivered == 5
+        assert _pending(path) == 0
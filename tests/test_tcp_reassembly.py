@@ -0,0 +1,139 @@
+from tcp_reassembly import TcpReassembler, seq_diff
+from tests.helpers import mabi_frame
+
+
+FLOW = (b"\x36\xd6\xb0\xa7", 11020, b"\xc0\xa8\x01\x0a", 50000)
+OTHER_FLOW = (b"\x36\xd6\xb0\xa7", 11020, b"\xc0\xa8\x01\x0b", 50001)
+
+
+class TestSeqDiff:
+    def test_simple(self):
+        assert seq_diff(10, 4) == 6
+        assert seq_diff(4, 10) == -6
+
+    def test_wraparound(self):
+        assert seq_diff(5, 0xFFFFFFFB) == 10
+        assert seq_diff(0xFFFFFFFB, 5) == -10
+
+
+class TestTcpReassembler:
+    def test_single_segment_single_frame(self):
+        r = TcpReassembler()
+        frame = mabi_frame(b"hello")
+        assert r.feed(FLOW, 1000, frame) == [frame]
+        assert r.stats.frames == 1
+
+    def test_frame_split_over_segments(self):
+        r = TcpReassembler()
+        frame = mabi_frame(b"a long guild message" * 10)
+        assert r.feed(FLOW, 1000, frame[:50]) == []
+        assert r.feed(FLOW, 1050, frame[50:120]) == []
+        assert r.feed(FLOW, 1120, frame[120:]) == [frame]
+
+    def test_coalesced_frames(self):
+        r = TcpReassembler()
+        f1, f2, f3 = mabi_frame(b"one"), mabi_frame(b"two"), mabi_frame(b"three")
+        data = f1 + f2 + f3
+        assert r.feed(FLOW, 1, data[:len(f1) + 2]) == [f1]
+        assert r.feed(FLOW, 1 + len(f1) + 2, data[len(f1) + 2:]) == [f2, f3]
+
+    def test_out_of_order_segments(self):
+        r = TcpReassembler()
+        frame = mabi_frame(b"x" * 30)
+        assert r.feed(FLOW, 500, frame[:10]) == []
+        assert r.feed(FLOW, 520, frame[20:]) == []
+        assert r.stats.out_of_order == 1
+        assert r.feed(FLOW, 510, frame[10:20]) == [frame]
+        assert r.buffered_bytes() == 0
+
+    def test_retransmit_dropped(self):
+        r = TcpReassembler()
+        frame = mabi_frame(b"hello")
+        assert r.feed(FLOW, 1000, frame) == [frame]
+        assert r.feed(FLOW, 1000, frame) == []
+        assert r.stats.retransmits == 1
+
+    def test_overlapping_retransmit_trimmed(self):
+        r = TcpReassembler()
+        frame = mabi_frame(b"abcdefghij")
+        assert r.feed(FLOW, 0, frame[:8]) == []
+        # Retransmit covering old bytes plus new ones
+        assert r.feed(FLOW, 4, frame[4:]) == [frame]
+
+    def test_sequence_wraparound(self):
+        r = TcpReassembler()
+        frame = mabi_frame(b"wrap" * 5)
+        start = 0xFFFFFFFF - 9
+        assert r.feed(FLOW, start, frame[:10]) == []
+        assert r.feed(FLOW, 0, frame[10:]) == [frame]
+
+    def test_flows_are_independent(self):
+        r = TcpReassembler()
+        a, b = mabi_frame(b"flow a"), mabi_frame(b"flow b")
+        assert r.feed(FLOW, 0, a[:5]) == []
+        assert r.feed(OTHER_FLOW, 9000, b) == [b]
+        assert r.feed(FLOW, 5, a[5:]) == [a]
+        assert r.flow_count == 2
+
+    def test_unframed_data_passes_through(self):
+        r = TcpReassembler()
+        data = b"\x00" * 40  # length field 0: nothing to frame on
+        assert r.feed(FLOW, 0, data) == [data]
+
+    def test_joined_mid_frame_realigns(self):
+        r = TcpReassembler()
+        earlier, frame = mabi_frame(b"sent before we joined"), mabi_frame(b"first whole frame")
+        # The flow's first segment starts inside `earlier`
+        assert r.feed(FLOW, 100, earlier[10:] + frame) == [frame]
+        assert r.stats.realigns == 1
+        assert r.stats.skipped_bytes == len(earlier) - 10
+
+    def test_joined_mid_frame_waits_for_header(self):
+        r = TcpReassembler()
+        earlier, frame = mabi_frame(b"sent before we joined"), mabi_frame(b"hello")
+        data = earlier[10:] + frame
+        assert r.feed(FLOW, 100, data[:-3]) == []
+        assert r.feed(FLOW, 100 + len(data) - 3, data[-3:]) == [frame]
+
+    def test_bad_header_after_frame_realigns(self):
+        r = TcpReassembler()
+        first, second = mabi_frame(b"one"), mabi_frame(b"two")
+        assert r.feed(FLOW, 0, first) == [first]
+        assert r.feed(FLOW, len(first), b"\x01\x02\x03garbage" + second) == [second]
+        assert r.stats.realigns == 1
+
+    def test_gap_over_budget_resyncs(self):
+        r = TcpReassembler(max_flow_bytes=64)
+        first = mabi_frame(b"y" * 20)
+        assert r.feed(FLOW, 0, first[:10]) == []
+        later = mabi_frame(b"z" * 50)
+        # Hole never fills; the out-of-order data exceeds the budget
+        assert r.feed(FLOW, 5000, later[:40]) == []
+        second = mabi_frame(b"q" * 40)
+        assert r.feed(FLOW, 9000, second) == [second]
+        assert r.stats.gaps == 1
+
+    def test_oversized_partial_frame_dropped(self):
+        r = TcpReassembler(max_flow_bytes=100)
+        frame = mabi_frame(b"w" * 300)
+        assert r.feed(FLOW, 0, frame[:150]) == []
+        assert r.stats.overflows == 1
+        assert r.buffered_bytes() == 0
+
+    def test_max_flows_evicts_oldest(self):
+        r = TcpReassembler(max_flows=2)
+        for port in range(3):
+            r.feed((b"a", port, b"b", 1), 0, b"\x00\x00\x00\x10\x00")
+        assert r.flow_count == 2
+        assert r.stats.evicted_flows == 1
+
+    def test_idle_flows_expire(self):
+        r = TcpReassembler(flow_timeout=10)
+        r.feed(FLOW, 0, b"\x00\x00\x00\x10\x00", now=0.0)
+        r.feed(OTHER_FLOW, 0, b"\x00\x00\x00\x10\x00", now=20.0)
+        assert r.flow_count == 1
+
+    def test_empty_payload_ignored(self):
+        r = TcpReassembler()
+        assert r.feed(FLOW, 0, b"") == []
+        assert r.flow_count == 0
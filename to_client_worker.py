@@ -1,61 +1,201 @@
-import os
 import queue
-import subprocess
 import threading
 import time
 import logging
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Optional
 
+from echo import EchoTracker
+from input_backends import InputBackend, XdotoolBackend, create_input_backend
 from stats import stats
 
 
 logger = logging.getLogger(__name__)
 
 
-def type_message(message: str, delay_seconds: float) -> None:
-    # Search for and activate the game window
-    os.system(f'xdotool search --name "Mabinogi" windowactivate')
-    time.sleep(delay_seconds)
-        
-    os.system("xdotool key Return")
-    time.sleep(delay_seconds)
-    subprocess.run(["xdotool", "type", message], check=False)
+def type_messages(messages: list[str], delay_seconds: float, backend: Optional[InputBackend] = None,
+                  focus: Optional[Callable[[], object]] = None,
+                  write: Optional[Callable[[str], object]] = None) -> None:
+    """Type `messages` as chat lines in one session.
+
+    The window is activated and chat opened once; each line is then typed
+    (or handed to `write`, e.g. to paste it) and sent with a single
+    Return, and a last Return closes chat again.
+    """
+    if backend is None:
+        backend = XdotoolBackend()
+    # Activate the game window; a full search unless the caller knows a cheaper way
+    (focus or backend.activate_window)()
     time.sleep(delay_seconds)
-    os.system("xdotool key Return")
+
+    backend.key("Return")
     time.sleep(delay_seconds)
-    os.system("xdotool key Return")
+    for message in messages:
+        (write or backend.type_text)(message)
+        time.sleep(delay_seconds)
+        backend.key("Return")
+        time.sleep(delay_seconds)
+    backend.key("Return")
     time.sleep(delay_seconds)
 
 
+def type_message(message: str, delay_seconds: float, backend: Optional[InputBackend] = None,
+                 focus: Optional[Callable[[], object]] = None) -> None:
+    type_messages([message], delay_seconds, backend, focus)
+
+
+DEFAULT_ECHO_TIMEOUT = 2.0
+DEFAULT_ECHO_RETYPES = 1
+# Shorter lines are typed even in paste mode; setting the clipboard costs a few keystrokes
+PASTE_MIN_CHARS = 16
+
+
 class ToClientWorker:
+    """Types queued Discord lines into the game.
+
+    Without an EchoTracker it paces itself with `delay_seconds` sleeps
+    after every step. With one, each line is sent as soon as the previous
+    one came back through the sniffer; a line that does not echo within
+    `echo_timeout` seconds is typed again, up to `echo_retypes` times.
+
+    With `paste`, lines of PASTE_MIN_CHARS or more are pasted from the
+    clipboard instead of typed key by key. A line that cannot be pasted
+    is typed; a window where a pasted line never echoed gets typed lines
+    from then on.
+    """
+
     def __init__(self,
      queue_maxsize: int = 1000,
-     delay_seconds: float = 0.02):
-        self._queue: queue.Queue[Optional[str]] = queue.Queue(maxsize=queue_maxsize)
+     delay_seconds: float = 0.02,
+     input_backend: "str | InputBackend" = "auto",
+     echo: Optional[EchoTracker] = None,
+     echo_timeout: float = DEFAULT_ECHO_TIMEOUT,
+     echo_retypes: int = DEFAULT_ECHO_RETYPES,
+     paste: bool = False):
+        # (line, time queued)
+        self._queue: queue.Queue[Optional[tuple[str, float]]] = queue.Queue(maxsize=queue_maxsize)
         self._thread: Optional[threading.Thread] = None
         self._delay_seconds = delay_seconds
+        # A name is resolved on the worker thread, which then owns the X connection
+        self._input_backend = input_backend
+        self._backend: Optional[InputBackend] = input_backend if isinstance(input_backend, InputBackend) else None
+        # Game window id from the last search, reused while it stays valid
+        self._window: Optional[int] = None
+        self.window_hits = 0
+        self.window_misses = 0
+        self.echo = echo
+        self._echo_timeout = echo_timeout
+        self._echo_retypes = echo_retypes
+        self.retyped = 0
+        self.lost = 0
+        self._paste = paste
+        # Windows where pasting did not work
+        self._no_paste_windows: set[Optional[int]] = set()
+        self.pasted = 0
         logger.info(f"ToClientWorker initialized with queue max size: {queue_maxsize}")
 
     def _loop(self) -> None:
         logger.info("ToClientWorker thread started.")
-        while True:
+        if self._backend is None:
+            self._backend = create_input_backend(str(self._input_backend))
+            logger.info(f"Typing through input backend: {self._backend.name}")
+        stopping = False
+        while not stopping:
+            # Type everything already queued in one session
+            batch: list[tuple[str, float]] = []
             item = self._queue.get()
-            if item is None:
-                logger.info("ToClientWorker received shutdown signal. Exiting.")
-                self._queue.task_done()
-                break
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
 
             try:
-                type_message(item, delay_seconds=self._delay_seconds)
-                # Increment stats for messages sent to game
-                stats.increment('messages_to_game')
+                if batch and self.echo is not None:
+                    self._type_acked(batch)
+                elif batch:
+                    type_messages([line for line, _ in batch], delay_seconds=self._delay_seconds,
+                                  backend=self._backend, focus=self._focus_game_window,
+                                  write=self._write_line if self._paste else None)
+                    # Increment stats for messages sent to game
+                    stats.increment('messages_to_game', len(batch))
             except Exception as e:
                 logger.exception(f"ToClientWorker error: {e}")
                 # Increment error stats
                 stats.increment('errors')
             finally:
-                self._queue.task_done()
+                for _ in range(len(batch) + stopping):
+                    self._queue.task_done()
+        logger.info("ToClientWorker received shutdown signal. Exiting.")
+
+    def _type_acked(self, batch: list[tuple[str, float]]) -> None:
+        """type_messages, paced by echoes instead of sleeps between lines."""
+        backend = self._backend
+        echo = self.echo
+        assert backend is not None and echo is not None
+        self._focus_game_window()
+        time.sleep(self._delay_seconds)
+        backend.key("Return")
+        time.sleep(self._delay_seconds)
+        for line, queued_at in batch:
+            for attempt in range(self._echo_retypes + 1):
+                expected = echo.expect(line, queued_at)
+                pasted = self._write_line(line)
+                backend.key("Return")
+                if expected.wait(self._echo_timeout):
+                    stats.increment('messages_to_game')
+                    break
+                echo.cancel(expected)
+                if pasted:
+                    logger.warning(f"Pasted line did not echo, typing into window {self._window} from now on")
+                    self._no_paste_windows.add(self._window)
+                if attempt < self._echo_retypes:
+                    logger.warning(f"No echo within {self._echo_timeout}s, typing again: {line}")
+                    self.retyped += 1
+                    stats.increment('game_retypes')
+                    # Most likely the game lost focus
+                    self._focus_game_window()
+            else:
+                logger.error(f"Line never showed up in guild chat: {line}")
+                self.lost += 1
+                stats.increment('game_lost')
+        backend.key("Return")
+        time.sleep(self._delay_seconds)
+
+    def _write_line(self, line: str) -> bool:
+        """Paste `line` when paste mode allows it, else type it; True if it was pasted."""
+        backend = self._backend
+        assert backend is not None
+        if self._paste and len(line) >= PASTE_MIN_CHARS and self._window not in self._no_paste_windows:
+            if backend.paste_text(line):
+                self.pasted += 1
+                return True
+            logger.debug(f"Paste failed, typing instead: {line}")
+        backend.type_text(line)
+        return False
+
+    def _focus_game_window(self) -> bool:
+        """Activate the cached game window; search again only if it is gone or won't take focus."""
+        backend = self._backend
+        assert backend is not None
+        window = self._window
+        if window is not None and backend.is_window(window) and backend.activate(window):
+            self.window_hits += 1
+            return True
+        self.window_misses += 1
+        self._window = window = backend.find_window()
+        if window is None:
+            logger.warning(f"No window named '{backend.window_name}' found")
+            return False
+        if not backend.activate(window):
+            logger.warning(f"Could not activate window {window}")
+            self._window = None
+            return False
+        return True
 
     def start(self) -> None:
         if self._thread is None or not self._thread.is_alive():
@@ -66,9 +206,16 @@ class ToClientWorker:
         if self._thread and self._thread.is_alive():
             self._queue.put(None)
             self._thread.join(timeout=5)
+        if self._backend is not None:
+            self._backend.close()
+        logger.info(f"Game window cache: {self.window_hits} hits, {self.window_misses} misses")
+        if self._paste:
+            logger.info(f"Pasted {self.pasted} lines")
+        if self.echo is not None:
+            logger.info(f"Game echoes: {self.echo.snapshot()}, retyped {self.retyped}, lost {self.lost}")
 
     def enqueue(self, message: str) -> None:
         try:
-            self._queue.put_nowait(message)
+            self._queue.put_nowait((message, time.monotonic()))
         except queue.Full:
             logger.warning("ToClientWorker queue full, dropping message.")
\ No newline at end of file
@@ -138,10 +138,10 @@ class TUI:
         uptime = stats.get_uptime_str()
 
         self._stdscr.addstr(2, 0, f"Uptime: {uptime}".ljust(curses.COLS - 1))
-        self._stdscr.addstr(3, 0, f"Packets processed: {snap['packets_processed']}".ljust(curses.COLS - 1))
+        self._stdscr.addstr(3, 0, f"Packets processed: {snap['packets_processed']} (duplicates dropped: {snap['duplicates_dropped']}, queue full drops: {snap['packets_dropped']})".ljust(curses.COLS - 1))
         self._stdscr.addstr(4, 0, f"Messages to Discord: {snap['messages_to_discord']}".ljust(curses.COLS - 1))
-        self._stdscr.addstr(5, 0, f"Messages to game: {snap['messages_to_game']}".ljust(curses.COLS - 1))
-        self._stdscr.addstr(6, 0, f"Errors: {snap['errors']}".ljust(curses.COLS - 1))
+        self._stdscr.addstr(5, 0, f"Messages to game: {snap['messages_to_game']} (retyped: {snap['game_retypes']}, lost: {snap['game_lost']})".ljust(curses.COLS - 1))
+        self._stdscr.addstr(6, 0, f"Errors: {snap['errors']} (retries: {snap['retries']}, dead letters: {snap['dead_letters']})".ljust(curses.COLS - 1))
 
     def _draw_logs(self) -> None:
         assert self._stdscr is not None